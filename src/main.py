@@ -1,15 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.settings import DATABASE_FILENAME
 from src.theThing.models.db import db
 from src.theThing.games import endpoints as games_endpoints
+from src.theThing.cards.crud import load_card_catalog
+from src.theThing.games.timers import run_turn_timers
 from src.theThing.messages.endpoints import message_router
+from src.theThing.cards.endpoints import card_router
+from src.theThing.games.actions import action_router
 from fastapi.middleware.cors import CORSMiddleware
 import socketio
-from src.theThing.games.socket_handler import socketio_app
+from src.theThing.games.socket_handler import socketio_app, run_idle_reaper
+from src.theThing.games import socket_actions  # registers the action events
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the turn timers and the reaper only run with the server
+    tasks = [
+        asyncio.create_task(run_turn_timers()),
+        asyncio.create_task(run_idle_reaper()),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(games_endpoints.router)
 app.include_router(message_router)
+app.include_router(card_router)
+app.include_router(action_router)
 app.mount("/socket.io", socketio_app)
 
 origins = ["*"]
@@ -31,3 +53,4 @@ async def root():
 
 db.bind(provider="sqlite", filename=DATABASE_FILENAME, create_db=True)
 db.generate_mapping(create_tables=True)
+load_card_catalog()
@@ -3,3 +3,58 @@ import os
 ENVIRONMENT = os.getenv("LaCosaEnv", "test")
 
 DATABASE_FILENAME = f"database_la_cosa.sqlite"
+
+# Seconds the clients can keep the static card catalog
+CARD_CATALOG_MAX_AGE = 7 * 24 * 60 * 60
+
+# Seconds a game snapshot is reused for the connections of that game, so a
+# table reconnecting at once reads the game only once
+SNAPSHOT_WINDOW = 2.0
+
+# Amount of events of each game kept to be sent again on reconnection
+EVENT_LOG_SIZE = 200
+
+# Maximum amount of events waiting to be sent to a socket (in its outbox or
+# in the transport), over it the socket is considered too slow and it is
+# disconnected
+OUTBOX_HIGH_WATER = 100
+
+# Seconds between the retries of sending the events of a full outbox
+OUTBOX_DRAIN_INTERVAL = 0.1
+
+# Maximum amount of sockets written at the same time by a broadcast
+FAN_OUT_CONCURRENCY = 32
+
+# Seconds between the updates sent to the spectators of a game
+SPECTATOR_INTERVAL = 1.0
+
+# Turn timers: seconds per tick of the timer wheel and amount of slots
+TURN_TIMER_TICK = 1.0
+TURN_TIMER_SLOTS = 512
+
+# Seconds a turn can stay in each state before its default action runs
+TURN_DEADLINES = {
+    0: 60,  # stealing card
+    1: 90,  # deciding (play/discard)
+    2: 60,  # waiting response
+    3: 60,  # exchanging cards
+    4: 60,  # finished exchange
+    5: 30,  # waiting to finish
+    6: 60,  # applying a panic card
+}
+
+# Seconds a game can stay without connected players before it is aborted
+GAME_IDLE_TTL = 10 * 60
+
+# Seconds between the runs of the idle game reaper
+REAPER_INTERVAL = 60
+
+# Amount of responses kept to answer the requests repeated with the same
+# Idempotency-Key header
+IDEMPOTENCY_CACHE_SIZE = 1024
+
+# Maximum seconds a long-poll request waits for a change of the game
+LONG_POLL_TIMEOUT = 30
+
+# Maximum amount of actions in a batch sent to POST /game/{id}/actions
+MAX_BATCH_ACTIONS = 10
@@ -0,0 +1,62 @@
+"""
+This file compiles the targeting rules declared in static_cards.dict_of_cards
+into a read-only table of flags, indexed by card code. It is built once when the
+module is imported, so checking a rule while playing a card is a dict lookup.
+"""
+from enum import IntFlag
+from types import MappingProxyType
+from src.theThing.cards.static_cards import dict_of_cards
+
+# 0 = action, 2 = obstacle, 4 = panic
+PLAYABLE_KINDS = frozenset([0, 2, 4])
+
+
+class CardRule(IntFlag):
+    NONE = 0
+    PLAYABLE = 1  # can be played from the hand during the turn
+    TARGET_SELF = 2  # the player can play it on himself
+    TARGET_ANY = 4  # the destination does not need to be adjacent
+    IGNORES_OBSTACLES = 8  # it can be played through a locked door
+
+
+TARGET_RULES = {
+    "self": CardRule.TARGET_SELF | CardRule.TARGET_ANY,
+    "any": CardRule.TARGET_ANY,
+    "adjacent": CardRule.NONE,
+}
+
+
+def compile_card_rules(cards: dict) -> MappingProxyType:
+    """
+    Build the code -> CardRule table from the static cards.
+    Every entry sharing a code must declare the same rules.
+    """
+    rules = {}
+    for card in cards.values():
+        rule = CardRule.NONE
+        if card["kind"] in PLAYABLE_KINDS:
+            rule |= CardRule.PLAYABLE
+        rule |= TARGET_RULES[card.get("target", "adjacent")]
+        if card.get("ignores_obstacles", False):
+            rule |= CardRule.IGNORES_OBSTACLES
+
+        if rules.get(card["code"], rule) != rule:
+            raise ValueError(
+                f"Reglas inconsistentes para la carta {card['code']}"
+            )
+        rules[card["code"]] = rule
+    return MappingProxyType(rules)
+
+
+card_rules = compile_card_rules(dict_of_cards)
+
+
+def get_card_rule(code: str, kind: int) -> CardRule:
+    """
+    Return the rules of a card. Cards that are not in the static list only
+    get the PLAYABLE flag, according to their kind.
+    """
+    rule = card_rules.get(code)
+    if rule is None:
+        rule = CardRule.PLAYABLE if kind in PLAYABLE_KINDS else CardRule.NONE
+    return rule
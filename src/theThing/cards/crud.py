@@ -1,11 +1,77 @@
 from .schemas import CardCreate, CardBase, CardUpdate
-from .models import Card
+from .static_cards import dict_of_cards
+from .models import (
+    Card,
+    CardDefinition,
+    CardType,
+    card_catalog,
+    card_type_ids,
+    intern_card_type,
+)
 
 # from ..games import models as gamemodel
 from src.theThing.games.models import Game
+from src.theThing.games.versions import touch_game
 from src.theThing.players.models import Player
 from src.theThing.players.schemas import PlayerBase
+from src.theThing.players.hand import (
+    HandCard,
+    add_to_hand,
+    forget_hand,
+    remove_from_hand,
+)
 from pony.orm import db_session, ObjectNotFound, select, flush
+import random
+
+
+def get_card_type(card: CardCreate) -> int:
+    """
+    Return the id of the catalog entry of the card definition. The loaded
+    definitions are resolved in memory, the others are looked up by code and
+    created the first time they are used. It must be called inside a
+    db_session.
+    """
+    definition = CardDefinition(
+        code=card.code,
+        name=card.name,
+        kind=card.kind,
+        description=card.description,
+        number_in_card=card.number_in_card,
+        playable=card.playable,
+    )
+    type_id = card_type_ids.get(definition)
+    if type_id is not None:
+        return type_id
+    for card_type in CardType.select(code=card.code):
+        # the ids of the catalog can be reused after a rollback
+        if intern_card_type(card_type) == definition:
+            return card_type.id
+    card_type = CardType(**definition._asdict())
+    card_type.flush()
+    intern_card_type(card_type)
+    return card_type.id
+
+
+def load_card_catalog():
+    """
+    It loads the card definitions of static_cards into the catalog, creating
+    the missing ones
+    """
+    with db_session:
+        type_ids = {}
+        for card in dict_of_cards.values():
+            type_id = get_card_type(
+                CardCreate(
+                    code=card["code"],
+                    name=card["name"],
+                    kind=card["kind"],
+                    description=card["description"],
+                    number_in_card=card["number_in_card"],
+                    playable=True,
+                )
+            )
+            type_ids[card_catalog[type_id]] = type_id
+    card_type_ids.update(type_ids)
 
 
 def create_card(card: CardCreate, game_id: int):
@@ -24,21 +90,23 @@ def create_card(card: CardCreate, game_id: int):
         except ObjectNotFound:
             raise Exception("No se encontró la partida")
 
-        card = Card(
-            code=card.code,
-            name=card.name,
-            kind=card.kind,
-            description=card.description,
-            number_in_card=card.number_in_card,
-            playable=card.playable,
-            game=game,
-        )
+        card = add_card_to_deck(card, game)
+        touch_game(game_id)
 
         card.flush()
         response = CardBase.model_validate(card)
     return response
 
 
+def add_card_to_deck(card: CardCreate, game: Game):
+    """
+    It creates a card in the deck of the game, inside the db_session of the
+    caller. The version of the game is left to the caller, so a transaction
+    that creates many cards changes it once.
+    """
+    return Card(type=get_card_type(card), game=game)
+
+
 def get_card(card_id: int, game_id: int):
     """
     This function returns the CardBase schema from its id
@@ -60,7 +128,11 @@ def delete_card(card_id: int, game_id: int):
         card = Card.get(game=Game[game_id], id=card_id)
         if card is None:
             raise ObjectNotFound(Card, pkval=card_id)
+        owner = card.player.id if card.player is not None else None
         card.delete()
+        touch_game(game_id)
+    if owner is not None:
+        forget_hand(game_id, owner)
     return {
         "message": f"Carta {card_id} eliminada con éxito de la partida {game_id}"
     }
@@ -77,10 +149,15 @@ def give_card_to_player(card_id: int, player_id: int, game_id: int):
         player = Player.get(game=Game[game_id], id=player_id)
         if player is None:
             raise Exception("No se encontró el jugador")
+        old_owner = card.player.id if card.player is not None else None
         card.player = player
         card.state = 1
+        touch_game(game_id)
         card.flush()
         response = CardBase.model_validate(card)
+    if old_owner is not None:
+        remove_from_hand(game_id, old_owner, response)
+    add_to_hand(game_id, player_id, [response])
     return response
 
 
@@ -100,6 +177,7 @@ def get_card_from_deck(game_id: int):
             card_state_0 = game.deck.select(lambda c: c.state == 0)
             for card in card_state_0:
                 card.state = 2
+            touch_game(game_id)
             flush()
 
         card = game.deck.select(lambda c: c.state == 2).random(1)[0]
@@ -108,6 +186,54 @@ def get_card_from_deck(game_id: int):
         return response
 
 
+def is_not_panic(card) -> bool:
+    return card.kind != 4
+
+
+def draw_cards(game_id: int, player_id: int, amount: int, predicate=None):
+    """
+    It gives amount cards from the deck to the player, in one transaction.
+    The cards that do not satisfy the predicate are discarded while drawing.
+    If the deck runs out, the discarded cards are shuffled back into it.
+    It returns the list of CardBase given to the player.
+    """
+    with db_session:
+        game = Game[game_id]
+        player = Player.get(game=game, id=player_id)
+        if player is None:
+            raise Exception("No se encontró el jugador")
+
+        drawn = []
+        reshuffled = False
+        pile = []
+        while len(drawn) < amount:
+            if not pile:
+                pile = list(game.deck.select(lambda c: c.state == 2))
+                if not pile:
+                    if reshuffled:
+                        raise Exception("La carta no existe en el mazo")
+                    # If there is no cards left in the game deck,
+                    # shuffle the deck
+                    for card in game.deck.select(lambda c: c.state == 0):
+                        card.state = 2
+                    flush()
+                    reshuffled = True
+                    continue
+                random.shuffle(pile)
+            card = pile.pop()
+            if predicate is None or predicate(card):
+                card.player = player
+                card.state = 1
+                drawn.append(card)
+            else:
+                card.state = 0
+        touch_game(game_id)
+        flush()
+        response = [CardBase.model_validate(card) for card in drawn]
+    add_to_hand(game_id, player_id, response)
+    return response
+
+
 def update_card(card_to_update: CardUpdate, game_id: int):
     """
     This function updates the card state
@@ -117,6 +243,7 @@ def update_card(card_to_update: CardUpdate, game_id: int):
         if card is None:
             raise ObjectNotFound(Card, pkval=card_to_update.id)
         card.state = card_to_update.state
+        touch_game(game_id)
         card.flush()
         response = CardBase.model_validate(card)
     return response
@@ -133,10 +260,13 @@ def remove_card_from_player(card_id: int, player_id: int, game_id: int):
         player = Player.get(game=Game[game_id], id=player_id)
         if player is None:
             raise ObjectNotFound(Player, pkval=player_id)
+        removed = HandCard(card.id, card.type.id, card.state)
         card.player = None
         card.state = 0
+        touch_game(game_id)
         flush()
         # look for the player again to have his hand updated
         player = Player.get(game=Game[game_id], id=player_id)
         response = PlayerBase.model_validate(player)
+    remove_from_hand(game_id, player_id, removed)
     return response
@@ -9,11 +9,17 @@ from src.theThing.cards.crud import (
     get_card_from_deck,
 )
 from src.theThing.cards.schemas import CardBase, CardUpdate
-from src.theThing.players.crud import get_player, update_player
+from src.theThing.players.crud import (
+    get_player,
+    update_player,
+    permute_seats,
+)
 from src.theThing.players.schemas import PlayerBase, PlayerUpdate
 from src.theThing.games import socket_handler as sh
 from src.theThing.turn.schemas import TurnCreate, TurnOut
 from src.theThing.turn.crud import create_turn, update_turn
+from src.theThing.games.barriers import get_barriers
+from src.theThing.games.seating import get_ring
 from src.theThing.games.utils import (
     get_player_in_next_n_places,
     verify_finished_game,
@@ -43,6 +49,9 @@ async def apply_lla(
 ):
     # check that the player has 4 cards in hand
     card.state = 0
+    # The door on the right of the dead player moves to the seat on his left
+    barriers = get_barriers(game.id).copy()
+    barriers.on_death(get_ring(game.id), destination_player.table_position)
     destination_player.alive = False
     player = remove_card_from_player(card.id, player.id, game.id)
 
@@ -71,23 +80,15 @@ async def apply_lla(
     update_turn(game.id, new_turn)
 
     # Update the obstacles value, if the dead player was an obstacle
-    if destination_player.table_position in game.obstacles:
-        alive_players = [
-            player.table_position for player in game.players if player.alive
-        ]
-        alive_players.sort()
-        game.obstacles.sort()
-        destination_player_index = alive_players.index(
-            destination_player.table_position
-        )
-        game.obstacles.remove(destination_player.table_position)
-        game.obstacles.append(alive_players[destination_player_index - 1])
-        update_game(game.id, GameUpdate(obstacles=game.obstacles))
+    if barriers.to_list() != sorted(game.obstacles):
+        update_game(game.id, GameUpdate(obstacles=barriers.to_list()))
 
     updated_game = get_full_game(game.id)
     response = verify_finished_game(updated_game)
     if response["winners"] is not None:
-        await send_game_status_to_players(response["game"].id, response["game"])
+        await send_game_status_to_players(
+            response["game"].id, response["game"]
+        )
         await send_finished_game_event_to_players(game.id, response)
     message = f"{player.name} jugó lanzallamas e incinero a {destination_player.name}"
     return updated_game, message
@@ -120,88 +121,57 @@ async def apply_vte(
     return updated_game, message
 
 
-async def apply_cdl(
+def swap_seats(
     game: GameInDB,
     player: PlayerBase,
     destination_player: PlayerBase,
     card: CardBase,
 ):
-    card.state = 0
-    # swap table position between the players
-    player.table_position, destination_player.table_position = (
-        destination_player.table_position,
-        player.table_position,
-    )
-    # push the changes to the database
-    updated_card = update_card(
-        CardUpdate(id=card.id, state=card.state), game.id
-    )
-
-    updated_player = update_player(
-        PlayerUpdate(table_position=player.table_position), player.id, game.id
-    )
-
-    updated_destination_player = update_player(
-        PlayerUpdate(table_position=destination_player.table_position),
-        destination_player.id,
+    """
+    Discard the card and swap the table positions of the players, the turn
+    follows the player that played the card
+    """
+    update_card(CardUpdate(id=card.id, state=0), game.id)
+    permute_seats(
         game.id,
+        {
+            player.id: destination_player.table_position,
+            destination_player.id: player.table_position,
+        },
     )
-
-    game = get_full_game(game.id)
     new_exchange_destination = get_player_in_next_n_places(
-        game, updated_player.table_position, 1
+        game, destination_player.table_position, 1
     )
     new_turn = TurnCreate(
-        owner=updated_player.table_position,
+        owner=destination_player.table_position,
         played_card=card.id,
         destination_player=destination_player.name,
         destination_player_exchange=new_exchange_destination.name,
     )
     update_turn(game.id, new_turn)
-    updated_game = get_full_game(game.id)
-    message = f"{player.name} jugó cambio de lugar con {destination_player.name}"
-    return updated_game, message
+    return get_full_game(game.id)
 
 
-async def apply_mvc(
+async def apply_cdl(
     game: GameInDB,
     player: PlayerBase,
     destination_player: PlayerBase,
     card: CardBase,
 ):
-    card.state = 0
-    # swap table position between the players
-    player.table_position, destination_player.table_position = (
-        destination_player.table_position,
-        player.table_position,
-    )
-    # push the changes to the database
-    updated_card = update_card(
-        CardUpdate(id=card.id, state=card.state), game.id
-    )
-
-    updated_player = update_player(
-        PlayerUpdate(table_position=player.table_position), player.id, game.id
+    updated_game = swap_seats(game, player, destination_player, card)
+    message = (
+        f"{player.name} jugó cambio de lugar con {destination_player.name}"
     )
+    return updated_game, message
 
-    updated_destination_player = update_player(
-        PlayerUpdate(table_position=destination_player.table_position),
-        destination_player.id,
-        game.id,
-    )
 
-    game = get_full_game(game.id)
-    new_exchange_destination = get_player_in_next_n_places(
-        game, updated_player.table_position, 1
-    )
-    new_turn = TurnCreate(
-        owner=updated_player.table_position,
-        played_card=card.id,
-        destination_player=destination_player.name,
-        destination_player_exchange=new_exchange_destination.name,
-    )
-    update_turn(game.id, new_turn)
-    updated_game = get_full_game(game.id)
+async def apply_mvc(
+    game: GameInDB,
+    player: PlayerBase,
+    destination_player: PlayerBase,
+    card: CardBase,
+):
+    updated_game = swap_seats(game, player, destination_player, card)
     message = f"{player.name} jugó Mas vale que corras! a {destination_player.name} y cambiaron sus lugares"
     return updated_game, message
 
@@ -255,7 +225,7 @@ async def apply_whk(
     await sh.send_whk_to_player(game.id, player.name, player_hand)
 
     updated_game = get_full_game(game.id)
-    if "lco" in [card.code for card in player_hand]:
+    if player.hand_index.has_code("lco"):
         message = f"¡Whisky!, {player.name} bebió de más y lo encontraron con La Cosa en la mano!"
     else:
         message = f"{player.name} bebió de más y dejó ver sus cartas a todos!"
@@ -292,7 +262,7 @@ async def apply_ups(
     await sh.send_ups_to_players(game.id, player.name, player_hand)
 
     updated_game = get_full_game(game.id)
-    if "lco" in [card.code for card in player_hand]:
+    if player.hand_index.has_code("lco"):
         message = f"¡Ups!, {player.name} se descuido y lo encontraron con La Cosa en la mano!"
     else:
         message = f"{player.name} se descuido y dejo ver sus cartas a todos!"
@@ -332,7 +302,9 @@ async def apply_cpo(
                 player.id,
                 game.id,
             )
-            await sh.send_player_status_to_player(player.id, updated_player)
+            await sh.send_player_status_to_player(
+                player.id, updated_player, game.id
+            )
 
     update_card(CardUpdate(id=card.id, state=card.state), game.id)
     await sh.send_cpo_to_players(game.id)
@@ -348,39 +320,7 @@ async def apply_und(
     destination_player: PlayerBase,
     card: CardBase,
 ):
-    card.state = 0
-    # swap table position between the players
-    player.table_position, destination_player.table_position = (
-        destination_player.table_position,
-        player.table_position,
-    )
-    # push the changes to the database
-    updated_card = update_card(
-        CardUpdate(id=card.id, state=card.state), game.id
-    )
-
-    updated_player = update_player(
-        PlayerUpdate(table_position=player.table_position), player.id, game.id
-    )
-
-    updated_destination_player = update_player(
-        PlayerUpdate(table_position=destination_player.table_position),
-        destination_player.id,
-        game.id,
-    )
-
-    game = get_full_game(game.id)
-    new_exchange_destination = get_player_in_next_n_places(
-        game, updated_player.table_position, 1
-    )
-    new_turn = TurnCreate(
-        owner=updated_player.table_position,
-        played_card=card.id,
-        destination_player=destination_player.name,
-        destination_player_exchange=new_exchange_destination.name,
-    )
-    update_turn(game.id, new_turn)
-    updated_game = get_full_game(game.id)
+    updated_game = swap_seats(game, player, destination_player, card)
     message = f"{player.name} jugó Uno, dos y cambio lugares con {destination_player.name}"
     return updated_game, message
 
@@ -391,39 +331,7 @@ async def apply_sda(
     destination_player: PlayerBase,
     card: CardBase,
 ):
-    card.state = 0
-    # swap table position between the players
-    player.table_position, destination_player.table_position = (
-        destination_player.table_position,
-        player.table_position,
-    )
-    # push the changes to the database
-    updated_card = update_card(
-        CardUpdate(id=card.id, state=card.state), game.id
-    )
-
-    updated_player = update_player(
-        PlayerUpdate(table_position=player.table_position), player.id, game.id
-    )
-
-    updated_destination_player = update_player(
-        PlayerUpdate(table_position=destination_player.table_position),
-        destination_player.id,
-        game.id,
-    )
-
-    game = get_full_game(game.id)
-    new_exchange_destination = get_player_in_next_n_places(
-        game, updated_player.table_position, 1
-    )
-    new_turn = TurnCreate(
-        owner=updated_player.table_position,
-        played_card=card.id,
-        destination_player=destination_player.name,
-        destination_player_exchange=new_exchange_destination.name,
-    )
-    update_turn(game.id, new_turn)
-    updated_game = get_full_game(game.id)
+    updated_game = swap_seats(game, player, destination_player, card)
     message = f"{player.name} jugó Sal de aqui y cambio lugares con {destination_player.name}"
     return updated_game, message
 
@@ -436,9 +344,14 @@ async def apply_trc(
 ):
     card.state = 0
     update_card(CardUpdate(id=card.id, state=card.state), game.id)
-    game.obstacles = []
-    updated_game = update_game(game.id, GameUpdate(obstacles=game.obstacles))
-    message = f"{player.name} jugó Tres, cuatro y se rompieron todas las puertas!"
+    barriers = get_barriers(game.id).copy()
+    barriers.clear()
+    updated_game = update_game(
+        game.id, GameUpdate(obstacles=barriers.to_list())
+    )
+    message = (
+        f"{player.name} jugó Tres, cuatro y se rompieron todas las puertas!"
+    )
     return updated_game, message
 
 
@@ -451,55 +364,25 @@ async def apply_eaf(
     card.state = 0
     update_card(CardUpdate(id=card.id, state=card.state), game.id)
 
-    # Remove quarantine from all players
-    for player_q in game.players:
-        updated_player = update_player(
-            PlayerUpdate(quarantine=0),
-            player_q.id,
-            game.id,
-        )
-        await sh.send_player_status_to_player(player_q.id, updated_player)
-
     # Remove all locked doors
-    game.obstacles = []
-    updated_game = update_game(game.id, GameUpdate(obstacles=game.obstacles))
-    owner_id = player.id
+    barriers = get_barriers(game.id).copy()
+    barriers.clear()
+    update_game(game.id, GameUpdate(obstacles=barriers.to_list()))
+
     # Swap the players by pairs clockwise, starting by the current turn owner
-    game_to_update = get_full_game(game.id)
-    alive_players = [
-        player for player in game_to_update.players if player.alive
-    ]
-    alive_players.sort(key=lambda x: x.table_position)
-
-    owner = [player for player in alive_players if player.id == owner_id][0]
-    owner_index = alive_players.index(owner)
-
-    for i in range(0, len(alive_players) - 1, 2):
-        first_player = alive_players[
-            (owner_index + i) % len(alive_players)
-        ]
-        next_player = alive_players[
-            (owner_index + i + 1) % len(alive_players)
-        ]
-
-        update_player(
-            PlayerUpdate(table_position=next_player.table_position),
-            first_player.id,
-            game.id,
-        )
-        update_player(
-            PlayerUpdate(table_position=first_player.table_position),
-            next_player.id,
-            game.id,
-        )
+    alive_seats = get_ring(game.id).alive_seats(start=player.table_position)
+    positions = {}
+    for i in range(0, len(alive_seats) - 1, 2):
+        first_player, next_player = alive_seats[i], alive_seats[i + 1]
+        positions[first_player.id] = next_player.table_position
+        positions[next_player.id] = first_player.table_position
+    # and remove quarantine from all players
+    players = permute_seats(game.id, positions, reset_quarantine=True)
+    await sh.send_players_status_to_players(players, game.id)
 
-    updated_player = get_player(owner_id, game.id)
     # Update the turn accordingly
-    game = get_full_game(game.id)
-    new_exchange_destination = get_player_in_next_n_places(
-        game, updated_player.table_position, 1
-    )
-    turn_owner = [player.table_position for player in game.players if player.id == owner_id][0]
+    turn_owner = positions.get(player.id, player.table_position)
+    new_exchange_destination = get_player_in_next_n_places(game, turn_owner, 1)
     new_turn = TurnCreate(
         owner=turn_owner,
         played_card=card.id,
@@ -507,7 +390,6 @@ async def apply_eaf(
         destination_player_exchange=new_exchange_destination.name,
     )
     update_turn(game.id, new_turn)
-    # Update the turn
     updated_game = get_full_game(game.id)
     message = f"A bailar! {player.name} jugó ¿Es aqui la fiesta? y cambiaron todos sus lugares. Ademas, rompió todas las puertas y cuarentenas!"
     return updated_game, message
@@ -538,27 +420,16 @@ async def apply_ptr(
     """The values in obstacles[] are interpreted as: a door exists between the value
     (player_position) and the nearest alive player positioned on the right side of player_position,
     i.e. player_position represents the left side of the door."""
-    player_position = player.table_position
-    destination_player_position = destination_player.table_position
-    alive_players = [
-        player.table_position for player in game.players if player.alive
-    ]
-    alive_players.sort()
+    barriers = get_barriers(game.id).copy()
     # Set the door according to the position of the players
-    if (
-        player_position == alive_players[0]
-        and destination_player_position == alive_players[-1]
-    ) or (
-        player_position == alive_players[-1]
-        and destination_player_position == alive_players[0]
-    ):
-        game.obstacles.append(alive_players[-1])
-    elif player_position < destination_player_position:
-        game.obstacles.append(player_position)
-    elif player_position > destination_player_position:
-        game.obstacles.append(destination_player_position)
-
-    update_game(game.id, GameUpdate(obstacles=game.obstacles))
+    barriers.add(
+        barriers.edge_between(
+            get_ring(game.id),
+            player.table_position,
+            destination_player.table_position,
+        )
+    )
+    update_game(game.id, GameUpdate(obstacles=barriers.to_list()))
     card.state = 0
     player = remove_card_from_player(card.id, player.id, game.id)
 
@@ -571,7 +442,6 @@ async def apply_ptr(
     return updated_game, message
 
 
-
 effect_applications = {
     "lla": apply_lla,
     "vte": apply_vte,
@@ -669,6 +539,7 @@ async def apply_fal(
     game = get_full_game(game.id)
     return game, message
 
+
 exchange_defense = {
     "ate": apply_ate,
     "ngs": apply_ngs,
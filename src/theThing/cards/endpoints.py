@@ -0,0 +1,55 @@
+import hashlib
+import json
+from fastapi import APIRouter, Request, Response
+from src.settings import CARD_CATALOG_MAX_AGE
+from src.theThing.cards.static_cards import dict_of_cards
+
+card_router = APIRouter()
+
+
+def build_card_catalog() -> bytes:
+    """
+    It returns the JSON of the card definitions by code, used by the clients
+    of the compact protocol to show the cards
+    """
+    catalog = {}
+    for card in dict_of_cards.values():
+        catalog.setdefault(
+            card["code"],
+            {
+                "code": card["code"],
+                "name": card["name"],
+                "kind": card["kind"],
+                "description": card["description"],
+            },
+        )
+    return json.dumps(
+        list(catalog.values()), ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+# The catalog only changes with a new deploy, so it is encoded once
+card_catalog_body = build_card_catalog()
+card_catalog_etag = '"' + hashlib.sha256(card_catalog_body).hexdigest() + '"'
+
+
+@card_router.get("/cards/catalog")
+async def get_card_catalog(request: Request):
+    """
+    Get the definitions of all the cards.
+    :return: list of cards with code, name, kind and description
+
+    Answers 304 if the If-None-Match header matches the ETag
+    """
+    headers = {
+        "ETag": card_catalog_etag,
+        "Cache-Control": f"public, max-age={CARD_CATALOG_MAX_AGE}",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if card_catalog_etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=card_catalog_body,
+        media_type="application/json",
+        headers=headers,
+    )
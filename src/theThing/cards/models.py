@@ -1,8 +1,20 @@
-from pony.orm import Required, Optional, PrimaryKey
+from typing import NamedTuple
+from pony.orm import (
+    Required,
+    Optional,
+    PrimaryKey,
+    Set,
+    composite_index,
+    db_session,
+)
 from src.theThing.models.db import db
 
 
-class Card(db.Entity):
+class CardType(db.Entity):
+    """
+    One row per card definition, shared by all the cards of all the games
+    """
+
     id = PrimaryKey(int, auto=True)
     code = Required(str)
     name = Required(str)
@@ -11,15 +23,92 @@ class Card(db.Entity):
     )  # 0 = action, 1 = defense, 2 = obstacle, 3 = infection(except "LaCosa"), 4 = panic, 5 = "LaCosa"
     description = Required(str)
     number_in_card = Required(int)
+    playable = Required(bool)
+    cards = Set("Card", reverse="type")
+
+    def before_insert(self):
+        # chek if kind is 0 1 2 3 4 5
+        if self.kind not in [0, 1, 2, 3, 4, 5]:
+            raise ValueError("The kind of the card is not valid")
+
+
+class CardDefinition(NamedTuple):
+    code: str
+    name: str
+    kind: int
+    description: str
+    number_in_card: int
+    playable: bool
+
+
+# Interned definitions of the card types by id, so the cards are read
+# without loading their type row
+card_catalog = {}
+
+# Ids of the committed card types by definition, so the cards of a new deck
+# are created without looking up their type
+card_type_ids = {}
+
+
+def intern_card_type(card_type: CardType) -> CardDefinition:
+    definition = CardDefinition(
+        code=card_type.code,
+        name=card_type.name,
+        kind=card_type.kind,
+        description=card_type.description,
+        number_in_card=card_type.number_in_card,
+        playable=card_type.playable,
+    )
+    card_catalog[card_type.id] = definition
+    return definition
+
+
+def get_card_definition(type_id: int) -> CardDefinition:
+    definition = card_catalog.get(type_id)
+    if definition is None:
+        with db_session:
+            definition = intern_card_type(CardType[type_id])
+    return definition
+
+
+class Card(db.Entity):
+    id = PrimaryKey(int, auto=True)
+    type = Required(CardType, reverse="cards")
     state = Required(
         int, default=2, unsigned=True
     )  # 0 = played/discarded, 1 = in player hand, 2 = not played (in deck)
-    playable = Required(bool)
     game = Required("Game", reverse="deck")
     player = Optional("Player", reverse="hand")
+    # the deck is always queried by game and state
+    composite_index(game, state)
 
     def before_insert(self):
         self.state = 2
-        # chek if kind is 0 1 2 3 4 5
-        if self.kind not in [0, 1, 2, 3, 4, 5]:
-            raise ValueError("The kind of the card is not valid")
+
+    @property
+    def definition(self) -> CardDefinition:
+        return get_card_definition(self.type.id)
+
+    @property
+    def code(self):
+        return self.definition.code
+
+    @property
+    def name(self):
+        return self.definition.name
+
+    @property
+    def kind(self):
+        return self.definition.kind
+
+    @property
+    def description(self):
+        return self.definition.description
+
+    @property
+    def number_in_card(self):
+        return self.definition.number_in_card
+
+    @property
+    def playable(self):
+        return self.definition.playable
@@ -3,6 +3,7 @@ from src.theThing.cards.crud import *
 from src.theThing.players.crud import *
 from src.theThing.turn.crud import *
 from src.theThing.games.schemas import GameUpdate
+from src.theThing.games.barriers import get_barriers
 
 
 async def apply_cac(
@@ -18,11 +19,7 @@ async def apply_cac(
     remove_card_from_player(panic_card.id, player.id, game.id)
 
     # Get a new card from the deck
-    new_card = get_card_from_deck(game.id)
-    while new_card.kind == 4:
-        update_card(CardUpdate(id=new_card.id, state=0), game.id)
-        new_card = get_card_from_deck(game.id)
-    give_card_to_player(new_card.id, player.id, game.id)
+    draw_cards(game.id, player.id, 1, is_not_panic)
 
     # Return the card to the deck
     remove_card_from_player(card.id, player.id, game.id)
@@ -52,12 +49,7 @@ async def apply_olv(
     for card in cards:
         remove_card_from_player(card.id, player.id, game.id)
 
-    for _ in range(3):
-        new_card = get_card_from_deck(game.id)
-        while new_card.kind == 4:
-            update_card(CardUpdate(id=new_card.id, state=0), game.id)
-            new_card = get_card_from_deck(game.id)
-        give_card_to_player(new_card.id, player.id, game.id)
+    draw_cards(game.id, player.id, 3, is_not_panic)
 
     # Update the turn state
     update_turn(game.id, TurnCreate(state=3))
@@ -80,8 +72,9 @@ async def apply_hac(game, attacker, objective, card, obstacle):
         else:
             message = f"{attacker.name} se jugo hacha para eliminar la cuarentena de {objective.name}"
     elif obstacle["type"] == "ptr" and obstacle["position"] is not None:
-        game.obstacles.remove(obstacle["position"])
-        update_game(game.id, GameUpdate(obstacles=game.obstacles))
+        barriers = get_barriers(game.id).copy()
+        barriers.remove(obstacle["position"])
+        update_game(game.id, GameUpdate(obstacles=barriers.to_list()))
         message = f"{attacker.name} jugo hacha para eliminar una puerta atrancada"
 
     return message
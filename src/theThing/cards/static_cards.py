@@ -2,6 +2,12 @@
 """ 
 This file contains all static cards. The cards are created as a dictionary of
 dictionaries. The key is the card code. 
+
+Playable cards also declare their targeting rules, which are compiled into
+card_rules.card_rules when the module is imported:
+    - target: "self" (any player, including the one playing it),
+      "any" (any other player) or "adjacent" (only an adjacent player).
+    - ignores_obstacles: True if the card can be played through a locked door.
 """
 
 dict_of_cards = {
@@ -87,6 +93,8 @@ dict_of_cards = {
         "description": "Elimina de la partida a un jugador adyacente",
         "number_in_card": 4,
         "amount_in_deck": 2,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "lla6": {
         "code": "lla",
@@ -95,6 +103,8 @@ dict_of_cards = {
         "description": "Elimina de la partida a un jugador adyacente",
         "number_in_card": 6,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "lla9": {
         "code": "lla",
@@ -103,6 +113,8 @@ dict_of_cards = {
         "description": "Elimina de la partida a un jugador adyacente",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "lla11": {
         "code": "lla",
@@ -111,6 +123,8 @@ dict_of_cards = {
         "description": "Elimina de la partida a un jugador adyacente",
         "number_in_card": 11,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     # Watch your back cards
     "vte4": {
@@ -120,6 +134,8 @@ dict_of_cards = {
         "description": "Invierte el orden de juego. Ahora, tanto el orden de turnos como los intercambios de cartas van en el sentido contrario",
         "number_in_card": 4,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     "vte9": {
         "code": "vte",
@@ -128,6 +144,8 @@ dict_of_cards = {
         "description": "Invierte el orden de juego. Ahora, tanto el orden de turnos como los intercambios de cartas van en el sentido contrario",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     # Whisky cards
     "whk4": {
@@ -137,6 +155,8 @@ dict_of_cards = {
         "description": "Muestra todas tus cartas a todos los jugadores. Solo puedes jugar esta carta sobre ti mismo.",
         "number_in_card": 4,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     "whk6": {
         "code": "whk",
@@ -145,6 +165,8 @@ dict_of_cards = {
         "description": "Muestra todas tus cartas a todos los jugadores. Solo puedes jugar esta carta sobre ti mismo.",
         "number_in_card": 6,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     "whk10": {
         "code": "whk",
@@ -153,6 +175,8 @@ dict_of_cards = {
         "description": "Muestra todas tus cartas a todos los jugadores. Solo puedes jugar esta carta sobre ti mismo.",
         "number_in_card": 10,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     # Change places cards
     "cdl4": {
@@ -163,6 +187,8 @@ dict_of_cards = {
         "trancada.",
         "number_in_card": 4,
         "amount_in_deck": 2,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "cdl7": {
         "code": "cdl",
@@ -172,6 +198,8 @@ dict_of_cards = {
         "trancada.",
         "number_in_card": 7,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "cdl9": {
         "code": "cdl",
@@ -181,6 +209,8 @@ dict_of_cards = {
         "trancada.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "cdl11": {
         "code": "cdl",
@@ -190,6 +220,8 @@ dict_of_cards = {
         "trancada.",
         "number_in_card": 11,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     # You'd better run cards
     "mvc4": {
@@ -200,6 +232,8 @@ dict_of_cards = {
         "cualquier puerta trancada.",
         "number_in_card": 4,
         "amount_in_deck": 2,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "mvc7": {
         "code": "mvc",
@@ -209,6 +243,8 @@ dict_of_cards = {
         "cualquier puerta trancada.",
         "number_in_card": 7,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "mvc9": {
         "code": "mvc",
@@ -218,6 +254,8 @@ dict_of_cards = {
         "cualquier puerta trancada.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "mvc11": {
         "code": "mvc",
@@ -227,6 +265,8 @@ dict_of_cards = {
         "cualquier puerta trancada.",
         "number_in_card": 11,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     # Suspicion cards
     "sos4": {
@@ -236,6 +276,8 @@ dict_of_cards = {
         "description": "Mira una carta aleatoria de la mano de un jugador adyacente.",
         "number_in_card": 4,
         "amount_in_deck": 4,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "sos7": {
         "code": "sos",
@@ -244,6 +286,8 @@ dict_of_cards = {
         "description": "Mira una carta aleatoria de la mano de un jugador adyacente.",
         "number_in_card": 7,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "sos8": {
         "code": "sos",
@@ -252,6 +296,8 @@ dict_of_cards = {
         "description": "Mira una carta aleatoria de la mano de un jugador adyacente.",
         "number_in_card": 8,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "sos9": {
         "code": "sos",
@@ -260,6 +306,8 @@ dict_of_cards = {
         "description": "Mira una carta aleatoria de la mano de un jugador adyacente.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "sos10": {
         "code": "sos",
@@ -268,6 +316,8 @@ dict_of_cards = {
         "description": "Mira una carta aleatoria de la mano de un jugador adyacente.",
         "number_in_card": 10,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     # Analysis cards
     "ana5": {
@@ -277,6 +327,8 @@ dict_of_cards = {
         "description": "Mira la mano de cartas de un jugador adyacente.",
         "number_in_card": 5,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "ana6": {
         "code": "ana",
@@ -285,6 +337,8 @@ dict_of_cards = {
         "description": "Mira la mano de cartas de un jugador adyacente.",
         "number_in_card": 6,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     # Axe cards
     "hac4": {
@@ -294,6 +348,8 @@ dict_of_cards = {
         "description": "Retira una carta 'Puerta trancada' o 'Cuarentena' de tí mismo o de un jugador adyacente",
         "number_in_card": 4,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     "hac9": {
         "code": "hac",
@@ -302,6 +358,8 @@ dict_of_cards = {
         "description": "Retira una carta 'Puerta trancada' o 'Cuarentena' de tí mismo o de un jugador adyacente",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     # Seduction cards
     "sed4": {
@@ -312,6 +370,8 @@ dict_of_cards = {
         "termina.",
         "number_in_card": 4,
         "amount_in_deck": 2,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "sed6": {
         "code": "sed",
@@ -321,6 +381,8 @@ dict_of_cards = {
         "termina.",
         "number_in_card": 6,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "sed7": {
         "code": "sed",
@@ -330,6 +392,8 @@ dict_of_cards = {
         "termina.",
         "number_in_card": 7,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "sed8": {
         "code": "sed",
@@ -339,6 +403,8 @@ dict_of_cards = {
         "termina.",
         "number_in_card": 8,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "sed10": {
         "code": "sed",
@@ -348,6 +414,8 @@ dict_of_cards = {
         "termina.",
         "number_in_card": 10,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "sed11": {
         "code": "sed",
@@ -357,6 +425,8 @@ dict_of_cards = {
         "termina.",
         "number_in_card": 11,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     # DEFENSE CARDS
     # No barbecue! cards
@@ -530,6 +600,8 @@ dict_of_cards = {
         "jugadores y tu.",
         "number_in_card": 4,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "pat7": {
         "code": "ptr",
@@ -539,6 +611,8 @@ dict_of_cards = {
         "jugadores y tu.",
         "number_in_card": 7,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "pat11": {
         "code": "ptr",
@@ -548,6 +622,8 @@ dict_of_cards = {
         "jugadores y tu.",
         "number_in_card": 11,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     # Quarantine cards
     "cua5": {
@@ -558,6 +634,8 @@ dict_of_cards = {
         "arriba. No puede eliminar jugadores ni cambiar de sitio.",
         "number_in_card": 5,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "cua9": {
         "code": "cua",
@@ -567,6 +645,8 @@ dict_of_cards = {
         "arriba. No puede eliminar jugadores ni cambiar de sitio.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     # PANIC CARDS
     # Just between us cards
@@ -577,6 +657,8 @@ dict_of_cards = {
         "description": "Muéstrale todas las cartas de tu mano a un jugador adyacente de tu eleción.",
         "number_in_card": 7,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     "qen9": {
         "code": "qen",
@@ -585,6 +667,8 @@ dict_of_cards = {
         "description": "Muéstrale todas las cartas de tu mano a un jugador adyacente de tu eleción.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "adjacent",
+        "ignores_obstacles": False,
     },
     # Blind date cards
     "cac4": {
@@ -595,6 +679,8 @@ dict_of_cards = {
         "'¡Pánico!' robada. Tu turno termina",
         "number_in_card": 4,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     "cac9": {
         "code": "cac",
@@ -604,6 +690,8 @@ dict_of_cards = {
         "'¡Pánico!' robada. Tu turno termina",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     # Oops! cards
     "ups10": {
@@ -613,6 +701,8 @@ dict_of_cards = {
         "description": "Muéstrales todas las cartas de tu mano a todos los jugadores",
         "number_in_card": 10,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": False,
     },
     # Rotten ropes cards
     "cpo6": {
@@ -622,6 +712,8 @@ dict_of_cards = {
         "description": "Todas las cartas 'Cuarentena' que haya en juego son descartadas.",
         "number_in_card": 6,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": False,
     },
     "cpo9": {
         "code": "cpo",
@@ -630,6 +722,8 @@ dict_of_cards = {
         "description": "Todas las cartas 'Cuarentena' que haya en juego son descartadas.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": False,
     },
     # So this is the party? cards
     "eaf5": {
@@ -641,6 +735,8 @@ dict_of_cards = {
         "en el sentido de las agujas del reloj.",
         "number_in_card": 5,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     "eaf9": {
         "code": "eaf",
@@ -651,6 +747,8 @@ dict_of_cards = {
         "en el sentido de las agujas del reloj.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     # Round and round cards
     """
@@ -687,6 +785,8 @@ dict_of_cards = {
         "description": "Intercambia 1 carta con cualquier jugador de tu elección que no esté en Cuarentena",
         "number_in_card": 7,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "npa9": {
         "code": "npa",
@@ -695,6 +795,8 @@ dict_of_cards = {
         "description": "Intercambia 1 carta con cualquier jugador de tu elección que no esté en Cuarentena",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     # Forgetful cards
     "olv4": {
@@ -705,6 +807,8 @@ dict_of_cards = {
         "de '¡Pánico!' robada.",
         "number_in_card": 4,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     # One, two... cards
     "und5": {
@@ -716,6 +820,8 @@ dict_of_cards = {
         "estáis en Cuarentena, el cambio no tiene lugar.",
         "number_in_card": 5,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     "und9": {
         "code": "und",
@@ -726,6 +832,8 @@ dict_of_cards = {
         "estáis en Cuarentena, el cambio no tiene lugar.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": True,
     },
     # Three, four... cards
     "trc4": {
@@ -735,6 +843,8 @@ dict_of_cards = {
         "description": "Todas las cartas 'Puerta atrancada' que haya en juego son descartadas.",
         "number_in_card": 4,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     "trc9": {
         "code": "trc",
@@ -743,6 +853,8 @@ dict_of_cards = {
         "description": "Todas las cartas 'Puerta atrancada' que haya en juego son descartadas.",
         "number_in_card": 9,
         "amount_in_deck": 1,
+        "target": "self",
+        "ignores_obstacles": True,
     },
     # Revelations cards
     """
@@ -765,5 +877,7 @@ dict_of_cards = {
         "description": "Cámbiate de sitio con cualquier jugador de tu elección que no esté en Cuarentena.",
         "number_in_card": 5,
         "amount_in_deck": 1,
+        "target": "any",
+        "ignores_obstacles": False,
     },
 }
@@ -0,0 +1,145 @@
+"""
+This file contains the game actions that are not received as a single HTTP
+request: the socket events and the batches of actions. Each action is
+dispatched by the turn state machine to the same function as its endpoint,
+with the identity of the player given apart from the action data.
+
+It is a separate module because the endpoints import the socket handler, it
+is imported by main.
+"""
+
+import inspect
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pony.orm import ObjectNotFound
+from src.settings import MAX_BATCH_ACTIONS
+from src.theThing.games.crud import get_game
+from src.theThing.games.socket_handler import buffered_emits
+from src.theThing.games.versions import verify_version
+from src.theThing.games.turn_machine import (
+    check_sequence,
+    dispatch,
+    game_lock,
+    transitions,
+    turn_handlers,
+)
+
+# the endpoints register the handlers of the actions
+from src.theThing.games import endpoints
+
+action_router = APIRouter()
+
+
+def accepts_idempotency_key(endpoint) -> bool:
+    return "idempotency_key" in inspect.signature(endpoint).parameters
+
+
+async def run_action(action: str, game_id: int, player_id: int, data) -> dict:
+    """
+    Run an action of a player. It returns the status code and the response
+    of the endpoint, or the error detail.
+    The data can have a version (as the If-Match header) and an
+    idempotency_key (as the Idempotency-Key header).
+    """
+    if action not in turn_handlers:
+        return {"status": 422, "detail": f"La acción {action} no existe"}
+    player_key = transitions[action].player_key
+    data = dict(data or {})
+    version = data.pop("version", None)
+    idempotency_key = data.pop("idempotency_key", None)
+    data["game_id"] = int(game_id)
+    data["player_id"] = int(player_id)
+    if player_key is not None:
+        data[player_key] = data["player_id"]
+    kwargs = {}
+    if version is not None:
+        kwargs["if_match"] = str(version)
+    if idempotency_key is not None and accepts_idempotency_key(
+        turn_handlers[action]
+    ):
+        kwargs["idempotency_key"] = idempotency_key
+    try:
+        response = await dispatch(action, data, **kwargs)
+    except HTTPException as e:
+        return {"status": e.status_code, "detail": e.detail}
+    except Exception as e:
+        print("error in the action ", action, ": ", e)
+        return {"status": 500, "detail": "Error inesperado"}
+    return {"status": 200, "data": jsonable_encoder(response)}
+
+
+class ActionBatch(BaseModel):
+    """
+    Pydantic model to validate the batch of actions of a player
+    """
+
+    player_id: int
+    actions: List[dict]
+
+
+@action_router.post("/game/{game_id}/actions")
+async def run_action_batch(
+    game_id: int,
+    batch: ActionBatch,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Run a list of actions of a player in order, for example a whole turn.
+    Each action is a dict with the name of the action in "action" and the
+    data of its endpoint, without game_id and player_id.
+    The batch holds the lock of the game, so the actions of other players
+    wait until it ends, and the If-Match header is checked under it. Before
+    running them, the sequence of actions is checked against the turn state
+    machine, so an impossible sequence fails without applying any of them.
+    Each action is committed when it is applied: if one fails for another
+    reason, the ones before it are not rolled back.
+    The broadcasts are sent once, when the batch ends.
+
+    Returns:
+        dict: The result of each action.
+
+    Raises:
+        HTTPException:
+            - 412 (Precondition Failed): If the If-Match header has an old
+              version of the game.
+            - 422 (Unprocessable Entity): If there are too many actions, or
+              they can not follow each other from the current turn state.
+        If an action fails the next ones are not run, the response has the
+        status code and detail of the failed action and the results of the
+        ones that were applied.
+    """
+    if not batch.actions or len(batch.actions) > MAX_BATCH_ACTIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Se deben enviar entre 1 y {MAX_BATCH_ACTIONS} acciones",
+        )
+    results = []
+    async with game_lock(game_id), buffered_emits():
+        verify_version(game_id, if_match)
+        try:
+            turn = get_game(game_id).turn
+        except ObjectNotFound:
+            # each action answers that the game does not exist
+            turn = None
+        if turn is not None:
+            check_sequence(
+                turn.state, [data.get("action") for data in batch.actions]
+            )
+        for data in batch.actions:
+            data = dict(data)
+            result = await run_action(
+                data.pop("action", None), game_id, batch.player_id, data
+            )
+            results.append(result)
+            if result["status"] != 200:
+                break
+
+    if results[-1]["status"] != 200:
+        return JSONResponse(
+            status_code=results[-1]["status"],
+            content={"detail": results[-1]["detail"], "results": results},
+        )
+    return {"results": results}
@@ -0,0 +1,126 @@
+"""
+This file contains the index of locked doors of a game.
+
+The values saved in game.obstacles are interpreted as: a door exists between
+the seat in that position and the nearest alive seat on its right side
+(clockwise), i.e. the position represents the left side of the door. The index
+keeps those positions as a bitmap, so checking the edge between two adjacent
+seats is a single bit test.
+
+The indexes are cached by game id. They are built from the database the first
+time they are needed and replaced by update_game when the obstacles of the
+game are saved. The cached index is only read: the card effects change a
+copy and save it.
+"""
+from pony.orm import db_session
+from src.theThing.games.models import Game
+from src.theThing.games.seating import SeatingRing
+
+
+class BarrierIndex:
+    def __init__(self, obstacles=None):
+        self.mask = 0
+        for position in obstacles or []:
+            self.add(position)
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def copy(self):
+        barriers = BarrierIndex()
+        barriers.mask = self.mask
+        return barriers
+
+    def has_door(self, position: int) -> bool:
+        """
+        Return True if there is a door on the right side of position
+        """
+        return bool(self.mask >> position & 1)
+
+    def add(self, position: int):
+        self.mask |= 1 << position
+
+    def remove(self, position: int):
+        self.mask &= ~(1 << position)
+
+    def clear(self):
+        self.mask = 0
+
+    def between(
+        self,
+        ring: SeatingRing,
+        position_a: int,
+        position_b: int,
+        clockwise: bool = None,
+    ) -> bool:
+        """
+        Return True if there is a door on the edge crossed when leaving
+        position_a towards position_b. If clockwise is not given, the direction
+        is the one where position_b is the closest.
+        """
+        if clockwise is None:
+            clockwise = ring.neighbor(position_a, True) == position_b or (
+                ring.neighbor(position_a, False) != position_b
+                and ring.distance(position_a, position_b, True)
+                <= len(ring) // 2
+            )
+        if clockwise:
+            return self.has_door(position_a)
+        return self.has_door(ring.neighbor(position_a, False))
+
+    def edge_between(
+        self, ring: SeatingRing, position_a: int, position_b: int
+    ) -> int:
+        """
+        Return the position that represents the edge between two adjacent seats
+        """
+        if ring.neighbor(position_a, True) == position_b:
+            return position_a
+        return position_b
+
+    def on_death(self, ring: SeatingRing, position: int):
+        """
+        Move the door of a seat that is about to die to the alive seat on its
+        left, whose right side is now the same edge. The ring must still
+        contain the seat.
+        """
+        if self.has_door(position):
+            self.remove(position)
+            self.add(ring.neighbor(position, False))
+
+    def to_list(self):
+        positions = []
+        mask, position = self.mask, 0
+        while mask:
+            if mask & 1:
+                positions.append(position)
+            mask >>= 1
+            position += 1
+        return positions
+
+
+# Cache of barrier indexes by game id
+barrier_indexes = {}
+
+
+def get_barriers(game_id: int) -> BarrierIndex:
+    """
+    Return the barrier index of a game, building it if it is not cached
+    """
+    barriers = barrier_indexes.get(int(game_id))
+    if barriers is None:
+        with db_session:
+            barriers = BarrierIndex(Game[game_id].obstacles)
+        barrier_indexes[int(game_id)] = barriers
+    return barriers
+
+
+def update_barriers(game_id: int, obstacles):
+    """
+    Replace the cached index of a game after its obstacles are committed
+    """
+    barrier_indexes[int(game_id)] = BarrierIndex(obstacles)
+
+
+def forget_barriers(game_id: int):
+    barrier_indexes.pop(int(game_id), None)
@@ -0,0 +1,44 @@
+"""
+This file contains forget_game, that drops every in-memory cache of a game
+when it finishes or is deleted. The caches are rebuilt from the database if
+the game is read again.
+
+The modules that import the games crud (and so can not be imported by it)
+register the function that drops their cache with game_cache.
+"""
+from src.theThing.games.barriers import forget_barriers
+from src.theThing.games.event_log import forget_event_log
+from src.theThing.games.idempotency import idempotency_cache
+from src.theThing.games.presence import presence
+from src.theThing.games.roles import forget_tally
+from src.theThing.games.seating import forget_ring
+from src.theThing.games.spectators import spectator_feeds
+from src.theThing.games.versions import forget_version
+from src.theThing.players.hand import forget_hands
+
+# Functions registered with game_cache, they receive the game id
+game_cache_cleaners = []
+
+
+def game_cache(cleaner):
+    """
+    Register a function that drops the cache of a game
+    """
+    game_cache_cleaners.append(cleaner)
+    return cleaner
+
+
+def forget_game(game_id: int):
+    game_id = int(game_id)
+    forget_ring(game_id)
+    forget_tally(game_id)
+    forget_barriers(game_id)
+    forget_hands(game_id)
+    forget_event_log(game_id)
+    forget_version(game_id)
+    idempotency_cache.forget_game(game_id)
+    presence.forget(game_id)
+    # a pending flush of the feed still sends its last updates
+    spectator_feeds.pop(game_id, None)
+    for cleaner in game_cache_cleaners:
+        cleaner(game_id)
@@ -5,9 +5,16 @@ from src.theThing.players.models import Player
 from src.theThing.players.crud import get_player
 from src.theThing.cards.schemas import CardCreate, CardBase
 from src.theThing.cards.models import Card
-from src.theThing.cards.crud import create_card
+from src.theThing.cards.crud import add_card_to_deck
 from src.theThing.cards.static_cards import dict_of_cards
 from src.theThing.messages.schemas import MessageOut
+from src.theThing.games.seating import update_direction
+from src.theThing.games.barriers import update_barriers
+from src.theThing.games.caches import forget_game
+from src.theThing.games.lobby import lobby
+from src.theThing.games.timers import cancel_turn_deadline
+from src.theThing.games.versions import touch_game
+from src.theThing.turn.crud import get_player_name
 from datetime import datetime
 
 
@@ -37,10 +44,43 @@ def create_game(game: schemas.GameCreate) -> schemas.GameOut:
                 max_players=game.max_players,
             )
         game.flush()
+        forget_game(game.id)
+        lobby_entry = lobby.entry_of(game)
         response = schemas.GameOut.model_validate(game)
+    lobby.track(response.id, lobby_entry)
     return response
 
 
+def turn_to_out_schema(turn) -> schemas.TurnOut:
+    """
+    This function returns the TurnOut schema of a turn, with the played cards
+    and the names of the destination players. It must be called inside a
+    db_session
+    """
+    played_card = None
+    response_card = None
+
+    if turn.played_card is not None:
+        played_card = models.Card[turn.played_card]
+    if turn.response_card is not None:
+        response_card = models.Card[turn.response_card]
+
+    return schemas.TurnOut(
+        owner=turn.owner,
+        played_card=played_card,
+        destination_player=get_player_name(
+            turn.game.id, turn.destination_player_id
+        )
+        or "",
+        response_card=response_card,
+        destination_player_exchange=get_player_name(
+            turn.game.id, turn.destination_player_exchange_id
+        )
+        or "",
+        state=turn.state,
+    )
+
+
 def get_game(game_id: int):
     """
     This function returns the GameOut schema from its id
@@ -49,29 +89,7 @@ def get_game(game_id: int):
     with db_session:
         game = models.Game[game_id]
         if game.turn is not None:
-            played_card = None
-            response_card = None
-            destination_player = ""
-
-            if game.turn.played_card is not None:
-                played_card = models.Card[game.turn.played_card]
-            if game.turn.response_card is not None:
-                response_card = models.Card[game.turn.response_card]
-            if game.turn.destination_player is not None:
-                destination_player = game.turn.destination_player
-            if game.turn.destination_player_exchange is not None:
-                destination_player_exchange = (
-                    game.turn.destination_player_exchange
-                )
-
-            return_turn = schemas.TurnOut(
-                owner=game.turn.owner,
-                played_card=played_card,
-                destination_player=destination_player,
-                response_card=response_card,
-                destination_player_exchange=destination_player_exchange,
-                state=game.turn.state,
-            )
+            return_turn = turn_to_out_schema(game.turn)
             ordered_chat = game.chat.order_by(lambda x: x.date)
             return_game = schemas.GameOut(
                 id=game.id,
@@ -95,6 +113,14 @@ def get_game(game_id: int):
     return response
 
 
+def get_game_state(game_id: int) -> int:
+    """
+    This function returns only the state of a game
+    """
+    with db_session:
+        return models.Game[game_id].state
+
+
 def get_full_game(game_id: int):
     """
     This function returns the GameInDB schema from its id
@@ -103,29 +129,7 @@ def get_full_game(game_id: int):
     with db_session:
         game = models.Game[game_id]
         if game.turn is not None:
-            played_card = None
-            response_card = None
-            destination_player = ""
-
-            if game.turn.played_card is not None:
-                played_card = models.Card[game.turn.played_card]
-            if game.turn.response_card is not None:
-                response_card = models.Card[game.turn.response_card]
-            if game.turn.destination_player is not None:
-                destination_player = game.turn.destination_player
-            if game.turn.destination_player_exchange is not None:
-                destination_player_exchange = (
-                    game.turn.destination_player_exchange
-                )
-
-            return_turn = schemas.TurnOut(
-                owner=game.turn.owner,
-                played_card=played_card,
-                destination_player=destination_player,
-                response_card=response_card,
-                destination_player_exchange=destination_player_exchange,
-                state=game.turn.state,
-            )
+            return_turn = turn_to_out_schema(game.turn)
             ordered_chat = game.chat.order_by(lambda x: x.date)
 
             # Convert game.players to a list o PlayerBase schemas
@@ -174,6 +178,9 @@ def delete_game(game_id: int):
     with db_session:
         game = models.Game[game_id]
         game.delete()
+    forget_game(game_id)
+    lobby.remove(game_id)
+    cancel_turn_deadline(game_id)
     return {"message": f"Partida {game_id} eliminada con éxito"}
 
 
@@ -185,26 +192,14 @@ def update_game(game_id: int, game: schemas.GameUpdate) -> schemas.GameInDB:
     with db_session:
         game_to_update = models.Game[game_id]
         game_to_update.set(**game.model_dump(exclude_unset=True))
+        touch_game(game_id)
         game_to_update.flush()
+        if game.state is not None:
+            lobby_entry = lobby.entry_of(game_to_update)
+            if game.state != 1:
+                cancel_turn_deadline(game_id)
         if game_to_update.turn is not None:
-            played_card = None
-            response_card = None
-            destination_player = ""
-
-            if game_to_update.turn.played_card is not None:
-                played_card = models.Card[game_to_update.turn.played_card]
-            if game_to_update.turn.response_card is not None:
-                response_card = models.Card[game_to_update.turn.response_card]
-            if game_to_update.turn.destination_player is not None:
-                destination_player = game_to_update.turn.destination_player
-
-            return_turn = schemas.TurnOut(
-                owner=game_to_update.turn.owner,
-                played_card=played_card,
-                destination_player=destination_player,
-                response_card=response_card,
-                state=game_to_update.turn.state,
-            )
+            return_turn = turn_to_out_schema(game_to_update.turn)
             ordered_chat = game_to_update.chat.order_by(lambda x: x.date)
             return_game = schemas.GameInDB(
                 id=game_to_update.id,
@@ -222,9 +217,18 @@ def update_game(game_id: int, game: schemas.GameUpdate) -> schemas.GameInDB:
                     for message in ordered_chat
                 ],
             )
-            return return_game
+            response = return_game
         else:
             response = schemas.GameInDB.model_validate(game_to_update)
+    if game.state is not None:
+        lobby.track(game_id, lobby_entry)
+    if game.play_direction is not None:
+        update_direction(game_id, game.play_direction)
+    if "obstacles" in game.model_fields_set:
+        update_barriers(game_id, game.obstacles)
+    # a finished game is only read again to show its result
+    if game.state in [2, 3]:
+        forget_game(game_id)
     return response
 
 
@@ -240,9 +244,10 @@ def create_game_deck(game_id: int, players_amount: int):
         if value["number_in_card"] <= players_amount
     }
 
-    # Create cards
-    for card in filtered_dict.values():
-        for _ in range(card["amount_in_deck"]):
+    # Create cards, all of them in the same transaction
+    with db_session:
+        game = models.Game[game_id]
+        for card in filtered_dict.values():
             new_card = CardCreate(
                 code=card["code"],
                 name=card["name"],
@@ -251,7 +256,9 @@ def create_game_deck(game_id: int, players_amount: int):
                 number_in_card=card["number_in_card"],
                 playable=True,
             )
-            create_card(new_card, game_id)
+            for _ in range(card["amount_in_deck"]):
+                add_card_to_deck(new_card, game)
+        touch_game(game_id)
 
 
 def save_log(game_id: int, log: str):
@@ -265,6 +272,7 @@ def save_log(game_id: int, log: str):
             "log": log,
         }
         game.logs.append(log_dict)
+        touch_game(game_id)
         game.flush()
 
 
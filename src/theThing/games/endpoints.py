@@ -1,21 +1,40 @@
-from fastapi import APIRouter, HTTPException
+from typing import Annotated, Optional
+from fastapi import (
+    APIRouter,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+)
 from pony.orm import ObjectNotFound as ExceptionObjectNotFound
 from pydantic import BaseModel
+from src.settings import LONG_POLL_TIMEOUT
 from src.theThing.games.socket_handler import *
 from .crud import (
     create_game,
     create_game_deck,
-    get_all_games,
     save_log,
     get_logs,
 )
 from .schemas import GameCreate, GameUpdate, GamePlayerAmount
+from .seating import get_ring
+from .lobby import lobby
+from .timers import turn_timeout_actions
+from .turn_machine import game_lock, turn_action
+from .idempotency import idempotent
+from .moves import PANIC_KEEPS, get_player_moves
+from .versions import game_etag, get_version, not_modified, wait_for_version
 from .utils import *
 from ..cards.crud import *
 from ..cards.effect_applications import effect_applications, exchange_defense
 from ..cards.special_effect_applications import apply_hac
-from ..players.crud import create_player, get_player, delete_player
-from ..players.schemas import PlayerCreate
+from ..players.crud import (
+    create_player,
+    get_player,
+    delete_player,
+    update_player,
+)
+from ..players.schemas import PlayerCreate, PlayerUpdate
 from ..turn.crud import create_turn, update_turn
 from ..turn.schemas import TurnCreate
 
@@ -71,6 +90,7 @@ async def create_new_game(game_data: GameWithHost):
     # Retrieve the full game data to get the host player id
     full_game = get_full_game(created_game.id)
     host_player = full_game.players[0]
+    await send_lobby_update(created_game.id)
 
     return {
         "message": f"Partida '{game_name}' creada por '{host_name}' con éxito",
@@ -113,6 +133,7 @@ async def join_game(join_info: dict):
             raise HTTPException(status_code=404, detail=str(e))
         else:
             raise HTTPException(status_code=422, detail=str(e))
+    await send_lobby_update(game_id)
 
     return {
         "message": "El jugador se unió con éxito",
@@ -161,12 +182,10 @@ async def start_game(game_start_info: dict):
         game = update_game(game_id, new_game_status)
     except Exception as e:
         raise HTTPException(status_code=422, detail=str(e))
+    await send_lobby_update(game_id)
 
     # Get name of the player with table position 2
-    for player in game.players:
-        if player.table_position == 2:
-            exchange_player = player.name
-            break
+    exchange_player = get_ring(game_id).player_at(2).name
 
     # Create turn structure
     try:
@@ -190,9 +209,16 @@ async def start_game(game_start_info: dict):
 
 # Endpoint to steal a card
 @router.put("/game/steal", status_code=200)
-async def steal_card(steal_data: dict):
+@turn_action("steal")
+@idempotent
+async def steal_card(
+    steal_data: dict,
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
     """
     Steal a card from the game deck.
+    Retries with the same Idempotency-Key header get the first response.
 
     Parameters:
         steal_data (dict): A dict containing game_id and player_id.
@@ -235,7 +261,9 @@ async def steal_card(steal_data: dict):
 
     # Update player and game status
     updated_player = get_player(player_id, game_id)
-    await send_player_status_to_player(player_id, updated_player)
+    await send_player_status_to_player(
+        player_id, updated_player, game_id
+    )
 
     updated_game = get_game(game_id)
     await send_game_status_to_players(game_id, updated_game)
@@ -267,9 +295,16 @@ async def steal_card(steal_data: dict):
 
 # Endpoint to play a card
 @router.put("/game/play", status_code=200)
-async def play_card(play_data: dict):
+@turn_action("play")
+@idempotent
+async def play_card(
+    play_data: dict,
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
     """
     Plays a card and Updates the turn structure
+    Retries with the same Idempotency-Key header get the first response.
 
     Parameters:
         play_data (dict): A dict containing game_id, player_id(who plays the card), card_id and destination_name.
@@ -341,7 +376,7 @@ async def play_card(play_data: dict):
     update_turn(game_id, updated_turn)
 
     player = get_player(player_id, game_id)
-    await send_player_status_to_player(player_id, player)
+    await send_player_status_to_player(player_id, player, game_id)
 
     updated_game = get_game(game_id)
     await send_game_status_to_players(game_id, updated_game)
@@ -367,7 +402,11 @@ async def play_card(play_data: dict):
 
 # Endpoint to discard a card
 @router.put("/game/discard", status_code=200)
-async def discard_card(discard_data: dict):
+@turn_action("discard")
+async def discard_card(
+    discard_data: dict,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
     """
     Discard card from the player hand. It updates the state of the turn.
 
@@ -424,7 +463,9 @@ async def discard_card(discard_data: dict):
         raise HTTPException(status_code=422, detail=str(e))
 
     # Send new status via socket
-    await send_player_status_to_player(player_id, updated_player)
+    await send_player_status_to_player(
+        player_id, updated_player, game_id
+    )
     updated_game = get_game(game_id)
     await send_game_status_to_players(game_id, updated_game)
 
@@ -445,7 +486,11 @@ async def discard_card(discard_data: dict):
     # Verify if there is an obstacle between players in the next exchange in order to jump to finishing turn
     try:
         verify_obstacles_for_exchange(
-            updated_game, updated_player, game.turn.destination_player_exchange
+            updated_game,
+            updated_player,
+            get_ring(game_id).player_named(
+                updated_game.turn.destination_player_exchange
+            ),
         )
     except Exception as e:
         if str(e) == "Existe una puerta atrancada":
@@ -465,7 +510,11 @@ async def discard_card(discard_data: dict):
 
 
 @router.put("/game/response-play", status_code=200)
-async def respond_to_action_card(response_data: dict):
+@turn_action("response_play")
+async def respond_to_action_card(
+    response_data: dict,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
     """
     Respond to an action card. It has to be requested just after a call to
     /game/play endpoint.
@@ -536,11 +585,7 @@ async def respond_to_action_card(response_data: dict):
             remove_card_from_player(
                 response_card_id, defending_player_id, game_id
             )
-            new_card = get_card_from_deck(game_id)
-            while new_card.kind == 4:
-                update_card(CardUpdate(id=new_card.id, state=0), game_id)
-                new_card = get_card_from_deck(game_id)
-            give_card_to_player(new_card.id, defending_player_id, game_id)
+            draw_cards(game_id, defending_player_id, 1, is_not_panic)
         except Exception as e:
             raise e
         # Update turn and add the response_card
@@ -561,18 +606,22 @@ async def respond_to_action_card(response_data: dict):
 
     updated_defending_player = get_player(defending_player_id, game_id)
     await send_player_status_to_player(
-        defending_player_id, updated_defending_player
+        defending_player_id, updated_defending_player, game_id
     )
 
     updated_attacking_player = get_player(attacking_player.id, game_id)
     await send_player_status_to_player(
-        attacking_player.id, updated_attacking_player
+        attacking_player.id, updated_attacking_player, game_id
     )
 
     # Verify if there is an obstacle between players in the next exchange in order to jump to finishing turn
     try:
         verify_obstacles_for_exchange(
-            updated_game, updated_attacking_player, updated_defending_player
+            updated_game,
+            updated_attacking_player,
+            get_ring(game_id).player_named(
+                updated_game.turn.destination_player_exchange
+            ),
         )
     except Exception as e:
         if str(e) == "Existe una puerta atrancada":
@@ -592,9 +641,16 @@ async def respond_to_action_card(response_data: dict):
 
 
 @router.put("/game/exchange", status_code=200)
-async def exchange_cards(exchange_data: dict):
+@turn_action("exchange")
+@idempotent
+async def exchange_cards(
+    exchange_data: dict,
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
     """
     Exchanging offer to another player.
+    Retries with the same Idempotency-Key header get the first response.
     Parameters:
         exchange_data (dict): A dict containing game_id, player_id(who plays the card), card_id.
     Returns:
@@ -641,7 +697,9 @@ async def exchange_cards(exchange_data: dict):
     updated_game = get_game(game_id)
     updated_player = get_player(player_id, game_id)
     await send_game_status_to_players(game_id, updated_game)
-    await send_player_status_to_player(player_id, updated_player)
+    await send_player_status_to_player(
+        player_id, updated_player, game_id
+    )
 
     message = f"{updated_player.name} le ofreció un intercambio a {updated_game.turn.destination_player_exchange}, esperando su respuesta"
     try:
@@ -653,7 +711,11 @@ async def exchange_cards(exchange_data: dict):
 
 
 @router.put("/game/response-exchange", status_code=200)
-async def response_exchange(response_ex_data: dict):
+@turn_action("response_exchange")
+async def response_exchange(
+    response_ex_data: dict,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
     """
     Response to an exchange offer.
 
@@ -723,11 +785,7 @@ async def response_exchange(response_ex_data: dict):
             remove_card_from_player(
                 defense_card_id, defending_player_id, game_id
             )
-            new_card = get_card_from_deck(game_id)
-            while new_card.kind == 4:
-                update_card(CardUpdate(id=new_card.id, state=0), game_id)
-                new_card = get_card_from_deck(game_id)
-            give_card_to_player(new_card.id, defending_player_id, game_id)
+            draw_cards(game_id, defending_player_id, 1, is_not_panic)
             # the turn update is performed inside the defense function
             message = f"{defending_player.name} se defendió con {defense_card.name} del intercambio con {exchanging_offerer.name}"
             save_log(game_id, message)
@@ -744,14 +802,19 @@ async def response_exchange(response_ex_data: dict):
     updated_offerer = get_player(exchanging_offerer.id, game_id)
     updated_defending = get_player(defending_player.id, game_id)
 
-    await send_player_status_to_player(exchanging_offerer.id, updated_offerer)
-    await send_player_status_to_player(defending_player.id, updated_defending)
+    await send_player_status_to_player(
+        exchanging_offerer.id, updated_offerer, game_id
+    )
+    await send_player_status_to_player(
+        defending_player.id, updated_defending, game_id
+    )
     await send_game_status_to_players(game_id, updated_game)
 
     return {"message": "Intercambio finalizado"}
 
 
 @router.put("/game/declare-victory")
+@turn_action("declare_victory")
 async def declare_victory(data: dict):
     """
     Get the results of a game when La Cosa declares its victory.
@@ -783,33 +846,48 @@ async def declare_victory(data: dict):
 
 
 @router.get("/game/list")
-async def get_list_of_games():
+async def get_list_of_games(
+    request: Request,
+    response: Response,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    free_seats: int = 0,
+    name: Optional[str] = None,
+):
     """
-    Get a list of games.
+    Get a list of the games waiting for players.
+
+    Args:
+        offset (int): The amount of games to skip.
+        limit (int): The maximum amount of games to return, all if not given.
+        free_seats (int): The minimum amount of free seats of the games.
+        name (str): Prefix of the name of the games.
 
     Returns:
         list: A list of JSON responses containing the game information.
-    """
-    full_list = get_all_games()
-    games_to_return = []
-
-    for game in full_list:
-        if game.state == 0:
-            game_with_amount = GamePlayerAmount(
-                name=game.name,
-                id=game.id,
-                min_players=game.min_players,
-                max_players=game.max_players,
-                amount_of_players=len(game.players),
-            )
-
-            games_to_return.append(game_with_amount)
 
-    return games_to_return
+    Answers 304 if the If-None-Match header matches the ETag
+    """
+    cached = not_modified(request, response, lobby.etag())
+    if cached:
+        return cached
+    games = lobby.list(offset, limit, free_seats, name)
+    return [
+        GamePlayerAmount(
+            name=game.name,
+            id=game.id,
+            min_players=game.min_players,
+            max_players=game.max_players,
+            amount_of_players=game.amount_of_players,
+        )
+        for game in games
+    ]
 
 
 @router.get("/game/{game_id}")
-async def get_game_by_id(game_id: int):
+async def get_game_by_id(
+    game_id: int, request: Request, response: Response
+):
     """
     Get a game by its ID.
 
@@ -821,7 +899,12 @@ async def get_game_by_id(game_id: int):
 
     Raises:
         HTTPException: If the game does not exist.
+
+    Answers 304 if the If-None-Match header matches the ETag
     """
+    cached = not_modified(request, response, game_etag(game_id, "game"))
+    if cached:
+        return cached
     try:
         game = get_game(game_id)
     except ExceptionObjectNotFound as e:
@@ -834,8 +917,53 @@ async def get_game_by_id(game_id: int):
     return game
 
 
+@router.get("/game/{game_id}/wait")
+async def wait_game_change(
+    game_id: int,
+    since: int,
+    request: Request,
+    timeout: float = LONG_POLL_TIMEOUT,
+):
+    """
+    Wait until the game changes from the version since, for the clients that
+    can not use the socket.
+
+    Args:
+        game_id (int): The ID of the game to wait for.
+        since (int): The last version of the game known by the client.
+        timeout (float): Maximum seconds to wait, up to LONG_POLL_TIMEOUT.
+
+    Returns:
+        dict: The new version and the game information. If the game did not
+        change before the timeout, 304 when the request has an If-None-Match
+        header and 204 otherwise.
+
+    Raises:
+        HTTPException: If the game does not exist.
+    """
+    timeout = max(0, min(timeout, LONG_POLL_TIMEOUT))
+    try:
+        changed = await wait_for_version(game_id, since, timeout)
+        if not changed:
+            status_code = 304 if "if-none-match" in request.headers else 204
+            return Response(
+                status_code=status_code,
+                headers={"ETag": game_etag(game_id, "game")},
+            )
+        # the running action of the game may be in the middle of a change
+        async with game_lock(game_id):
+            version = get_version(game_id)
+            game = get_game(game_id)
+    except ExceptionObjectNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return {"version": version, "game": game}
+
+
 @router.get("/game/{game_id}/get-logs")
-async def get_game_logs(game_id: int):
+async def get_game_logs(
+    game_id: int, request: Request, response: Response
+):
     """
     Get the logs of a game by its ID.
 
@@ -847,7 +975,12 @@ async def get_game_logs(game_id: int):
 
     Raises:
         HTTPException: If the game does not exist.
+
+    Answers 304 if the If-None-Match header matches the ETag
     """
+    cached = not_modified(request, response, game_etag(game_id, "logs"))
+    if cached:
+        return cached
     try:
         logs = get_logs(game_id)
     except ExceptionObjectNotFound as e:
@@ -857,7 +990,9 @@ async def get_game_logs(game_id: int):
 
 
 @router.get("/game/{game_id}/player/{player_id}")
-async def get_player_by_id(game_id: int, player_id: int):
+async def get_player_by_id(
+    game_id: int, player_id: int, request: Request, response: Response
+):
     """
     Get a player by its ID.
 
@@ -870,7 +1005,13 @@ async def get_player_by_id(game_id: int, player_id: int):
 
     Raises:
         HTTPException: If the game or player do not exist.
+
+    Answers 304 if the If-None-Match header matches the ETag
     """
+    etag = game_etag(game_id, f"player-{player_id}")
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
     try:
         player = get_player(player_id, game_id)
     except ExceptionObjectNotFound as e:
@@ -881,6 +1022,39 @@ async def get_player_by_id(game_id: int, player_id: int):
     return player
 
 
+@router.get("/game/{game_id}/player/{player_id}/moves")
+async def get_player_moves_by_id(
+    game_id: int, player_id: int, request: Request, response: Response
+):
+    """
+    Get the legal moves of a player in the current state of the game.
+
+    Args:
+        game_id (int): The ID of the game the player belongs to.
+        player_id (int): The ID of the player.
+
+    Returns:
+        dict: The cards the player can play (with their targets), discard,
+        exchange or defend with, and if the player can steal, respond or
+        finish the turn.
+
+    Raises:
+        HTTPException: If the game or player do not exist.
+
+    Answers 304 if the If-None-Match header matches the ETag
+    """
+    etag = game_etag(game_id, f"moves-{player_id}")
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    try:
+        moves = get_player_moves(game_id, player_id)
+    except ExceptionObjectNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return moves
+
+
 @router.put("/game/{game_id}/player/{player_id}/leave")
 async def leave_game(game_id: int, player_id: int):
     """
@@ -917,13 +1091,21 @@ async def leave_game(game_id: int, player_id: int):
     # send game status to players
     game_to_send = get_game(game_id)
     await send_game_status_to_players(game_id, game_to_send)
+    await send_lobby_update(game_id)
     return response
 
 
 @router.put("/turn/finish")
-async def finish_turn(finish_data: dict):
+@turn_action("finish_turn")
+@idempotent
+async def finish_turn(
+    finish_data: dict,
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+    if_match: Annotated[Optional[str], Header()] = None,
+):
     """
     Finish a turn.
+    Retries with the same Idempotency-Key header get the first response.
     """
     # Check valid inputs
     if not finish_data or not finish_data["game_id"]:
@@ -960,10 +1142,7 @@ async def finish_turn(finish_data: dict):
         return response  # return the winners
 
     # Get name of the next turn owner
-    for player in updated_game.players:
-        if player.table_position == updated_game.turn.owner:
-            new_owner_name = player.name
-            break
+    new_owner_name = get_ring(game_id).player_at(updated_game.turn.owner).name
 
     message = f"Turno finalizado. Ahora el turno es de {new_owner_name}"
     try:
@@ -975,3 +1154,147 @@ async def finish_turn(finish_data: dict):
         game_id, message, new_owner_name, updated_game.turn.owner
     )
     return {"message": message}
+
+
+# Default actions run by the turn timers when a turn state expires
+async def try_with_each_card(player_id: int, game_id: int, action):
+    """
+    Runs the action with the cards of the player until one of them is valid.
+    If none is, the turn is moved to its end so the game does not stop.
+    """
+    state = get_game(game_id).turn.state
+    for card in get_player(player_id, game_id).hand:
+        try:
+            return await action(card.id)
+        except Exception:
+            continue
+    if get_game(game_id).turn.state == state:
+        await skip_to_finish(game_id)
+
+
+async def skip_to_finish(game_id: int):
+    """
+    Move the turn to its end when its default action can not be applied,
+    withdrawing the exchange offer of the turn owner if there is one
+    """
+    owner = get_ring(game_id).player_at(get_game(game_id).turn.owner)
+    if get_player(owner.id, game_id).card_to_exchange is not None:
+        updated_owner = update_player(
+            PlayerUpdate(card_to_exchange=None), owner.id, game_id
+        )
+        await send_player_status_to_player(owner.id, updated_owner, game_id)
+    update_turn(game_id, TurnCreate(state=5))
+    await send_game_status_to_players(game_id, get_game(game_id))
+
+
+async def timeout_steal(game_id: int, state: int):
+    owner = get_ring(game_id).player_at(get_game(game_id).turn.owner)
+    await steal_card({"game_id": game_id, "player_id": owner.id})
+
+
+async def timeout_discard(game_id: int, state: int):
+    owner = get_ring(game_id).player_at(get_game(game_id).turn.owner)
+
+    async def discard(card_id):
+        return await discard_card(
+            {"game_id": game_id, "player_id": owner.id, "card_id": card_id}
+        )
+
+    await try_with_each_card(owner.id, game_id, discard)
+
+
+async def timeout_response(game_id: int, state: int):
+    # the defending player does not defend
+    game = get_game(game_id)
+    defending = get_ring(game_id).player_named(game.turn.destination_player)
+    await respond_to_action_card(
+        {
+            "game_id": game_id,
+            "player_id": defending.id,
+            "response_card_id": None,
+        }
+    )
+
+
+async def timeout_exchange(game_id: int, state: int):
+    owner = get_ring(game_id).player_at(get_game(game_id).turn.owner)
+
+    async def exchange(card_id):
+        return await exchange_cards(
+            {"game_id": game_id, "player_id": owner.id, "card_id": card_id}
+        )
+
+    await try_with_each_card(owner.id, game_id, exchange)
+
+
+async def timeout_response_exchange(game_id: int, state: int):
+    game = get_game(game_id)
+    defending = get_ring(game_id).player_named(
+        game.turn.destination_player_exchange
+    )
+
+    async def response(card_id):
+        return await response_exchange(
+            {
+                "game_id": game_id,
+                "defending_player_id": defending.id,
+                "exchange_card_id": card_id,
+                "defense_card_id": None,
+            }
+        )
+
+    await try_with_each_card(defending.id, game_id, response)
+
+
+async def timeout_panic(game_id: int, state: int):
+    # the owner applies the panic card giving away his first cards that it
+    # can take, as in his moves
+    game = get_game(game_id)
+    owner = get_ring(game_id).player_at(game.turn.owner)
+    panic_card = game.turn.played_card
+    cards = [
+        card.id
+        for card in get_player(owner.id, game_id).hand
+        if card.code not in PANIC_KEEPS
+    ]
+    data = {
+        "game_id": game_id,
+        "player_id": owner.id,
+        "panic_card_id": panic_card.id,
+    }
+    if panic_card.code == "cac" and cards:
+        await apply_cac_action({**data, "card_id": cards[0]})
+    elif panic_card.code == "olv" and len(cards) >= 3:
+        await apply_olv_action({**data, "card_id": cards[:3]})
+    else:
+        await skip_to_finish(game_id)
+
+
+async def timeout_finish_turn(game_id: int, state: int):
+    await finish_turn({"game_id": game_id})
+
+
+async def run_timeout_action(game_id: int, state: int):
+    """
+    Runs the default action of a turn state if the turn is still in it
+    """
+    async with game_lock(game_id):
+        game = get_game(game_id)
+        if game.state != 1 or game.turn is None or game.turn.state != state:
+            return
+        await turn_timeout_defaults[state](game_id, state)
+
+
+turn_timeout_defaults = {
+    0: timeout_steal,
+    1: timeout_discard,
+    2: timeout_response,
+    3: timeout_exchange,
+    4: timeout_response_exchange,
+    5: timeout_finish_turn,
+    6: timeout_panic,
+}
+
+turn_timeout_actions.update(
+    {state: run_timeout_action for state in turn_timeout_defaults}
+)
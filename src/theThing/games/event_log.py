@@ -0,0 +1,98 @@
+"""
+This file contains the log of the events sent to the players of each game.
+Every event gets a sequence number that is sent with it. When a client
+reconnects it sends the last number it saw (the resume token) and only the
+events it missed are sent again.
+
+The status events are logged too, so the replay brings the client up to date
+without a full snapshot. The player_status is only replayed to its player.
+"""
+from collections import deque
+from typing import NamedTuple, Optional
+from src.settings import EVENT_LOG_SIZE
+
+
+class LoggedEvent(NamedTuple):
+    seq: int
+    event: str
+    data: dict
+    compact_data: dict
+    # the player the event was sent to, None if it was sent to the game
+    player_id: Optional[int] = None
+
+
+# Only the last of these events is replayed, it replaces the previous ones
+STATUS_EVENTS = ("game_status", "player_status")
+
+
+class EventLog:
+    def __init__(self, size: int = EVENT_LOG_SIZE):
+        self.events = deque(maxlen=size)
+        self.seq = 0
+
+    def record(
+        self,
+        event: str,
+        data: dict,
+        compact_data: dict = None,
+        player_id: int = None,
+    ):
+        """
+        Save an event and return it with its sequence number in the data
+        """
+        self.seq += 1
+        logged = LoggedEvent(
+            seq=self.seq,
+            event=event,
+            data={**data, "seq": self.seq},
+            compact_data=(
+                {**compact_data, "seq": self.seq}
+                if compact_data is not None
+                else None
+            ),
+            player_id=int(player_id) if player_id is not None else None,
+        )
+        self.events.append(logged)
+        return logged
+
+    def since(self, seq: int, player_id: int = None):
+        """
+        Return the events after seq sent to the game or to player_id, or None
+        if some of them are no longer in the log (or seq is not from this log)
+        and the client must be sent a full snapshot instead
+        """
+        if seq > self.seq:
+            return None
+        if seq < self.seq - len(self.events):
+            return None
+        player_id = int(player_id) if player_id is not None else None
+        missed = []
+        replaced = set()
+        for event in reversed(self.events):
+            if event.seq <= seq:
+                break
+            if event.player_id is not None and event.player_id != player_id:
+                continue
+            if event.event in STATUS_EVENTS:
+                if event.event in replaced:
+                    continue
+                replaced.add(event.event)
+            missed.append(event)
+        missed.reverse()
+        return missed
+
+
+# Event logs by game id
+event_logs = {}
+
+
+def get_event_log(game_id: int) -> EventLog:
+    log = event_logs.get(int(game_id))
+    if log is None:
+        log = EventLog()
+        event_logs[int(game_id)] = log
+    return log
+
+
+def forget_event_log(game_id: int):
+    event_logs.pop(int(game_id), None)
@@ -0,0 +1,83 @@
+"""
+This file contains the handling of the Idempotency-Key header of the game
+actions. The clients retry the requests on timeouts, the response of the
+first one is stored and returned to the retries without running the action
+again.
+"""
+import functools
+from collections import OrderedDict
+from src.settings import IDEMPOTENCY_CACHE_SIZE
+
+
+class IdempotencyCache:
+    """
+    LRU cache of responses keyed by (game, player, idempotency key)
+    """
+
+    def __init__(self, size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.size = size
+        self.responses = OrderedDict()
+
+    def __len__(self):
+        return len(self.responses)
+
+    def clear(self):
+        self.responses.clear()
+
+    def forget_game(self, game_id: int):
+        # the game id of the key is the one of the request data, as sent
+        stale = [key for key in self.responses if str(key[0]) == str(game_id)]
+        for key in stale:
+            del self.responses[key]
+
+    def get(self, key):
+        response = self.responses.get(key)
+        if response is not None:
+            self.responses.move_to_end(key)
+        return response
+
+    def put(self, key, response):
+        self.responses[key] = response
+        self.responses.move_to_end(key)
+        if len(self.responses) > self.size:
+            self.responses.popitem(last=False)
+
+
+idempotency_cache = IdempotencyCache()
+
+
+def response_key(data: dict, idempotency_key: str):
+    return (data.get("game_id"), data.get("player_id"), idempotency_key)
+
+
+def stored_response(data: dict, idempotency_key: str):
+    """
+    Return the response of the action already run with the key, if any
+    """
+    if idempotency_key is None:
+        return None
+    return idempotency_cache.get(response_key(data, idempotency_key))
+
+
+def idempotent(endpoint):
+    """
+    Decorator for the endpoints that receive the action data as a dict and
+    declare an idempotency_key header parameter. Only the successful
+    responses are stored.
+    """
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, idempotency_key=None, **kwargs):
+        if idempotency_key is None:
+            return await endpoint(*args, **kwargs)
+        data = args[0] if args else next(iter(kwargs.values()))
+        key = response_key(data, idempotency_key)
+        response = idempotency_cache.get(key)
+        if response is None:
+            response = await endpoint(
+                *args, idempotency_key=idempotency_key, **kwargs
+            )
+            idempotency_cache.put(key, response)
+        return response
+
+    return wrapper
@@ -0,0 +1,123 @@
+"""
+This file contains the lobby index: the games that are waiting for players,
+kept in memory so the game list is served without querying the database.
+
+The index is loaded from the database the first time it is needed and then
+updated by the crud functions that create, join, leave or start a game,
+once their change is committed.
+"""
+
+import uuid
+from typing import NamedTuple
+from pony.orm import db_session
+from src.theThing.games.models import Game
+
+
+class LobbyEntry(NamedTuple):
+    id: int
+    name: str
+    min_players: int
+    max_players: int
+    amount_of_players: int
+    has_password: bool
+
+    @property
+    def free_seats(self) -> int:
+        return self.max_players - self.amount_of_players
+
+
+class Lobby:
+    def __init__(self):
+        self.games = {}
+        self.loaded = False
+        # Incremented on every change, with the epoch it is the ETag of the
+        # game list. The epoch changes with each process, since the version
+        # starts again from 0.
+        self.version = 0
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def clear(self):
+        self.games = {}
+        self.loaded = False
+        self.version += 1
+
+    def load(self):
+        with db_session:
+            self.games = {}
+            for game in Game.select(state=0):
+                self._add(game)
+        self.loaded = True
+        self.version += 1
+
+    def _add(self, game):
+        self.version += 1
+        self.games[game.id] = self.entry_of(game)
+
+    @staticmethod
+    def entry_of(game):
+        """
+        Build the entry of a game, or None if it is not waiting for players.
+        It must be called inside the db_session of the change.
+        """
+        if game.state != 0:
+            return None
+        return LobbyEntry(
+            id=game.id,
+            name=game.name,
+            min_players=game.min_players,
+            max_players=game.max_players,
+            amount_of_players=len(game.players),
+            has_password=bool(game.password),
+        )
+
+    def track(self, game_id: int, entry):
+        """
+        Update the entry of a game after its change was committed, with the
+        entry built by entry_of inside the db_session
+        """
+        if not self.loaded:
+            return
+        if entry is None:
+            self.remove(game_id)
+        else:
+            self.version += 1
+            self.games[game_id] = entry
+
+    def remove(self, game_id: int):
+        if self.games.pop(game_id, None) is not None:
+            self.version += 1
+
+    def etag(self) -> str:
+        if not self.loaded:
+            self.load()
+        return f'"lobby-{self.epoch}-{self.version}"'
+
+    def get(self, game_id: int):
+        if not self.loaded:
+            self.load()
+        return self.games.get(game_id)
+
+    def list(
+        self,
+        offset: int = 0,
+        limit: int = None,
+        free_seats: int = 0,
+        name_prefix: str = None,
+    ):
+        """
+        Return the waiting games ordered by id, keeping the ones with at least
+        free_seats free seats and a name that starts with name_prefix
+        """
+        if not self.loaded:
+            self.load()
+        games = [
+            entry
+            for entry in sorted(self.games.values())
+            if entry.free_seats >= free_seats
+            and (not name_prefix or entry.name.startswith(name_prefix))
+        ]
+        end = offset + limit if limit is not None else None
+        return games[offset:end]
+
+
+lobby = Lobby()
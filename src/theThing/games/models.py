@@ -29,6 +29,7 @@ class Game(db.Entity):
     logs = Optional(Json)
     obstacles = Optional(IntArray)
     special_configs = Optional(Json)
+    version = Required(int, default=0)  # incremented on every change
 
     # on create, create a list to save in logs
     def before_insert(self):
@@ -0,0 +1,182 @@
+"""
+This file contains the legal moves of the players: for the current state of
+the turn, the cards each player can play (and on whom), discard, exchange or
+defend with. They follow the validations of the endpoints, but read the
+seating ring, the locked doors, the role tally and the hand index instead of
+running the validations card by card.
+
+The moves are computed once per game version: the game is read once for all
+the players of a version and the moves of each player are kept until the
+version changes.
+"""
+
+from src.theThing.cards.card_rules import CardRule, get_card_rule
+from src.theThing.games.barriers import get_barriers
+from src.theThing.games.caches import game_cache
+from src.theThing.games.crud import get_game
+from src.theThing.games.roles import INFECTED, HUMAN, THE_THING, get_tally
+from src.theThing.games.schemas import GameOut
+from src.theThing.games.seating import get_ring
+from src.theThing.games.turn_machine import allows
+from src.theThing.games.versions import get_version
+from src.theThing.players.crud import get_player
+from src.theThing.players.schemas import CardMove, PlayerBase, PlayerMoves
+
+# Cards that defend from an exchange, see exchange_defense
+EXCHANGE_DEFENSES = frozenset(["ate", "ngs", "fal"])
+
+# Cards that a panic card can not take from the hand
+PANIC_KEEPS = frozenset(["lco"])
+
+# Last game read by game id, as (version, game)
+turn_views = {}
+
+# Last moves computed by (game id, player id)
+player_moves = {}
+
+
+@game_cache
+def forget_moves(game_id: int):
+    turn_views.pop(game_id, None)
+    for key in [key for key in player_moves if key[0] == game_id]:
+        del player_moves[key]
+
+
+def exchangeable_cards(player: PlayerBase, partner_role: int, offer: bool):
+    """
+    Return the ids of the cards the player can give in an exchange with a
+    player of partner_role. offer is True for the player that starts it.
+    """
+    cards = []
+    for card in player.hand or []:
+        if card.code == "lco":
+            continue
+        if offer and card.playable is False:
+            continue
+        if card.code == "inf":
+            if player.role == HUMAN:
+                continue
+            if player.role == INFECTED and partner_role != THE_THING:
+                continue
+        if player.role == INFECTED and player.hand_index.is_last_infection(
+            card
+        ):
+            continue
+        cards.append(card.id)
+    return cards
+
+
+def play_targets(player: PlayerBase, card, ring, barriers):
+    rule = get_card_rule(card.code, card.kind)
+    targets = []
+    for seat in ring.alive_seats():
+        if seat.id == player.id:
+            if rule & CardRule.TARGET_SELF:
+                targets.append(seat.name)
+            continue
+        if not rule & CardRule.TARGET_ANY and not ring.are_adjacent(
+            player.table_position, seat.table_position
+        ):
+            continue
+        if (
+            barriers
+            and not rule & CardRule.IGNORES_OBSTACLES
+            and barriers.between(
+                ring, player.table_position, seat.table_position
+            )
+        ):
+            continue
+        targets.append(seat.name)
+    return targets
+
+
+def legal_moves(game: GameOut, player: PlayerBase) -> PlayerMoves:
+    """
+    Compute the moves the player can make in the current state of the game
+    """
+    moves = PlayerMoves()
+    if game.state != 1 or game.turn is None or not player.alive:
+        return moves
+    turn = game.turn
+    ring = get_ring(game.id)
+    owner = ring.player_at(turn.owner)
+    is_owner = owner is not None and owner.id == player.id
+    hand = player.hand or []
+
+    if allows(turn.state, "steal"):
+        moves.steal = is_owner and len(hand) < 5
+    elif allows(turn.state, "play") and is_owner and len(hand) > 4:
+        barriers = get_barriers(game.id)
+        for card in hand:
+            if card.state == 0 or card.playable is False:
+                continue
+            if get_card_rule(card.code, card.kind) & CardRule.PLAYABLE:
+                targets = play_targets(player, card, ring, barriers)
+                if targets:
+                    moves.play.append(
+                        CardMove(card_id=card.id, targets=targets)
+                    )
+            if card.kind != 5 and not (
+                player.role == INFECTED
+                and player.hand_index.is_last_infection(card)
+            ):
+                moves.discard.append(card.id)
+    elif (
+        allows(turn.state, "response_play")
+        and turn.destination_player == player.name
+    ):
+        moves.respond = True
+        if len(hand) == 4:
+            moves.defend = [card.id for card in hand if card.kind == 1]
+    elif allows(turn.state, "exchange") and is_owner:
+        partner = ring.player_named(turn.destination_player_exchange)
+        if partner is not None:
+            partner_role = get_tally(game.id).role_of(partner.id)
+            moves.exchange = exchangeable_cards(player, partner_role, True)
+    elif (
+        allows(turn.state, "response_exchange")
+        and turn.destination_player_exchange == player.name
+        and owner is not None
+    ):
+        owner_role = get_tally(game.id).role_of(owner.id)
+        moves.exchange = exchangeable_cards(player, owner_role, False)
+        moves.defend_exchange = [
+            card.id for card in hand if card.code in EXCHANGE_DEFENSES
+        ]
+    elif (allows(turn.state, "cac") or allows(turn.state, "olv")) and is_owner:
+        panic_card = turn.played_card
+        if panic_card is not None and allows(turn.state, panic_card.code):
+            moves.panic = panic_card.code
+            moves.panic_cards = [
+                card.id for card in hand if card.code not in PANIC_KEEPS
+            ]
+    elif allows(turn.state, "finish_turn"):
+        moves.finish_turn = is_owner
+    return moves
+
+
+def get_player_moves(game_id: int, player_id: int, player=None):
+    """
+    Return the legal moves of a player for the current version of the game.
+    The player can be given if it was already read, then the moves are not
+    kept since the player may be older than the version.
+    """
+    key = (int(game_id), int(player_id))
+    version = get_version(game_id)
+    cached = player_moves.get(key)
+    if player is None and cached is not None and cached.version == version:
+        return cached
+    view = turn_views.get(key[0])
+    if view is None or view[0] != version:
+        view = (version, get_game(game_id))
+        turn_views[key[0]] = view
+    game = view[1]
+    moves = legal_moves(game, player or get_player(player_id, game_id))
+    moves.version = version
+    if game.state != 1:
+        # the game is not being played, nothing to keep
+        turn_views.pop(key[0], None)
+        player_moves.pop(key, None)
+    elif player is None:
+        player_moves[key] = moves
+    return moves
@@ -0,0 +1,111 @@
+"""
+This file contains the outbound queue of each socket connection. The events
+wait in the outbox while the transport of the socket has too many packets
+not yet written, so a slow client can not make the server buffer unbounded
+data: a status snapshot drops the previous one that is still waiting and is
+queued last, so it is not sent before the events it follows, the rest of the
+events keep their order, and a client whose outbox goes over
+the high water mark is disconnected.
+"""
+
+import asyncio
+from collections import deque
+from src.settings import OUTBOX_HIGH_WATER, FAN_OUT_CONCURRENCY
+
+# Events that are a full snapshot, only the last one is worth sending
+COALESCED_EVENTS = {"game_status", "player_status"}
+
+
+def drop_stale(pending, is_stale):
+    """
+    Remove from pending the waiting snapshot that is_stale matches, there is
+    at most one
+    """
+    for i, entry in enumerate(pending):
+        if is_stale(entry):
+            del pending[i]
+            return
+
+
+class Outbox:
+    def __init__(self, send, backlog, high_water: int = OUTBOX_HIGH_WATER):
+        """
+        send is the coroutine that writes an event to the socket and backlog
+        returns the amount of packets the transport has not written yet
+        """
+        self.send = send
+        self.backlog = backlog
+        self.high_water = high_water
+        self.pending = deque()
+        self.lock = asyncio.Lock()
+        self.drainer = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def put(self, event: str, data) -> bool:
+        """
+        Queue an event. It returns False if the outbox is over the high
+        water mark
+        """
+        if event in COALESCED_EVENTS:
+            drop_stale(self.pending, lambda entry: entry[0] == event)
+        self.pending.append([event, data])
+        return len(self.pending) <= self.high_water
+
+    def idle(self) -> bool:
+        """
+        True if nothing is waiting and the transport accepts more packets, so
+        an event can be written without going through the outbox
+        """
+        return not self.pending and self.backlog() < self.high_water
+
+    async def flush(self) -> bool:
+        """
+        Send the pending events while the transport accepts them. It returns
+        True if the outbox is empty
+        """
+        async with self.lock:
+            while self.pending and self.backlog() < self.high_water:
+                event, data = self.pending.popleft()
+                await self.send(event, data)
+        return not self.pending
+
+
+class EmitBuffer:
+    """
+    Broadcasts held back while a batch of actions runs, to be sent together
+    at the end. As in the outbox, a status snapshot drops the previous one of
+    the same room and is queued last.
+    """
+
+    def __init__(self):
+        self.pending = []
+
+    def __len__(self):
+        return len(self.pending)
+
+    def put(self, event: str, data, room: str, skip_sid=()):
+        if event in COALESCED_EVENTS:
+            drop_stale(
+                self.pending,
+                lambda entry: entry[0] == event and entry[2] == room,
+            )
+        self.pending.append([event, data, room, tuple(skip_sid)])
+
+
+async def fan_out(deliveries, limit: int = FAN_OUT_CONCURRENCY):
+    """
+    Runs the delivery coroutines concurrently, at most limit at a time. An
+    error in one of them does not stop the others, the errors are returned
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(delivery):
+        async with semaphore:
+            await delivery
+
+    results = await asyncio.gather(
+        *(run(delivery) for delivery in deliveries), return_exceptions=True
+    )
+    return [result for result in results if isinstance(result, Exception)]
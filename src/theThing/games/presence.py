@@ -0,0 +1,74 @@
+"""
+This file contains the presence registry: which sockets are connected to
+each game and when the game had activity for the last time. The idle game
+reaper uses it to abort the games nobody is connected to.
+"""
+import time
+from collections import Counter
+
+
+class Presence:
+    def __init__(self):
+        self.sockets = {}
+        self.connected = Counter()
+        # game of each connected player
+        self.players = {}
+        self.last_activity = {}
+
+    def connect(self, sid: str, game_id: int, player_id: int = None):
+        self.disconnect(sid)
+        self.sockets[sid] = (int(game_id), player_id)
+        self.connected[int(game_id)] += 1
+        if player_id is not None:
+            self.players[int(player_id)] = int(game_id)
+        self.touch(game_id)
+
+    def disconnect(self, sid: str):
+        entry = self.sockets.pop(sid, None)
+        if entry is None:
+            return
+        game_id, player_id = entry
+        if player_id is not None and all(
+            other != player_id for _, other in self.sockets.values()
+        ):
+            self.players.pop(int(player_id), None)
+        self.connected[game_id] -= 1
+        if self.connected[game_id] <= 0:
+            del self.connected[game_id]
+        self.touch(game_id)
+
+    def touch(self, game_id: int, now: float = None):
+        self.last_activity[int(game_id)] = (
+            now if now is not None else time.monotonic()
+        )
+
+    def game_of_player(self, player_id: int):
+        """
+        Return the game of a connected player, or None
+        """
+        return self.players.get(int(player_id))
+
+    def connected_count(self, game_id: int) -> int:
+        return self.connected[int(game_id)]
+
+    def forget(self, game_id: int):
+        self.last_activity.pop(int(game_id), None)
+
+    def idle_games(self, game_ids, ttl: float, now: float = None):
+        """
+        Return the games, among game_ids and the ones with activity, that
+        have no connected sockets since ttl seconds ago. The games seen for
+        the first time start counting now.
+        """
+        now = now if now is not None else time.monotonic()
+        idle = []
+        for game_id in set(game_ids) | set(self.last_activity):
+            if self.connected[game_id] > 0:
+                continue
+            last = self.last_activity.setdefault(game_id, now)
+            if now - last >= ttl:
+                idle.append(game_id)
+        return sorted(idle)
+
+
+presence = Presence()
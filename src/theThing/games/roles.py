@@ -0,0 +1,115 @@
+"""
+This file contains the role tally of the games: the role and liveness of each
+player and the amount of alive players of each role, so the end of a game is
+checked without loading all its players.
+
+The tallies are cached by game id. They are built from the database the first
+time they are needed and then updated by update_player, the only function
+that changes roles (infections and role assignment) and kills players.
+"""
+from collections import Counter
+from typing import NamedTuple
+from pony.orm import db_session
+from src.theThing.games.models import Game
+
+HUMAN = 1
+INFECTED = 2
+THE_THING = 3
+
+
+class Role(NamedTuple):
+    name: str
+    role: int
+    alive: bool
+
+
+class RoleTally:
+    def __init__(self, players=()):
+        """
+        players are (id, name, role, alive) tuples
+        """
+        self.players = {}
+        self.alive = Counter()
+        self.the_thing = None
+        for player_id, name, role, alive in players:
+            self.update(player_id, name, role, alive)
+
+    def __len__(self):
+        return len(self.players)
+
+    def update(self, player_id: int, name: str, role: int, alive: bool):
+        old = self.players.get(player_id)
+        if old is not None and old.alive:
+            self.alive[old.role] -= 1
+        self.players[player_id] = Role(name, role, bool(alive))
+        if alive:
+            self.alive[role] += 1
+        if role == THE_THING:
+            self.the_thing = player_id
+        elif self.the_thing == player_id:
+            self.the_thing = None
+
+    def role_of(self, player_id: int):
+        player = self.players.get(player_id)
+        return player.role if player is not None else None
+
+    def count_alive(self, role: int = None) -> int:
+        if role is None:
+            return sum(self.alive.values())
+        return self.alive[role]
+
+    def thing_alive(self) -> bool:
+        return (
+            self.the_thing is not None
+            and self.players[self.the_thing].alive
+        )
+
+    def alive_names(self, role: int = None):
+        """
+        Return the names of the alive players, of the given role if any. It
+        is only needed when the game ends.
+        """
+        return [
+            player.name
+            for player in self.players.values()
+            if player.alive and (role is None or player.role == role)
+        ]
+
+
+# Cache of tallies by game id
+role_tallies = {}
+
+
+def build_tally(game_id: int) -> RoleTally:
+    with db_session:
+        game = Game[game_id]
+        return RoleTally(
+            (player.id, player.name, player.role, bool(player.alive))
+            for player in game.players
+        )
+
+
+def get_tally(game_id: int) -> RoleTally:
+    """
+    Return the role tally of a game, building it if it is not cached
+    """
+    tally = role_tallies.get(int(game_id))
+    if tally is None:
+        tally = build_tally(game_id)
+        role_tallies[int(game_id)] = tally
+    return tally
+
+
+def forget_tally(game_id: int):
+    role_tallies.pop(int(game_id), None)
+
+
+def update_role(
+    game_id: int, player_id: int, name: str, role: int, alive: bool
+):
+    """
+    Update the cached tally of a game after a player changes
+    """
+    tally = role_tallies.get(int(game_id))
+    if tally is not None:
+        tally.update(player_id, name, role, alive)
@@ -0,0 +1,240 @@
+"""
+This file contains the seating ring of the games. The ring keeps the alive
+players of a game linked by their table position, so the neighbours of a seat,
+the distance between two seats or the player sitting in a position are found
+without sorting the players again.
+
+The rings are cached by game id. They are built from the database the first
+time they are needed and then updated by the crud functions that change the
+seats (deaths, seat swaps and play direction changes), once the change is
+committed.
+"""
+from typing import NamedTuple
+from pony.orm import db_session
+from src.theThing.games.models import Game
+
+
+class Seat(NamedTuple):
+    id: int
+    name: str
+    table_position: int
+    alive: bool
+
+
+class SeatingRing:
+    """
+    Doubly linked ring of the alive seats of a game, ordered by table position.
+    Clockwise means increasing table positions.
+    """
+
+    def __init__(self, seats, clockwise: bool = True):
+        self.clockwise = clockwise
+        self._by_position = {}
+        self._by_name = {}
+        self._by_id = {}
+        self._next = {}
+        self._prev = {}
+        self._rank = {}
+        for seat in seats:
+            self._by_position[seat.table_position] = seat
+            self._by_name[seat.name] = seat
+            self._by_id[seat.id] = seat
+        alive = sorted(p for p, s in self._by_position.items() if s.alive)
+        for index, position in enumerate(alive):
+            self._next[position] = alive[(index + 1) % len(alive)]
+            self._prev[position] = alive[index - 1]
+        self._renumber()
+
+    def _renumber(self):
+        # The rank is the clockwise index of each alive seat, used to measure
+        # distances. It only changes when a player dies.
+        self._rank = {}
+        if not self._next:
+            return
+        first = min(self._next)
+        position = first
+        for index in range(len(self._next)):
+            self._rank[position] = index
+            position = self._next[position]
+
+    def __len__(self):
+        return len(self._next)
+
+    def player_at(self, position: int):
+        return self._by_position.get(position)
+
+    def player_named(self, name: str):
+        return self._by_name.get(name)
+
+    def player_with_id(self, player_id: int):
+        return self._by_id.get(player_id)
+
+    def is_alive(self, position: int) -> bool:
+        return position in self._next
+
+    def neighbor(self, position: int, clockwise: bool = None) -> int:
+        """
+        Return the position of the alive seat next to position, following the
+        play direction unless clockwise is given.
+        """
+        if clockwise is None:
+            clockwise = self.clockwise
+        return self._next[position] if clockwise else self._prev[position]
+
+    def next_player(self, position: int, n: int = 1) -> Seat:
+        """
+        Return the player that is n alive places after position,
+        according to the play direction.
+        """
+        n = n % len(self)
+        for _ in range(n):
+            position = self.neighbor(position)
+        return self._by_position[position]
+
+    def are_adjacent(self, position_a: int, position_b: int) -> bool:
+        return (
+            self._next.get(position_a) == position_b
+            or self._prev.get(position_a) == position_b
+        )
+
+    def distance(
+        self, position_a: int, position_b: int, clockwise: bool = None
+    ) -> int:
+        """
+        Return the amount of alive places from position_a to position_b
+        following the play direction unless clockwise is given.
+        """
+        if clockwise is None:
+            clockwise = self.clockwise
+        steps = self._rank[position_b] - self._rank[position_a]
+        if not clockwise:
+            steps = -steps
+        return steps % len(self)
+
+    def alive_seats(self, start: int = None):
+        """
+        Return the alive seats in clockwise order, starting from start if given.
+        """
+        if not self._next:
+            return []
+        position = start if start is not None else min(self._next)
+        seats = []
+        for _ in range(len(self._next)):
+            seats.append(self._by_position[position])
+            position = self._next[position]
+        return seats
+
+    def kill(self, position: int):
+        """
+        Remove the seat in position from the ring, linking its neighbours.
+        """
+        if position not in self._next:
+            return
+        next_position = self._next.pop(position)
+        prev_position = self._prev.pop(position)
+        if next_position != position:
+            self._next[prev_position] = next_position
+            self._prev[next_position] = prev_position
+        seat = self._by_position[position]
+        self._by_position[position] = seat._replace(alive=False)
+        self._by_name[seat.name] = self._by_position[position]
+        self._by_id[seat.id] = self._by_position[position]
+        self._renumber()
+
+    def move(self, seat: Seat, new_position: int) -> bool:
+        """
+        Sit the player in new_position. Swapping two players is done with a
+        move of each of them. It returns False if the ring can not follow the
+        change and must be built again.
+        """
+        old_position = seat.table_position
+        if seat.alive != (new_position in self._next):
+            return False
+        moved = seat._replace(table_position=new_position)
+        self._by_position[new_position] = moved
+        self._by_name[moved.name] = moved
+        self._by_id[moved.id] = moved
+        current = self._by_position.get(old_position)
+        if current is not None and current.id == seat.id:
+            # Until the other player of the swap moves in, the old seat still
+            # points to this player.
+            self._by_position[old_position] = moved
+        return True
+
+
+# Cache of rings by game id
+rings = {}
+
+
+def build_ring(game_id: int) -> SeatingRing:
+    """
+    Build the seating ring of a game from the database
+    """
+    with db_session:
+        game = Game[game_id]
+        seats = [
+            Seat(
+                id=player.id,
+                name=player.name,
+                table_position=player.table_position,
+                alive=bool(player.alive),
+            )
+            for player in game.players
+        ]
+        clockwise = game.play_direction is not False
+    return SeatingRing(seats, clockwise)
+
+
+def get_ring(game_id: int) -> SeatingRing:
+    """
+    Return the seating ring of a game, building it if it is not cached
+    """
+    ring = rings.get(int(game_id))
+    if ring is None:
+        ring = build_ring(game_id)
+        rings[int(game_id)] = ring
+    return ring
+
+
+def forget_ring(game_id: int):
+    rings.pop(int(game_id), None)
+
+
+def update_seat(
+    game_id: int,
+    player_id: int,
+    name: str,
+    old_position: int,
+    new_position: int,
+    alive: bool,
+):
+    """
+    Update the cached ring of a game after a player changes its seat or dies.
+    It must be called after the session of the change is committed.
+    """
+    ring = rings.get(int(game_id))
+    if ring is None:
+        return
+    seat = ring.player_named(name)
+    if (
+        seat is None
+        or seat.id != player_id
+        or seat.table_position != old_position
+    ):
+        forget_ring(game_id)
+        return
+    if new_position != old_position:
+        if not ring.move(seat, new_position):
+            forget_ring(game_id)
+            return
+    if seat.alive and not alive:
+        ring.kill(new_position)
+    elif alive and not seat.alive:
+        # a player can not come back to life, build the ring again
+        forget_ring(game_id)
+
+
+def update_direction(game_id: int, clockwise: bool):
+    ring = rings.get(int(game_id))
+    if ring is not None:
+        ring.clockwise = clockwise
@@ -0,0 +1,32 @@
+"""
+This file contains the game actions received through the socket. Each event
+runs the action with the game and the player of the socket session, and the
+result is returned in the ack of the event.
+
+The actions of a connection are run one after the other, in the order they
+were sent.
+"""
+
+import asyncio
+from src.theThing.games.socket_handler import sio
+from src.theThing.games.actions import run_action
+from src.theThing.games.turn_machine import turn_handlers
+
+
+def make_handler(action: str):
+    async def handler(sid, data=None):
+        session = await sio.get_session(sid)
+        if not session.get("player_id") or not session.get("game_id"):
+            return {"status": 403, "detail": "La conexión no es de un jugador"}
+        # the lock lives in the session, so it is dropped on disconnect
+        lock = session.setdefault("actions_lock", asyncio.Lock())
+        async with lock:
+            return await run_action(
+                action, session["game_id"], session["player_id"], data
+            )
+
+    return handler
+
+
+for action in turn_handlers:
+    sio.on(action, make_handler(action))
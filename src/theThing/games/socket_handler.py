@@ -1,10 +1,38 @@
+import asyncio
+import time
 import socketio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from src.settings import (
+    SNAPSHOT_WINDOW,
+    OUTBOX_DRAIN_INTERVAL,
+    GAME_IDLE_TTL,
+    REAPER_INTERVAL,
+)
 from src.theThing.cards.schemas import CardBase
 from src.theThing.players.schemas import PlayerBase
 from src.theThing.games.schemas import GameOut, GameInDB
 from src.theThing.players.crud import get_player
 from urllib.parse import parse_qs
-from src.theThing.games.crud import get_game
+from src.theThing.games.crud import get_game, update_game
+from src.theThing.games.schemas import GameUpdate
+from src.theThing.games.presence import presence
+from src.theThing.games.lobby import lobby
+from src.theThing.games.event_log import get_event_log
+from src.theThing.games.versions import get_version
+from src.theThing.games.moves import get_player_moves
+from src.theThing.games.turn_machine import (
+    check_transition,
+    game_lock,
+    turn_action,
+)
+from src.theThing.games.caches import forget_game, game_cache
+from src.theThing.games.outbox import Outbox, EmitBuffer, fan_out
+from src.theThing.games.spectators import (
+    SpectatorFeed,
+    spectator_feeds,
+    spectator_room,
+)
 from src.theThing.messages.schemas import MessageOut
 from src.theThing.cards.special_effect_applications import apply_cac, apply_olv
 
@@ -12,6 +40,244 @@ sio = socketio.AsyncServer(cors_allowed_origins="*", async_mode="asgi")
 # define an asgi app
 socketio_app = socketio.ASGIApp(sio, socketio_path="/")
 
+# Clients connected with Protocol=compact receive the cards as [id, code],
+# the rest of the card data is in GET /cards/catalog
+COMPACT_PROTOCOL = "compact"
+
+LOBBY_ROOM = "lobby"
+
+
+# Outbound queue of each connected socket
+outboxes = {}
+
+# Buffer of the broadcasts of the running batch of actions, if any
+emit_buffer = ContextVar("emit_buffer", default=None)
+
+
+def transport_backlog(sid: str) -> int:
+    """
+    Returns the amount of packets the transport of a socket has not written.
+    python-engineio has no public API for it, this is the only place that
+    reads its internals (the sockets of the server and their send queue). If
+    they change the backlog is 0 and the outboxes only hold the events that
+    arrive while they are flushing.
+    """
+    eio_sid = sio.manager.eio_sid_from_sid(sid, "/")
+    sockets = getattr(sio.eio, "sockets", {})
+    socket = sockets.get(eio_sid) if eio_sid else None
+    queue = getattr(socket, "queue", None)
+    return queue.qsize() if queue is not None else 0
+
+
+def open_outbox(sid: str):
+    async def send(event, data):
+        await sio.emit(event, data, to=sid)
+
+    outboxes[sid] = Outbox(send, lambda: transport_backlog(sid))
+
+
+def close_outbox(sid: str):
+    outbox = outboxes.pop(sid, None)
+    if outbox is not None and outbox.drainer is not None:
+        outbox.drainer.cancel()
+
+
+async def drain_outbox(sid: str, outbox: Outbox):
+    while outboxes.get(sid) is outbox and not await outbox.flush():
+        await asyncio.sleep(OUTBOX_DRAIN_INTERVAL)
+    outbox.drainer = None
+
+
+async def deliver(sid: str, event: str, data):
+    """
+    Sends an event to a socket through its outbox, disconnecting the socket
+    if it can not keep up
+    """
+    outbox = outboxes.get(sid)
+    if outbox is None:
+        await sio.emit(event, data, to=sid)
+        return
+    if not outbox.put(event, data):
+        print("slow consumer disconnected ", sid)
+        close_outbox(sid)
+        await sio.disconnect(sid)
+        return
+    if not await outbox.flush() and outbox.drainer is None:
+        outbox.drainer = asyncio.create_task(drain_outbox(sid, outbox))
+
+
+async def emit_to_room(event: str, data, room: str, skip_sid=()):
+    buffer = emit_buffer.get()
+    if buffer is not None:
+        buffer.put(event, data, room, skip_sid)
+        return
+    # the sockets that keep up get a single room emit, that encodes the
+    # packet once, the backlogged ones get the event through their outbox
+    backlogged = [
+        sid
+        for sid, _ in sio.manager.get_participants("/", room)
+        if sid not in skip_sid
+        and sid in outboxes
+        and not outboxes[sid].idle()
+    ]
+    await sio.emit(event, data, room=room, skip_sid=[*skip_sid, *backlogged])
+    errors = await fan_out(deliver(sid, event, data) for sid in backlogged)
+    for error in errors:
+        print("error sending ", event, " to ", room, ": ", error)
+
+
+@asynccontextmanager
+async def buffered_emits():
+    """
+    Holds the broadcasts made inside the block and sends them when it ends,
+    with only the last status of each room
+    """
+    buffer = EmitBuffer()
+    token = emit_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        emit_buffer.reset(token)
+        for event, data, room, skip_sid in buffer.pending:
+            await emit_to_room(event, data, room, skip_sid)
+
+
+def has_spectators(game_id: int) -> bool:
+    return any(sio.manager.get_participants("/", spectator_room(game_id)))
+
+
+def public_game_status(game_data: dict) -> dict:
+    # the status can come from a GameInDB, keep only the GameOut fields
+    return GameOut.model_validate(game_data).model_dump()
+
+
+async def send_to_spectators(game_id: int, event: str, data: dict):
+    """
+    Adds a public update to the spectator feed of a game, the feed is sent
+    to the spectators room after SPECTATOR_INTERVAL
+    """
+    if not has_spectators(game_id):
+        return
+    feed = spectator_feeds.get(int(game_id))
+    if feed is None:
+        feed = SpectatorFeed()
+        spectator_feeds[int(game_id)] = feed
+    if event == "game_status":
+        data = public_game_status(data)
+    feed.put(event, data)
+    if feed.task is None:
+        feed.task = asyncio.create_task(flush_spectator_feed(game_id, feed))
+
+
+async def flush_spectator_feed(game_id: int, feed: SpectatorFeed):
+    await asyncio.sleep(feed.interval)
+    feed.task = None
+    for event, data in feed.take():
+        # a room emit encodes the packet once for all the spectators
+        await sio.emit(event, data, room=spectator_room(game_id))
+
+
+def compact_room(room: str) -> str:
+    return "c" + room
+
+
+def compact_card(card: CardBase):
+    return [card.id, card.code]
+
+
+def compact_player(player_data: PlayerBase):
+    data = player_data.model_dump(exclude={"hand", "card_to_exchange"})
+    data["hand"] = [compact_card(card) for card in player_data.hand or []]
+    data["card_to_exchange"] = (
+        compact_card(player_data.card_to_exchange)
+        if player_data.card_to_exchange
+        else None
+    )
+    return data
+
+
+async def emit_with_cards(event: str, data: dict, compact_data: dict, room):
+    """
+    Emits an event that carries cards, the clients of the compact protocol
+    get compact_data and the rest data
+    """
+    compact_sids = [
+        sid for sid, _ in sio.manager.get_participants("/", compact_room(room))
+    ]
+    await emit_to_room(event, data, room, skip_sid=compact_sids)
+    if compact_sids:
+        await emit_to_room(event, compact_data, compact_room(room))
+
+
+def cards_event_data(log: str, cards: [CardBase]):
+    """
+    Returns the data of an event that shows cards, for both protocols
+    """
+    # include all data from the cards except the id
+    return (
+        {
+            "log": log,
+            "cards": [card.model_dump(exclude={"id"}) for card in cards],
+        },
+        {"log": log, "cards": [compact_card(card) for card in cards]},
+    )
+
+
+async def emit_cards_event(event: str, log: str, cards: [CardBase], room):
+    await emit_with_cards(event, *cards_event_data(log, cards), room)
+
+
+async def emit_game_event(
+    game_id: int, event: str, data: dict, compact_data: dict = None
+):
+    """
+    Emits an event to all the players of a game, saving it in the event log
+    of the game so it can be sent again to the clients that reconnect
+    """
+    logged = get_event_log(game_id).record(event, data, compact_data)
+    presence.touch(game_id)
+    await send_to_spectators(game_id, event, logged.data)
+    if compact_data is None:
+        await emit_to_room(event, logged.data, "g" + str(game_id))
+    else:
+        await emit_with_cards(
+            event, logged.data, logged.compact_data, "g" + str(game_id)
+        )
+
+
+# Last game status sent of each game and the time it was read, reused by
+# the connections that arrive within SNAPSHOT_WINDOW seconds
+game_snapshots = {}
+
+
+def game_status(game_id: int, game_data: GameOut) -> dict:
+    """
+    Returns the game_status data of a game, with the version of the game
+    """
+    data = game_data.model_dump()
+    data["version"] = get_version(game_id)
+    return data
+
+
+@game_cache
+def forget_game_snapshot(game_id: int):
+    game_snapshots.pop(game_id, None)
+
+
+def save_game_snapshot(game_id: int, game_data: dict):
+    game_snapshots[int(game_id)] = (time.monotonic(), game_data)
+
+
+def get_game_snapshot(game_id: int) -> dict:
+    cached = game_snapshots.get(int(game_id))
+    if cached is not None and time.monotonic() - cached[0] < SNAPSHOT_WINDOW:
+        return cached[1]
+    game_data = game_status(game_id, get_game(game_id))
+    # the status read includes every logged event, it is the resume token
+    game_data["seq"] = get_event_log(game_id).seq
+    save_game_snapshot(game_id, game_data)
+    return game_data
+
 
 @sio.event
 async def connect(sid, environ):
@@ -20,28 +286,99 @@ async def connect(sid, environ):
     params = parse_qs(query_string)
     player_id = params.get("Player-Id", [None])[0]
     game_id = params.get("Game-Id", [None])[0]
+    # clients in the game list only listen to the lobby changes
+    if params.get("Lobby", [None])[0]:
+        open_outbox(sid)
+        await sio.enter_room(sid, LOBBY_ROOM)
+        return
+    # spectators only get the public status and the log events of the game
+    if params.get("Spectate", [None])[0]:
+        if not game_id:
+            return False
+        open_outbox(sid)
+        presence.connect(sid, game_id)
+        await sio.enter_room(sid, spectator_room(game_id))
+        await deliver(
+            sid, "game_status", public_game_status(get_game_snapshot(game_id))
+        )
+        return
+    compact = params.get("Protocol", [None])[0] == COMPACT_PROTOCOL
     # if the parameters are not present, the connection is rejected
     if not player_id or not game_id:
         return False
     await sio.save_session(sid, {"player_id": player_id, "game_id": game_id})
+    open_outbox(sid)
+    presence.connect(sid, game_id, player_id)
     await sio.enter_room(sid, "g" + game_id)
     await sio.enter_room(sid, "p" + player_id)
+    if compact:
+        await sio.enter_room(sid, compact_room("g" + game_id))
+        await sio.enter_room(sid, compact_room("p" + player_id))
     print("connect ", sid, "player_id ", player_id, "game_id ", game_id)
+    # Send the missed events if the client has a resume token, they are
+    # only sent to this connection. They include the last statuses, so the
+    # full snapshot is only sent without a token or when it is too old
+    resume = params.get("Resume", [None])[0]
+    missed = None
+    if resume is not None and resume.isdigit():
+        missed = get_event_log(game_id).since(int(resume), player_id)
+    if missed is not None:
+        for logged in missed:
+            data = logged.data
+            if compact and logged.compact_data is not None:
+                data = logged.compact_data
+            await deliver(sid, logged.event, data)
+        return
     # This is necessary for the client connection logic
-    game_to_send = get_game(game_id)
     player_to_send = get_player(player_id, game_id)
-    await send_game_status_to_players(game_id, game_to_send)
-    await send_player_status_to_player(player_id, player_to_send)
+    await deliver(sid, "game_status", get_game_snapshot(game_id))
+    data, compact_data = player_status(player_to_send, game_id)
+    await deliver(sid, "player_status", compact_data if compact else data)
 
 
 @sio.event
 async def disconnect(sid):
     print("disconnect ", sid)
+    close_outbox(sid)
+    presence.disconnect(sid)
 
 
-async def send_player_status_to_player(player_id: int, player_data: PlayerBase):
-    await sio.emit(
-        "player_status", player_data.model_dump(), room="p" + str(player_id)
+def player_status(player_data: PlayerBase, game_id: int = None):
+    """
+    Returns the player_status data and its compact version, with the legal
+    moves of the player if its game is known
+    """
+    data = player_data.model_dump()
+    compact_data = compact_player(player_data)
+    if game_id is None:
+        game_id = presence.game_of_player(player_data.id)
+    if game_id is not None:
+        try:
+            moves = get_player_moves(game_id, player_data.id, player_data)
+        except Exception as e:
+            print("error computing the moves of ", player_data.id, ": ", e)
+        else:
+            data["moves"] = compact_data["moves"] = moves.model_dump()
+    return data, compact_data
+
+
+async def send_player_status_to_player(
+    player_id: int, player_data: PlayerBase, game_id: int = None
+):
+    """
+    Sends a player his status, saving it in the event log of his game so it
+    is sent again if he reconnects
+    """
+    if game_id is None:
+        game_id = presence.game_of_player(player_id)
+    data, compact_data = player_status(player_data, game_id)
+    if game_id is not None:
+        logged = get_event_log(game_id).record(
+            "player_status", data, compact_data, player_id
+        )
+        data, compact_data = logged.data, logged.compact_data
+    await emit_with_cards(
+        "player_status", data, compact_data, "p" + str(player_id)
     )
 
 
@@ -52,56 +389,117 @@ async def send_game_status_to_players(game_id: int, game_data: GameOut):
     :param game_data:
     :return:
     """
-    await sio.emit(
-        "game_status", game_data.model_dump(), room="g" + str(game_id)
+    data = game_status(game_id, game_data)
+    data = get_event_log(game_id).record("game_status", data).data
+    save_game_snapshot(game_id, data)
+    await emit_to_room("game_status", data, "g" + str(game_id))
+    await send_to_spectators(game_id, "game_status", data)
+
+
+async def send_players_status_to_players(
+    players: [PlayerBase], game_id: int = None
+):
+    """
+    Sends to each player his own status, to all of them at the same time
+    """
+    errors = await fan_out(
+        send_player_status_to_player(player.id, player, game_id)
+        for player in players
     )
+    for error in errors:
+        print("error sending player_status: ", error)
 
 
 async def send_game_and_player_status_to_players(game_data: GameInDB):
-    for player in game_data.players:
-        await sio.emit(
-            "player_status", player.model_dump(), room="p" + str(player.id)
-        )
+    await send_players_status_to_players(game_data.players, game_data.id)
     game_to_send = GameOut.model_validate_json(game_data.model_dump_json())
-    await sio.emit(
-        "game_status", game_to_send.model_dump(), room="g" + str(game_data.id)
+    await send_game_status_to_players(game_data.id, game_to_send)
+
+
+async def send_lobby_update(game_id: int):
+    """
+    Sends the lobby entry of a game to the clients in the game list,
+    game is None when the game is no longer waiting for players
+    """
+    entry = lobby.get(game_id)
+    await emit_to_room(
+        "lobby_update",
+        {
+            "id": game_id,
+            "game": entry._asdict() if entry is not None else None,
+        },
+        LOBBY_ROOM,
     )
 
 
+async def reap_idle_games():
+    """
+    Aborts the waiting or started games without connected sockets for more
+    than GAME_IDLE_TTL seconds, removing them from the lobby. The caches of
+    the idle finished games are dropped.
+    """
+    waiting_games = [entry.id for entry in lobby.list()]
+    for game_id in presence.idle_games(waiting_games, GAME_IDLE_TTL):
+        presence.forget(game_id)
+        # an action of the game may be running, the game is read after it
+        async with game_lock(game_id):
+            try:
+                game = get_game(game_id)
+            except Exception:
+                continue
+            if game.state in [0, 1]:
+                print("aborting idle game ", game_id)
+                update_game(game_id, GameUpdate(state=3))
+            else:
+                forget_game(game_id)
+        if game.state in [0, 1]:
+            await send_lobby_update(game_id)
+
+
+async def run_idle_reaper():
+    """
+    Runs the idle game reaper forever, started with the app
+    """
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL)
+        try:
+            await reap_idle_games()
+        except Exception as e:
+            print("error in the idle game reaper: ", e)
+
+
 async def send_new_message_to_players(game_id: int, message: MessageOut):
-    await sio.emit("new_message", message.model_dump(), room="g" + str(game_id))
+    await emit_game_event(game_id, "new_message", message.model_dump())
 
 
 async def send_finished_game_event_to_players(game_id: int, data: dict):
     winners = data.get("winners")
     message = data.get("reason")
-    await sio.emit(
-        "game_finished",
-        {"winners": winners, "log": message},
-        room="g" + str(game_id),
+    await emit_game_event(
+        game_id, "game_finished", {"winners": winners, "log": message}
     )
 
 
 async def send_action_event_to_players(game_id: int, message: str):
-    await sio.emit(
+    await emit_game_event(
+        game_id,
         "action",
-        data={
+        {
             "log": message,
         },
-        room="g" + str(game_id),
     )
 
 
 async def send_discard_event_to_players(
     game_id: int, player_name: str, message: str
 ):
-    await sio.emit(
+    await emit_game_event(
+        game_id,
         "discard",
         {
             "player_name": player_name,
             "log": message,
         },
-        room="g" + str(game_id),
     )
 
 
@@ -109,167 +507,140 @@ async def send_defense_event_to_players(
     game_id: int,
     message: str,
 ):
-    await sio.emit(
-        "defense",
-        data={"log": message},
-        room="g" + str(game_id),
-    )
+    await emit_game_event(game_id, "defense", {"log": message})
 
 
 async def send_exchange_event_to_players(
     game_id: int, exchanging_offerer: str, defending_player: str
 ):
-    await sio.emit(
+    await emit_game_event(
+        game_id,
         "exchange",
-        data={
+        {
             "log": exchanging_offerer
             + " intercambió cartas con "
             + defending_player
         },
-        room="g" + str(game_id),
     )
 
 
 async def send_finished_turn_to_players(
     game_id: int, message: str, new_owner_name: str, new_owner_position: int
 ):
-    await sio.emit(
+    await emit_game_event(
+        game_id,
         "turn_finished",
-        data={
+        {
             "log": message,
             "new_owner_name": new_owner_name,
             "new_owner_position": new_owner_position,
         },
-        room="g" + str(game_id),
     )
 
 
 async def send_quarantine_event_to_players(
     game_id: int, card: CardBase, message: str
 ):
-    card_to_send = card.model_dump(exclude={"id"})
-    await sio.emit(
-        "quarantine",
-        data={"log": message, "cards": [card_to_send]},
-        room="g" + str(game_id),
+    await emit_game_event(
+        game_id, "quarantine", *cards_event_data(message, [card])
     )
 
 
 async def send_panic_event_to_players(
     game_id: int, card: CardBase, message: str
 ):
-    card_to_send = card.model_dump(exclude={"id"})
-    await sio.emit(
-        "panic",
-        data={"log": message, "cards": [card_to_send]},
-        room="g" + str(game_id),
-    )
+    await emit_game_event(game_id, "panic", *cards_event_data(message, [card]))
 
 
 async def send_analysis_to_player(
     player_id: int, hand: [CardBase], attacked_player_name: str
 ):
-    # include all data from the cards except the id
-    data_to_send = [card.model_dump(exclude={"id"}) for card in hand]
-    await sio.emit(
+    await emit_cards_event(
         "analisis",
-        data={
-            "log": "Estas son las cartas de" + attacked_player_name,
-            "cards": data_to_send,
-        },
-        room="p" + str(player_id),
+        "Estas son las cartas de" + attacked_player_name,
+        hand,
+        "p" + str(player_id),
     )
 
 
 async def send_suspicion_to_player(
     player_id: int, card: CardBase, attacked_player_name: str
 ):
-    data_to_send = card.model_dump(exclude={"id"})
-    await sio.emit(
+    await emit_cards_event(
         "sospecha",
-        data={
-            "log": "Esta es una carta de" + attacked_player_name,
-            "cards": [data_to_send],
-        },
-        room="p" + str(player_id),
+        "Esta es una carta de" + attacked_player_name,
+        [card],
+        "p" + str(player_id),
     )
 
 
 async def send_whk_to_player(game_id: int, player: str, hand: [CardBase]):
-    data_to_send = [card.model_dump(exclude={"id"}) for card in hand]
-    await sio.emit(
+    await emit_game_event(
+        game_id,
         "whisky",
-        data={
-            "log": player + "jugó whisky y estas son sus cartas!",
-            "cards": data_to_send,
-        },
-        room="g" + str(game_id),
+        *cards_event_data(
+            player + "jugó whisky y estas son sus cartas!", hand
+        ),
     )
 
 
 async def send_ate_to_player(
     game_id: int, player: PlayerBase, dest_player: PlayerBase, card: CardBase
 ):
-    data_to_send = [card.model_dump(exclude={"id"})]
-    await sio.emit(
+    await emit_cards_event(
         "ate",
-        data={
-            "log": f"Esta es la carta que {player.name} quiso intercambiar",
-            "cards": data_to_send,
-        },
-        room="p" + str(dest_player.id),
+        f"Esta es la carta que {player.name} quiso intercambiar",
+        [card],
+        "p" + str(dest_player.id),
     )
 
 
 async def send_ups_to_players(game_id: int, player: str, hand: [CardBase]):
-    data_to_send = [card.model_dump(exclude={"id"}) for card in hand]
-    await sio.emit(
+    await emit_game_event(
+        game_id,
         "ups",
-        data={
-            "log": player + "jugó ¡Ups! y estas son sus cartas!",
-            "cards": data_to_send,
-        },
-        room="g" + str(game_id),
+        *cards_event_data(player + "jugó ¡Ups! y estas son sus cartas!", hand),
     )
 
 
 async def send_qen_to_player(
     game_id: int, hand: [CardBase], dest_player: PlayerBase
 ):
-    data_to_send = [card.model_dump(exclude={"id"}) for card in hand]
-    await sio.emit(
+    await emit_cards_event(
         "qen",
-        data={
-            "log": dest_player.name
-            + "jugó Que quede entre nosotros y estas son sus cartas!",
-            "cards": data_to_send,
-        },
-        room="p" + str(dest_player.id),
+        dest_player.name
+        + "jugó Que quede entre nosotros y estas son sus cartas!",
+        hand,
+        "p" + str(dest_player.id),
     )
 
 
 async def send_cpo_to_players(game_id: int):
-    await sio.emit(
+    await emit_game_event(
+        game_id,
         "cpo",
-        data={
+        {
             "log": "¡Las viejas cuerdas que usaste son fáciles de romper! Todas las cartas "
             "Todas las cartas 'Cuarentena' que haya en juego son descartadas",
         },
-        room="g" + str(game_id),
     )
 
 
-@sio.on("cac")
-async def receive_cac_event(sid, data):
+# The panic cards answered by the socket, the events are registered with the
+# rest of the actions in socket_actions
+@turn_action("cac")
+async def apply_cac_action(data: dict):
+    check_transition(get_game(data["game_id"]), "cac")
     player, game = await apply_cac(data)
 
     await send_game_status_to_players(game.id, game)
-    await send_player_status_to_player(player.id, player)
+    await send_player_status_to_player(player.id, player, game.id)
 
 
-@sio.on("olv")
-async def receive_olv_event(sid, data):
+@turn_action("olv")
+async def apply_olv_action(data: dict):
+    check_transition(get_game(data["game_id"]), "olv")
     player, game = await apply_olv(data)
 
     await send_game_status_to_players(game.id, game)
-    await send_player_status_to_player(player.id, player)
+    await send_player_status_to_player(player.id, player, game.id)
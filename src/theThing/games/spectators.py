@@ -0,0 +1,44 @@
+"""
+This file contains the feed of the spectators of a game. The public updates
+of the game are collected and sent to the spectators room at most once per
+SPECTATOR_INTERVAL: the log events keep their order and only the last game
+status is sent.
+"""
+
+from src.settings import SPECTATOR_INTERVAL
+
+
+def spectator_room(game_id: int) -> str:
+    return "s" + str(game_id)
+
+
+class SpectatorFeed:
+    def __init__(self, interval: float = SPECTATOR_INTERVAL):
+        self.interval = interval
+        self.status = None
+        self.events = []
+        self.task = None
+
+    def __bool__(self):
+        return self.status is not None or bool(self.events)
+
+    def put(self, event: str, data: dict):
+        if event == "game_status":
+            self.status = data
+        else:
+            self.events.append((event, data))
+
+    def take(self):
+        """
+        Return the events to send, in order, and empty the feed
+        """
+        events = self.events
+        if self.status is not None:
+            events.append(("game_status", self.status))
+        self.status = None
+        self.events = []
+        return events
+
+
+# Spectator feeds by game id
+spectator_feeds = {}
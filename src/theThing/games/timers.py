@@ -0,0 +1,105 @@
+"""
+This file contains the turn timers. Each game has at most one deadline, for
+the current state of its turn, and all of them live in a single hashed timer
+wheel driven by one asyncio task. When a deadline expires the default action
+of that turn state is run, so abandoned turns keep moving.
+"""
+import asyncio
+import math
+from src.settings import TURN_TIMER_TICK, TURN_TIMER_SLOTS, TURN_DEADLINES
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: a timer is saved in the slot of its expiry tick, so
+    arming and cancelling are O(1) and each tick only looks at one slot
+    """
+
+    def __init__(self, tick: float = TURN_TIMER_TICK, slots=TURN_TIMER_SLOTS):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]
+        self.current = 0
+        self.timers = {}
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def arm(self, key, delay: float, payload=None):
+        """
+        Schedule key to expire after delay seconds, replacing its previous
+        timer
+        """
+        self.cancel(key)
+        expiry = self.current + max(1, math.ceil(delay / self.tick))
+        slot = expiry % len(self.slots)
+        self.slots[slot][key] = (expiry, payload)
+        self.timers[key] = slot
+
+    def cancel(self, key):
+        slot = self.timers.pop(key, None)
+        if slot is not None:
+            self.slots[slot].pop(key, None)
+
+    def advance(self):
+        """
+        Move the wheel one tick and return the (key, payload) of the timers
+        that expired
+        """
+        self.current += 1
+        slot = self.slots[self.current % len(self.slots)]
+        expired = [
+            (key, payload)
+            for key, (expiry, payload) in slot.items()
+            if expiry <= self.current
+        ]
+        for key, _ in expired:
+            del slot[key]
+            del self.timers[key]
+        return expired
+
+
+turn_timers = TimerWheel()
+
+# Default action of each turn state, registered by the endpoints. They
+# receive the game id.
+turn_timeout_actions = {}
+
+
+def arm_turn_deadline(game_id: int, state: int):
+    """
+    Start the deadline of the new state of a turn, if that state has one
+    """
+    if state in TURN_DEADLINES:
+        turn_timers.arm(int(game_id), TURN_DEADLINES[state], state)
+    else:
+        turn_timers.cancel(int(game_id))
+
+
+def cancel_turn_deadline(game_id: int):
+    turn_timers.cancel(int(game_id))
+
+
+async def expire_turn(game_id: int, state: int):
+    action = turn_timeout_actions.get(state)
+    if action is None:
+        return
+    try:
+        await action(game_id, state)
+    except Exception as e:
+        print("error in the default action of game ", game_id, ": ", e)
+        # try again later, unless the action already moved the turn
+        if int(game_id) not in turn_timers:
+            arm_turn_deadline(game_id, state)
+
+
+async def run_turn_timers():
+    """
+    Advance the turn timers forever, started with the app
+    """
+    while True:
+        await asyncio.sleep(turn_timers.tick)
+        for game_id, state in turn_timers.advance():
+            asyncio.create_task(expire_turn(game_id, state))
@@ -0,0 +1,260 @@
+"""
+This file contains the state machine of the turns. The actions of the game
+are declared in TRANSITIONS with the turn states they are allowed in, and
+compiled when the module is imported into two read-only tables: the
+transition of each action and the actions allowed in each state.
+
+Every action runs through dispatch: the endpoints register the function that
+applies each action with the turn_action decorator, and the validations ask
+check_transition before applying it. The actions of a game are run one at a
+time.
+"""
+
+import asyncio
+import contextlib
+import functools
+from contextvars import ContextVar
+from enum import IntEnum
+from types import MappingProxyType
+from typing import NamedTuple
+from fastapi import HTTPException
+from src.theThing.games.idempotency import stored_response
+from src.theThing.games.versions import verify_version
+
+
+class TurnState(IntEnum):
+    STEALING = 0
+    DECIDING = 1  # play or discard
+    WAITING_RESPONSE = 2
+    EXCHANGING = 3
+    EXCHANGE_RESPONSE = 4
+    FINISHING = 5
+    PANIC = 6  # waiting the effect of a panic card
+
+
+class Transition(NamedTuple):
+    action: str
+    states: frozenset  # turn states where the action is allowed
+    error: str  # detail of the error in any other state
+    player_key: str = "player_id"  # key of the player in the action data
+    # turn states the action can leave the turn in
+    next_states: frozenset = frozenset(TurnState)
+
+
+TRANSITIONS = [
+    Transition(
+        "steal",
+        frozenset([TurnState.STEALING]),
+        "No es posible robar una carta en este momento",
+        next_states=frozenset([TurnState.DECIDING]),
+    ),
+    Transition(
+        "play",
+        frozenset([TurnState.DECIDING]),
+        "El jugador todavia no puede jugar en este turno",
+        next_states=frozenset(
+            [TurnState.WAITING_RESPONSE, TurnState.EXCHANGING, TurnState.PANIC]
+        ),
+    ),
+    Transition(
+        "discard",
+        frozenset([TurnState.DECIDING]),
+        "No es posible descartar en este momento",
+        next_states=frozenset([TurnState.EXCHANGING, TurnState.FINISHING]),
+    ),
+    Transition(
+        "response_play",
+        frozenset([TurnState.WAITING_RESPONSE]),
+        "No es posible defenderse en este momento",
+        next_states=frozenset([TurnState.EXCHANGING, TurnState.FINISHING]),
+    ),
+    Transition(
+        "exchange",
+        frozenset([TurnState.EXCHANGING]),
+        "No es posible intercambiar en este momento",
+        next_states=frozenset(
+            [TurnState.EXCHANGE_RESPONSE, TurnState.FINISHING]
+        ),
+    ),
+    Transition(
+        "response_exchange",
+        frozenset([TurnState.EXCHANGE_RESPONSE]),
+        "No es posible defenderse de un intercambio en este momento",
+        "defending_player_id",
+        # Fallaste! sends the exchange to the next player
+        next_states=frozenset(
+            [TurnState.EXCHANGE_RESPONSE, TurnState.FINISHING]
+        ),
+    ),
+    Transition(
+        "finish_turn",
+        frozenset([TurnState.FINISHING]),
+        "El turno aún no ha terminado",
+        None,
+        next_states=frozenset([TurnState.STEALING]),
+    ),
+    Transition(
+        "cac",
+        frozenset([TurnState.PANIC]),
+        "No es posible aplicar esta carta de pánico en este momento",
+        next_states=frozenset([TurnState.FINISHING]),
+    ),
+    Transition(
+        "olv",
+        frozenset([TurnState.PANIC]),
+        "No es posible aplicar esta carta de pánico en este momento",
+        next_states=frozenset([TurnState.EXCHANGING]),
+    ),
+    # The Thing can declare its victory at any moment of the game
+    Transition("declare_victory", frozenset(TurnState), ""),
+]
+
+
+def compile_turn_machine(transitions):
+    """
+    Build the action -> Transition and state -> actions tables.
+    Every action must be declared once.
+    """
+    by_action = {}
+    by_state = {state: set() for state in TurnState}
+    for transition in transitions:
+        if transition.action in by_action:
+            raise ValueError(f"La acción {transition.action} está repetida")
+        by_action[transition.action] = transition
+        for state in transition.states:
+            by_state[TurnState(state)].add(transition.action)
+    return (
+        MappingProxyType(by_action),
+        MappingProxyType(
+            {state: frozenset(actions) for state, actions in by_state.items()}
+        ),
+    )
+
+
+transitions, state_actions = compile_turn_machine(TRANSITIONS)
+
+
+def allows(state: int, action: str) -> bool:
+    return action in state_actions.get(state, ())
+
+
+def check_transition(game, action: str):
+    """
+    Raise a 422 exception if the turn of the game does not allow the action
+    """
+    if not allows(game.turn.state, action):
+        raise HTTPException(
+            status_code=422, detail=transitions[action].error
+        )
+
+
+def check_sequence(state: int, actions):
+    """
+    Raise a 422 exception if the actions can not be run one after the other
+    from the turn state, following the states each action can leave the turn
+    in. It does not look at the cards, an action can still fail when it runs.
+    """
+    states = {state}
+    for position, action in enumerate(actions, start=1):
+        transition = transitions.get(action)
+        if transition is None:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Acción {position}: la acción {action} no existe",
+            )
+        if not any(allows(current, action) for current in states):
+            raise HTTPException(
+                status_code=422,
+                detail=f"Acción {position}: {transition.error}",
+            )
+        states = transition.next_states
+
+
+# Function that applies each action, registered by turn_action
+turn_handlers = {}
+
+# Lock of the actions of each game, with the amount of actions using it
+game_locks = {}
+
+# Ids of the games whose lock is held by the running action, so the actions
+# it runs do not wait for themselves
+held_games = ContextVar("held_games", default=frozenset())
+
+
+def action_game_id(data: dict):
+    try:
+        return int(data.get("game_id"))
+    except (TypeError, ValueError):
+        return None
+
+
+@contextlib.asynccontextmanager
+async def game_lock(game_id: int):
+    """
+    Run the block after the other actions of the game, and before the next
+    ones. It can be nested.
+    """
+    if game_id in held_games.get():
+        yield
+        return
+    entry = game_locks.setdefault(game_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            token = held_games.set(held_games.get() | {game_id})
+            try:
+                yield
+            finally:
+                held_games.reset(token)
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del game_locks[game_id]
+
+
+def data_argument(args, kwargs) -> dict:
+    # the action data is the only dict argument
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, dict):
+            return value
+    return {}
+
+
+def turn_action(action: str):
+    """
+    Decorator for the functions that apply an action, they receive the
+    action data as a dict. The actions of the same game wait for each other.
+    The version of an if_match argument is checked under the lock, after
+    looking for the response of a retry with the same idempotency_key.
+    """
+    if action not in transitions:
+        raise ValueError(f"La acción {action} no existe")
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, if_match=None, **kwargs):
+            data = data_argument(args, kwargs)
+            game_id = action_game_id(data)
+            async with game_lock(game_id):
+                retry = stored_response(data, kwargs.get("idempotency_key"))
+                if retry is None and game_id is not None:
+                    verify_version(game_id, if_match)
+                return await handler(*args, **kwargs)
+
+        turn_handlers[action] = wrapper
+        return wrapper
+
+    return decorator
+
+
+async def dispatch(action: str, data: dict, **kwargs):
+    """
+    Apply an action with its data. The keyword arguments are passed to the
+    handler (if_match and the idempotency key).
+    """
+    handler = turn_handlers.get(action)
+    if handler is None:
+        raise HTTPException(
+            status_code=422, detail=f"La acción {action} no existe"
+        )
+    return await handler(data, **kwargs)
@@ -2,13 +2,18 @@ from enum import Flag
 from fastapi import HTTPException
 from httpx import get
 from pony.orm import ObjectNotFound as ExceptionObjectNotFound
-from .crud import get_full_game, update_game, get_game
+from .crud import get_full_game, update_game, get_game, get_game_state
 from .schemas import GameOut, GameInDB, GameUpdate
+from .barriers import get_barriers
+from .seating import get_ring
+from .roles import get_tally, HUMAN, INFECTED, THE_THING
+from .turn_machine import check_transition
+from ..cards.card_rules import CardRule, get_card_rule
 from ..cards.crud import get_card, give_card_to_player, remove_card_from_player
 from ..turn.crud import update_turn
 from ..turn.schemas import TurnCreate
 import random
-from ..players.crud import get_player, update_player
+from ..players.crud import get_hand_index, get_player, update_player
 from ..players.schemas import PlayerBase, PlayerUpdate
 
 
@@ -109,72 +114,49 @@ def verify_data_start(game: GameOut, host_name: str):
 
 
 def verify_finished_game(game: GameOut):
-    game = get_full_game(game.id)
+    """
+    Check if the game ended, using the role tally of the game. If it did the
+    game state is updated and the winners are returned.
+    """
+    tally = get_tally(game.id)
     winners = None
     reason = None
-    turn_owner_name = [
-        player.name
-        for player in game.players
-        if player.table_position == game.turn.owner
-    ][0]
-    the_thing = [player for player in game.players if player.role == 3][0]
-    if game.turn.played_card is not None:
-        if (
-            game.turn.played_card.code == "lla"
-            and game.turn.response_card is None
-            and game.turn.destination_player == the_thing.name
-        ):
-            # if a flamethrower was played and killed "La cosa", the game ends and all alive humans win
-            game.state = 2
-            game_id = game.id
-            game_new_state = GameUpdate(state=game.state)
-            game = update_game(game_id, game_new_state)
-            winners = [
-                player.name
-                for player in game.players
-                if (player.role == 1 and player.alive)
-            ]
-            reason = (
-                "La cosa fue eliminada por "
-                + turn_owner_name
-                + " ganaron todos los humanos vivos"
-            )
-
-    amount_infected_players = len(
-        [
-            player
-            for player in game.players
-            if (player.role == 2 and player.alive)
-        ]
+    played_card = game.turn.played_card if game.turn else None
+    flamed_the_thing = (
+        played_card is not None
+        and played_card.code == "lla"
+        and game.turn.response_card is None
+        and tally.the_thing is not None
+        and game.turn.destination_player
+        == tally.players[tally.the_thing].name
     )
-    if amount_infected_players == len(game.players) - 1:
+    if flamed_the_thing or (
+        tally.the_thing is not None and not tally.thing_alive()
+    ):
+        # if a flamethrower killed "La cosa", the game ends and all alive humans win
+        game = update_game(game.id, GameUpdate(state=2))
+        turn_owner_name = get_ring(game.id).player_at(game.turn.owner).name
+        winners = tally.alive_names(HUMAN)
+        reason = (
+            "La cosa fue eliminada por "
+            + turn_owner_name
+            + " ganaron todos los humanos vivos"
+        )
+
+    if tally.count_alive(INFECTED) == len(tally) - 1:
         # if "La cosa" infected all players, the game ends and "La cosa" wins
-        game.state = 2
-        game_id = game.id
-        game_new_state = GameUpdate(state=game.state)
-        game = update_game(game_id, game_new_state)
-        winners = [
-            player.name
-            for player in game.players
-            if (player.role == 3 and player.alive)
-        ]
+        game = update_game(game.id, GameUpdate(state=2))
+        winners = tally.alive_names(THE_THING)
         reason = "La cosa infectó a todos los jugadores y gano la partida"
 
     # if it only remains one player alive its the winner, if "La cosa" is the last one, then infected also wins
-    alive_players = [player for player in game.players if player.alive]
-    if len(alive_players) == 1:
-        game.state = 2
-        game_id = game.id
-        game_new_state = GameUpdate(state=game.state)
-        game = update_game(game_id, game_new_state)
-        winners = [player.name for player in alive_players]
-        if alive_players[0].role == 3:
+    if tally.count_alive() == 1:
+        game = update_game(game.id, GameUpdate(state=2))
+        winners = tally.alive_names()
+        if tally.thing_alive():
             reason = "La cosa fue el último jugador vivo y ganó la partida"
         else:
-            reason = (
-                alive_players[0].name
-                + " fue el último jugador vivo y ganó la partida"
-            )
+            reason = winners[0] + " fue el último jugador vivo y ganó la partida"
     return_data = {"game": game, "winners": winners, "reason": reason}
     return return_data
 
@@ -206,11 +188,7 @@ def verify_data_play_card(
         raise HTTPException(
             status_code=422, detail="No es el turno del jugador especificado"
         )
-    if game.turn.state != 1:
-        raise HTTPException(
-            status_code=422,
-            detail="El jugador todavia no puede jugar en este turno",
-        )
+    check_transition(game, "play")
     # Verify that the card exists and it is in the player hand
     try:
         card = get_card(card_id, game_id)
@@ -218,12 +196,13 @@ def verify_data_play_card(
         raise HTTPException(
             status_code=422, detail=str("No se encontró la carta especificada")
         )
-    if card not in player.hand or card not in game.deck or card.state == 0:
+    if card.id not in player.hand_index or card.state == 0:
         raise HTTPException(
             status_code=422,
             detail="La carta no pertenece a la mano del jugador o al mazo de la partida",
         )
-    if card.kind not in [0, 2, 4]:
+    card_rule = get_card_rule(card.code, card.kind)
+    if not card_rule & CardRule.PLAYABLE:
         raise HTTPException(
             status_code=422, detail="No puedes jugar esta carta"
         )
@@ -231,32 +210,23 @@ def verify_data_play_card(
         raise HTTPException(
             status_code=422, detail="La carta seleccionada no es jugable"
         )
-    if len(player.hand) <= 4:
+    if len(player.hand_index) <= 4:
         raise HTTPException(
             status_code=422,
             detail="El jugador tiene menos cartas de las necesarias para jugar",
         )
     # Get the destination player by his name and check that is not the same player and exists and is alive
-    destination_player = None
-    for p in game.players:
-        if p.name == destination_name:
-            destination_player = p
-            break
+    ring = get_ring(game_id)
+    # the seat has the id, position and liveness of the destination player
+    destination_player = ring.player_named(destination_name)
     if destination_player is None:
         raise HTTPException(
             status_code=422, detail="No se encontró al jugador objetivo"
         )
-    if destination_player.id == player.id and card.code not in [
-        "whk",
-        "vte",
-        "cpo",
-        "trc",
-        "eaf",
-        "hac",
-        "ups",
-        "cac",
-        "olv",
-    ]:
+    if (
+        destination_player.id == player.id
+        and not card_rule & CardRule.TARGET_SELF
+    ):
         raise HTTPException(
             status_code=422,
             detail="No se puede aplicar el efecto a sí mismo",
@@ -265,89 +235,26 @@ def verify_data_play_card(
         raise HTTPException(
             status_code=422, detail="El jugador objetivo no está vivo"
         )
-    alive_players = [p.table_position for p in game.players if p.alive]
-    alive_players.sort()
-    index_player = alive_players.index(player.table_position)
-    index_destination_player = alive_players.index(
-        destination_player.table_position
-    )
-    if card.code not in [
-        "mvc",
-        "whk",
-        "vte",
-        "sed",
-        "cpo",
-        "und",
-        "sda",
-        "trc",
-        "eaf",
-        "hac",
-        "ups",
-        "npa",
-        "cac",
-        "olv",
-    ]:
+    if not card_rule & CardRule.TARGET_ANY:
         # check if the destination !=player is adjacent to the player,
         # the first and the last player are adjacent
-        if index_destination_player == (index_player + 1) % len(
-            alive_players
-        ) or index_destination_player == (index_player - 1) % len(
-            alive_players
+        if not ring.are_adjacent(
+            player.table_position, destination_player.table_position
         ):
-            pass
-        else:
             raise HTTPException(
                 status_code=422,
                 detail="El jugador destino no está sentado en una posición adyacente",
             )
     # Check for obstacles
+    barriers = get_barriers(game.id)
     if (
-        len(game.obstacles) > 0
+        barriers
         and destination_name != player.name
-        and (
-            card.code
-            not in [
-                "whk",
-                "vte",
-                "sed",
-                "mvc",
-                "hac",
-                "und",
-                "trc",
-                "eaf",
-                "vyv",
-                "npa",
-                "cac",
-                "olv",
-            ]
-        )
+        and not card_rule & CardRule.IGNORES_OBSTACLES
     ):
-        door_flag = False
-        player_position = player.table_position
-        destination_player_position = destination_player.table_position
-        if (  # played to the left case 1
-            player_position == alive_players[0]
-            and destination_player_position == alive_players[-1]
-        ):
-            if destination_player_position in game.obstacles:
-                door_flag = True
-        elif (  # played to the right case 1
-            player_position == alive_players[-1]
-            and destination_player_position == alive_players[0]
-        ):
-            if player_position in game.obstacles:
-                door_flag = True
-        elif (  # played to the left case 2
-            player_position > destination_player_position
+        if barriers.between(
+            ring, player.table_position, destination_player.table_position
         ):
-            if destination_player_position in game.obstacles:
-                door_flag = True
-        elif (  # played to the right case 2
-            player_position < destination_player_position
-        ):
-            if player_position in game.obstacles:
-                door_flag = True
-        if door_flag:
             raise HTTPException(
                 status_code=422,
                 detail="No es posible jugar esta carta al jugador, existe una puerta atrancada entre ambos",
@@ -367,16 +274,12 @@ def verify_data_steal_card(game_id: int, player_id: int):
         raise HTTPException(
             status_code=422, detail="La partida aún no ha comenzado"
         )
-    if game.turn.state != 0:
-        raise HTTPException(
-            status_code=422,
-            detail="No es posible robar una carta en este momento",
-        )
+    check_transition(game, "steal")
 
     # Check valid player status
     try:
-        player = get_player(player_id, game_id)
-        if len(player.hand) >= 5:
+        hand = get_hand_index(player_id, game_id)
+        if len(hand) >= 5:
             raise HTTPException(
                 status_code=422, detail="La mano del jugador está llena"
             )
@@ -386,7 +289,7 @@ def verify_data_steal_card(game_id: int, player_id: int):
         )
 
     # Verify that it actually is the player turn
-    if game.turn.owner != player.table_position:
+    if get_ring(game_id).player_at(game.turn.owner).id != int(player_id):
         raise HTTPException(status_code=422, detail="No es tu turno")
 
 
@@ -424,7 +327,7 @@ def verify_data_generic(game_id: int, player_id: int, card_id: int):
         raise HTTPException(
             status_code=422, detail="No es posible descartar esta carta"
         )
-    if card not in player.hand or card not in game.deck or card.state == 0:
+    if card.id not in player.hand_index or card.state == 0:
         raise HTTPException(
             status_code=422,
             detail="La carta no pertenece a la mano del jugador o al mazo de la partida",
@@ -443,23 +346,15 @@ def verify_data_discard_card(game_id: int, player_id: int, card_id: int):
     except HTTPException as e:
         raise e
 
-    if game.turn.state != 1:
-        raise HTTPException(
-            status_code=422, detail="No es posible descartar en este momento"
-        )
+    check_transition(game, "discard")
 
-    if len(player.hand) <= 4:
+    if len(player.hand_index) <= 4:
         raise HTTPException(
             status_code=422,
             detail="No es posible descartar sin robar una carta primero",
         )
 
-    infected_cards = [card for card in player.hand if card.code == "inf"]
-    if (
-        len(infected_cards) == 1
-        and infected_cards[0].id == card.id
-        and player.role == 2
-    ):
+    if player.hand_index.is_last_infection(card) and player.role == 2:
         raise HTTPException(
             status_code=422,
             detail="No es posible descartar la última carta de infección",
@@ -479,16 +374,10 @@ def verify_data_response_basic(game_id: int, defending_player_id: int):
         raise HTTPException(
             status_code=422, detail="La partida aún no ha comenzado"
         )
-    if game.turn.state != 2:
-        raise HTTPException(
-            status_code=422, detail="No es posible defenderse en este momento"
-        )
+    check_transition(game, "response_play")
 
     # Check if the attacking player exists and its alive
-    for player in game.players:
-        if player.table_position == game.turn.owner:
-            attacking_player = player
-            break
+    attacking_player = get_ring(game_id).player_at(game.turn.owner)
     if attacking_player is None:
         raise HTTPException(
             status_code=404, detail="No se encontró el jugador atacante"
@@ -527,15 +416,13 @@ def verify_data_exchange(game_id: int, player_id: int, card_id: int):
     except HTTPException as e:
         raise e
 
-    if game.turn.state != 3:
-        raise HTTPException(
-            status_code=422, detail="No es posible intercambiar en este momento"
-        )
+    check_transition(game, "exchange")
     # Get the destination_player
-    for p in game.players:
-        if p.name == game.turn.destination_player_exchange:
-            destination_player = p
-            break
+    ring = get_ring(game_id)
+    destination_player = ring.player_named(
+        game.turn.destination_player_exchange
+    )
+    destination_role = get_tally(game_id).role_of(destination_player.id)
     # If the card is inf, check that the player is "La Cosa" or is an infected player offering the card to "La Cosa"
     if card.code == "inf":
         if player.role == 1:
@@ -544,7 +431,7 @@ def verify_data_exchange(game_id: int, player_id: int, card_id: int):
                 detail="No es posible intercambiar esta carta",
             )
         else:
-            if player.role == 2 and destination_player.role != 3:
+            if player.role == 2 and destination_role != 3:
                 raise HTTPException(
                     status_code=422,
                     detail="No es posible intercambiar esta carta con este jugador",
@@ -556,24 +443,12 @@ def verify_data_exchange(game_id: int, player_id: int, card_id: int):
             status_code=422, detail="No es posible intercambiar esta carta"
         )
 
-    infected_cards = [card for card in player.hand if card.code == "inf"]
-    if (
-        len(infected_cards) == 1
-        and card.id == infected_cards[0].id
-        and player.role == 2
-    ):
+    if player.hand_index.is_last_infection(card) and player.role == 2:
         raise HTTPException(
             status_code=422,
             detail="No es posible intercambiar la última carta de infección",
         )
-    if len(game.obstacles) > 0:
-        if (
-            player.table_position in game.obstacles and game.play_direction
-        ) or (
-            destination_player.table_position in game.obstacles
-            and not game.play_direction
-        ):
-            raise Exception("Existe una puerta atrancada")
+    verify_obstacles_for_exchange(game, player, destination_player)
 
     return game, player, card
 
@@ -589,18 +464,10 @@ def verify_data_exchange_basic(game_id: int, defending_player_id: int):
         raise HTTPException(
             status_code=422, detail="La partida aún no ha comenzado"
         )
-    if game.turn.state != 4:
-        raise HTTPException(
-            status_code=422,
-            detail="No es posible defenderse de un intercambio en este momento",
-        )
+    check_transition(game, "response_exchange")
 
     # Check if the exchanging offerer exists and its alive
-    for player in game.players:
-        if player.table_position == game.turn.owner:
-            exchanging_offerer = player
-            break
-
+    exchanging_offerer = get_ring(game_id).player_at(game.turn.owner)
     if exchanging_offerer is None:
         raise HTTPException(
             status_code=404,
@@ -611,10 +478,11 @@ def verify_data_exchange_basic(game_id: int, defending_player_id: int):
             status_code=422,
             detail="El jugador que ofreció el intercambio está muerto",
         )
+    # the full game already has both players
+    players = {player.id: player for player in game.players}
     # Check the defending player exists and its alive
-    try:
-        defending_player = get_player(defending_player_id, game_id)
-    except Exception as e:
+    defending_player = players.get(int(defending_player_id))
+    if defending_player is None:
         raise HTTPException(
             status_code=404,
             detail="No se encontró el jugador destino del intercambio",
@@ -626,6 +494,7 @@ def verify_data_exchange_basic(game_id: int, defending_player_id: int):
             detail="El jugador destino del intercambio no es el correcto",
         )
 
+    exchanging_offerer = players[exchanging_offerer.id]
     return game, exchanging_offerer, defending_player
 
 
@@ -643,8 +512,8 @@ def exchange_cards_effect(
     except Exception as e:
         raise e
     if (
-        exchange_card not in defending_player.hand
-        or offered_card not in exchanging_offerer.hand
+        exchange_card.id not in defending_player.hand_index
+        or offered_card.id not in exchanging_offerer.hand_index
     ):
         raise HTTPException(
             status_code=404,
@@ -664,12 +533,8 @@ def exchange_cards_effect(
                     detail="No es posible intercambiar esta carta con este jugador",
                 )
 
-    infected_cards = [
-        card for card in defending_player.hand if card.code == "inf"
-    ]
     if (
-        len(infected_cards) == 1
-        and exchange_card.id == infected_cards[0].id
+        defending_player.hand_index.is_last_infection(exchange_card)
         and defending_player.role == 2
     ):
         raise HTTPException(
@@ -737,12 +602,12 @@ def verify_data_response_card(
             status_code=422, detail="No te puedes defender con esta carta"
         )
     # Player checks
-    if len(defending_player.hand) != 4:
+    if len(defending_player.hand_index) != 4:
         raise HTTPException(
             status_code=422,
             detail="El jugador tiene menos o más de 4 cartas en su mano. Debería tener 4.",
         )
-    if response_card not in defending_player.hand:
+    if response_card.id not in defending_player.hand_index:
         raise HTTPException(
             status_code=404,
             detail="La carta de defensa no está en la mano del jugador",
@@ -809,10 +674,7 @@ def verify_data_finish_turn(game_id: int):
             status_code=422, detail="La partida aún no ha comenzado"
         )
 
-    if game.turn.state != 5:
-        raise HTTPException(
-            status_code=422, detail="El turno aún no ha terminado"
-        )
+    check_transition(game, "finish_turn")
 
     return game
 
@@ -827,10 +689,11 @@ def assign_turn_owner(game: GameOut):
         if (played_card_code in cards_change_places) and response_card is None:
             # If the played card is "cdl" or "mvc" and there's no response, the turn
             # owner is the position of the destination player
-            for player in game.players:
-                if player.name == game.turn.destination_player:
-                    new_owner = player.table_position
-                    break
+            new_owner = (
+                get_ring(game.id)
+                .player_named(game.turn.destination_player)
+                .table_position
+            )
             new_dest_exch = get_player_in_next_n_places(game, new_owner, 1)
             update_turn(
                 game.id,
@@ -876,73 +739,58 @@ def get_player_in_next_n_places(game: GameOut, owner: int, n: int):
     - n (int): The number of places to count.
 
     Returns:
-    - PlayerBase: The player that is n places after the player in the table.
+    - Seat: The player that is n places after the player in the table.
     """
-    alive_players = [
-        player.table_position for player in game.players if player.alive
-    ]
-    alive_players.sort()
-    index_player = alive_players.index(owner)
-    if game.play_direction:
-        next_player = alive_players[(index_player + n) % len(alive_players)]
-    else:
-        next_player = alive_players[(index_player - n) + len(alive_players) % len(alive_players)]
-    for p in game.players:
-        if p.table_position == next_player:
-            return p
+    return get_ring(game.id).next_player(owner, n)
 
 
 def calculate_winners_if_victory_declared(game_id, player_id):
     try:
-        game = get_full_game(game_id)
-        player = get_player(player_id, game_id)
+        state = get_game_state(game_id)
+        tally = get_tally(game_id)
     except ExceptionObjectNotFound as e:
         raise HTTPException(status_code=404, detail=str(e))
+    if int(player_id) not in tally.players:
+        raise HTTPException(status_code=404, detail=f"Player[{player_id}]")
 
-    if game.state != 1:
+    if state != 1:
         raise HTTPException(
             status_code=422, detail="La partida no está en juego"
         )
 
-    if player.role != 3:
+    if tally.role_of(int(player_id)) != THE_THING:
         raise HTTPException(status_code=422, detail="El jugador no es La Cosa")
 
-    win = True
-    alive_humans = []
-    alive_infected = []
-
-    for player in game.players:
-        if player.alive:
-            if player.role == 1:
-                win = False
-                alive_humans.append(player.name)
-            elif player.role != 1:
-                alive_infected.append(player.name)
-
-    if win:
+    if tally.count_alive(HUMAN) == 0:
         result = {
             "reason": "¡No quedan humano vivos! Gana La Cosa e infectados",
-            "winners": alive_infected,
+            "winners": [
+                player.name
+                for player in tally.players.values()
+                if player.alive and player.role != HUMAN
+            ],
         }
     else:
         result = {
             "reason": "¡La cosa se equivocó! Ganan los humanos",
-            "winners": alive_humans,
+            "winners": tally.alive_names(HUMAN),
         }
 
     return result
 
 
 def update_quarantine_status(game):
-    """ """
-    turn_owner_position = game.turn.owner
-
-    for player in game.players:
-        if player.table_position == turn_owner_position:
-            player_to_update = player
+    """
+    Decrease the quarantine of the turn owner, read from the loaded game
+    """
+    player_to_update = get_ring(game.id).player_at(game.turn.owner)
+    player = next(
+        player
+        for player in game.players
+        if player.name == player_to_update.name
+    )
 
-    if player_to_update.quarantine > 0:
-        player = get_player(player_to_update.id, game.id)
+    if player.quarantine:
         new_quarantine = player.quarantine - 1
         update_player(
             PlayerUpdate(quarantine=new_quarantine),
@@ -952,13 +800,17 @@ def update_quarantine_status(game):
 
 
 def verify_obstacles_for_exchange(
-    game: GameOut, player: PlayerBase, destination_player: PlayerBase
+    game: GameOut, player: PlayerBase, destination_player
 ):
-    if len(game.obstacles) > 0:
-        if (
-            player.table_position in game.obstacles and game.play_direction
-        ) or (
-            destination_player.table_position in game.obstacles
-            and not game.play_direction
-        ):
-            raise Exception("Existe una puerta atrancada")
+    """
+    Raise an exception if there is a locked door between the player and the
+    destination of the exchange, following the play direction.
+    """
+    barriers = get_barriers(game.id)
+    if barriers and barriers.between(
+        get_ring(game.id),
+        player.table_position,
+        destination_player.table_position,
+        game.play_direction,
+    ):
+        raise Exception("Existe una puerta atrancada")
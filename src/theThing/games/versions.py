@@ -0,0 +1,130 @@
+"""
+This file contains the version of the games. Every change of a game, its
+players, cards, turn, chat or logs increments game.version. The last
+committed version of each game is mirrored in memory to answer conditional
+requests without a query: a change drops it, and it is read again from the
+database the next time it is needed, so a rolled back change is never seen.
+
+The crud functions of an action commit one by one, so the version given in
+an If-Match header is only compared with the current one under the lock of
+the game (see turn_machine.turn_action): no other action of the game can
+change it between the check and the action.
+
+Long-poll requests wait on one asyncio event per game, which is set and
+replaced each time the version changes, so every parked request of the game is
+woken at once.
+"""
+import asyncio
+from fastapi import HTTPException, Request, Response
+from pony.orm import db_session, ObjectNotFound
+from src.theThing.games.models import Game
+
+# Last known version by game id
+game_versions = {}
+
+# Event set on the next change of the version, by game id
+version_events = {}
+
+
+def touch_game(game_id: int) -> int:
+    """
+    Increment the version of a game. It must be called inside the db_session
+    of the change.
+    """
+    game = Game[game_id]
+    game.version += 1
+    game_versions.pop(game.id, None)
+    notify_version(game.id)
+    return game.version
+
+
+def get_version(game_id: int) -> int:
+    version = game_versions.get(int(game_id))
+    if version is None:
+        with db_session:
+            version = Game[game_id].version
+        game_versions[int(game_id)] = version
+    return version
+
+
+def forget_version(game_id: int):
+    game_versions.pop(int(game_id), None)
+    notify_version(int(game_id))
+
+
+def notify_version(game_id: int):
+    """
+    Wake the requests waiting for a change of the game. The waiters run after
+    the current session is finished, since they need the event loop, and read
+    the version again: after a rollback they keep waiting.
+    """
+    event = version_events.pop(game_id, None)
+    if event is not None:
+        event.set()
+
+
+async def wait_for_version(game_id: int, since: int, timeout: float) -> bool:
+    """
+    Wait until the version of the game is not since, or the timeout passes.
+    Return False on timeout.
+    """
+    game_id = int(game_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while get_version(game_id) == since:
+        event = version_events.get(game_id)
+        if event is None:
+            event = version_events[game_id] = asyncio.Event()
+        try:
+            await asyncio.wait_for(event.wait(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            return False
+    return True
+
+
+def game_etag(game_id: int, resource: str):
+    """
+    Return the ETag of a resource of a game, or None if the game does not
+    exist. Every resource of a game changes with the game version.
+    """
+    try:
+        version = get_version(game_id)
+    except ObjectNotFound:
+        return None
+    return f'"{resource}-{game_id}-{version}"'
+
+
+def not_modified(request: Request, response: Response, etag: str):
+    """
+    Return a 304 response if the If-None-Match header of the request matches
+    the ETag, otherwise add the ETag to the response and return None
+    """
+    if etag is None:
+        return None
+    response.headers["ETag"] = etag
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def verify_version(game_id: int, if_match: str):
+    """
+    Raise a 412 exception if the version given in an If-Match header is not
+    the current version of the game. A missing header is always accepted.
+    """
+    if if_match is None:
+        return
+    try:
+        version = get_version(game_id)
+    except ObjectNotFound:
+        raise HTTPException(
+            status_code=404, detail="No se encontró la partida"
+        )
+    expected = if_match.strip().removeprefix("W/").strip('"')
+    if expected != "*" and expected != str(version):
+        raise HTTPException(
+            status_code=412,
+            detail=f"La partida cambió, la versión actual es {version}",
+        )
@@ -1,6 +1,7 @@
 from src.theThing.messages.schemas import MessageCreate, MessageOut
 from src.theThing.messages.models import Message
 from src.theThing.games.models import Game
+from src.theThing.games.versions import touch_game
 from datetime import datetime
 from pony.orm import db_session, ObjectNotFound, select, flush
 
@@ -25,6 +26,7 @@ def create_message(message: MessageCreate, game_id: int) -> MessageOut:
         date=datetime.now(),
         game=game,
     )
+    touch_game(game_id)
 
     message.flush()
     response = MessageOut.model_validate(message)
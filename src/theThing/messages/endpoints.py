@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from src.theThing.games.crud import get_game
+from src.theThing.games.versions import game_etag, not_modified
 from src.theThing.messages.crud import create_message, get_chat
 from src.theThing.messages.schemas import MessageCreate
 from src.theThing.games.socket_handler import send_new_message_to_players
@@ -36,14 +37,21 @@ async def send_message(game_id: int, message: MessageCreate):
 
 
 @message_router.get("/game/{game_id}/chat")
-async def get_chat_messages(game_id: int):
+async def get_chat_messages(
+    game_id: int, request: Request, response: Response
+):
     """
     Get the messages from the game chat.
     :param game_id:
     :return: list of messages
 
     :raises: 404 if game not found
+
+    Answers 304 if the If-None-Match header matches the ETag
     """
+    cached = not_modified(request, response, game_etag(game_id, "chat"))
+    if cached:
+        return cached
     try:
         game = get_game(game_id)
     except ExceptionObjectNotFound as e:
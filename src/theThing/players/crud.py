@@ -1,9 +1,19 @@
 from pony.orm import ObjectNotFound
-from pony.orm import db_session
+from pony.orm import db_session, flush
 from src.theThing.cards.schemas import CardBase
 
 from src.theThing.games.models import Game
+from src.theThing.games.seating import forget_ring, update_seat
+from src.theThing.games.lobby import lobby
+from src.theThing.games.roles import forget_tally, update_role
+from src.theThing.games.versions import touch_game
 from src.theThing.players.schemas import PlayerCreate, PlayerUpdate, PlayerBase
+from src.theThing.players.hand import (
+    HandIndex,
+    cached_hand,
+    forget_hand,
+    keep_hand,
+)
 from .models import Player
 from ..cards.models import Card
 
@@ -35,9 +45,15 @@ def create_player(player_data: PlayerCreate, game_id: int):
 
         player = Player(**player_data.model_dump(), game=game_to_join)
         player.table_position = len(game_to_join.players)
+        touch_game(game_id)
         # player_created contains the ponyorm object instance of the new player
         player.flush()  # flush the changes to the database
+        forget_ring(game_id)
+        forget_tally(game_id)
+        lobby_entry = lobby.entry_of(game_to_join)
         response = PlayerBase.model_validate(player)
+    lobby.track(game_id, lobby_entry)
+    keep_hand(game_id, response.id, HandIndex())
     return response
 
 
@@ -57,8 +73,28 @@ def get_player(player_id: int, game_id: int):
             )
         else:
             card_to_exchange = None
-        response = PlayerBase.model_validate(player, card_to_exchange)
+        hand = cached_hand(game_id, player_id)
+        response = PlayerBase.model_validate(player, card_to_exchange, hand)
+    if hand is None:
+        keep_hand(game_id, player_id, response.hand_index)
+    return response
+
 
+def get_hand_index(player_id: int, game_id: int) -> HandIndex:
+    """
+    This function returns the HandIndex of a player, reading only the id,
+    code and kind of his cards the first time
+    """
+    response = cached_hand(game_id, player_id)
+    if response is not None:
+        return response
+    with db_session:
+        player = Player.get(game=Game[game_id], id=player_id)
+        if player is None:
+            raise ObjectNotFound(Player, pkval=player_id)
+        cards = player.hand.select()[:]
+        response = HandIndex(cards)
+    keep_hand(game_id, player_id, response)
     return response
 
 
@@ -72,6 +108,8 @@ def update_player(player: PlayerUpdate, player_id: int, game_id: int):
         player_to_update = Player.get(game=game, id=player_id)
         if player_to_update is None:
             raise ObjectNotFound(Player, pkval=player_id)
+        old_position = player_to_update.table_position
+        touch_game(game_id)
 
         if player.card_to_exchange is not None:
             player_to_update.set(
@@ -85,14 +123,76 @@ def update_player(player: PlayerUpdate, player_id: int, game_id: int):
             player_to_update.card_to_exchange = None
 
         player_to_update.flush()
+        name = player_to_update.name
+        new_position = player_to_update.table_position
+        alive = player_to_update.alive
+        role = player_to_update.role
         if player_to_update.card_to_exchange is not None:
             card_to_exchange = CardBase.model_validate(
                 Card[player_to_update.card_to_exchange]
             )
         else:
             card_to_exchange = None
-        response = PlayerBase.model_validate(player_to_update, card_to_exchange)
+        response = PlayerBase.model_validate(
+            player_to_update, card_to_exchange
+        )
 
+    # the cached seats and roles follow the committed player
+    update_seat(game_id, player_id, name, old_position, new_position, alive)
+    update_role(game_id, player_id, name, role, alive)
+    return response
+
+
+def permute_seats(
+    game_id: int, positions: dict, reset_quarantine: bool = False
+):
+    """
+    This function sits the players in their new table positions, given as a
+    dict of player id to position, in a single transaction. The new positions
+    must be a permutation of the old ones. If reset_quarantine is True, the
+    quarantine of all the players of the game is removed.
+    It returns the PlayerBase of all the players ordered by table position.
+    """
+    with db_session:
+        game = Game[game_id]
+        players = {player.id: player for player in game.players}
+        for player_id in positions:
+            if player_id not in players:
+                raise ObjectNotFound(Player, pkval=player_id)
+        old_positions = {
+            player_id: players[player_id].table_position
+            for player_id in positions
+        }
+        if sorted(old_positions.values()) != sorted(positions.values()):
+            raise Exception("Las posiciones no son una permutación")
+
+        for player_id, position in positions.items():
+            players[player_id].table_position = position
+        if reset_quarantine:
+            for player in players.values():
+                player.quarantine = 0
+        touch_game(game_id)
+        flush()
+
+        seats = [
+            (player_id, players[player_id].name, players[player_id].alive)
+            for player_id in positions
+        ]
+        response = [
+            PlayerBase.model_validate(player)
+            for player in sorted(
+                players.values(), key=lambda p: p.table_position or 0
+            )
+        ]
+    for player_id, name, alive in seats:
+        update_seat(
+            game_id,
+            player_id,
+            name,
+            old_positions[player_id],
+            positions[player_id],
+            alive,
+        )
     return response
 
 
@@ -107,4 +207,10 @@ def delete_player(player_id: int, game_id: int):
         if player is None:
             raise ObjectNotFound(Player, pkval=player_id)
         player.delete()
+        touch_game(game_id)
+        lobby_entry = lobby.entry_of(game)
+    lobby.track(game_id, lobby_entry)
+    forget_ring(game_id)
+    forget_tally(game_id)
+    forget_hand(game_id, player_id)
     return {"message": f"Jugador {player_id} eliminado con éxito"}
@@ -0,0 +1,158 @@
+"""
+This file contains the compact representation of a player hand, used to
+validate the moves without going through the list of cards every time.
+
+The index of each player is cached by (game id, player id). It is built from
+the database the first time it is needed and then updated by the card crud
+functions that give or take the cards, once the change is committed. An index
+is never changed in place, a new one replaces it, so the player schemas that
+hold it keep the hand they were read with.
+"""
+from collections import Counter
+from typing import NamedTuple
+from src.theThing.cards.models import get_card_definition
+
+
+class HandCard(NamedTuple):
+    """
+    A card of a hand as read from the database, its definition is looked up
+    in the card catalog
+    """
+
+    id: int
+    type_id: int
+    state: int
+
+    @property
+    def code(self) -> str:
+        return get_card_definition(self.type_id).code
+
+    @property
+    def kind(self) -> int:
+        return get_card_definition(self.type_id).kind
+
+
+class HandIndex:
+    """
+    Bitset of the card ids in a hand (relative to the lowest id), plus the
+    amount of cards of each code and kind.
+    Cards can be any object with id, code and kind attributes.
+    """
+
+    def __init__(self, cards=()):
+        cards = list(cards)
+        self.base = min((card.id for card in cards), default=0)
+        self.mask = 0
+        self.codes = Counter()
+        self.kinds = Counter()
+        for card in cards:
+            self.mask |= 1 << (card.id - self.base)
+            self.codes[card.code] += 1
+            self.kinds[card.kind] += 1
+        self.size = len(cards)
+
+    def __len__(self):
+        return self.size
+
+    def _copy(self):
+        hand = HandIndex()
+        hand.base = self.base
+        hand.mask = self.mask
+        hand.codes = self.codes.copy()
+        hand.kinds = self.kinds.copy()
+        hand.size = self.size
+        return hand
+
+    def with_cards(self, cards):
+        """
+        Return a new index with the cards added
+        """
+        hand = self._copy()
+        for card in cards:
+            if card.id in hand:
+                continue
+            if not hand.size:
+                hand.base, hand.mask = card.id, 0
+            elif card.id < hand.base:
+                hand.mask <<= hand.base - card.id
+                hand.base = card.id
+            hand.mask |= 1 << (card.id - hand.base)
+            hand.codes[card.code] += 1
+            hand.kinds[card.kind] += 1
+            hand.size += 1
+        return hand
+
+    def without_card(self, card):
+        """
+        Return a new index without the card
+        """
+        hand = self._copy()
+        if card.id in hand:
+            hand.mask &= ~(1 << (card.id - hand.base))
+            hand.codes[card.code] -= 1
+            hand.kinds[card.kind] -= 1
+            hand.size -= 1
+        return hand
+
+    def __contains__(self, card_id: int) -> bool:
+        if card_id < self.base:
+            return False
+        return bool(self.mask >> (card_id - self.base) & 1)
+
+    def has_code(self, code: str) -> bool:
+        return self.codes[code] > 0
+
+    def count_code(self, code: str) -> int:
+        return self.codes[code]
+
+    def count_kind(self, kind: int) -> int:
+        return self.kinds[kind]
+
+    def is_last_infection(self, card) -> bool:
+        """
+        Return True if the card is the only infection card in the hand
+        """
+        return (
+            card.code == "inf"
+            and card.id in self
+            and self.codes["inf"] == 1
+        )
+
+
+# Cache of hand indexes by (game id, player id)
+hand_indexes = {}
+
+
+def cached_hand(game_id: int, player_id: int):
+    return hand_indexes.get((int(game_id), int(player_id)))
+
+
+def keep_hand(game_id: int, player_id: int, hand: HandIndex):
+    hand_indexes[(int(game_id), int(player_id))] = hand
+
+
+def forget_hand(game_id: int, player_id: int):
+    hand_indexes.pop((int(game_id), int(player_id)), None)
+
+
+def forget_hands(game_id: int):
+    for key in [key for key in hand_indexes if key[0] == int(game_id)]:
+        del hand_indexes[key]
+
+
+def add_to_hand(game_id: int, player_id: int, cards):
+    """
+    Update the cached hand of a player after he receives the cards
+    """
+    hand = cached_hand(game_id, player_id)
+    if hand is not None:
+        keep_hand(game_id, player_id, hand.with_cards(cards))
+
+
+def remove_from_hand(game_id: int, player_id: int, card):
+    """
+    Update the cached hand of a player after he loses the card
+    """
+    hand = cached_hand(game_id, player_id)
+    if hand is not None:
+        keep_hand(game_id, player_id, hand.without_card(card))
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, PrivateAttr, computed_field
 from typing import Optional, List
-from src.theThing.cards.models import Card
+from src.theThing.cards.models import Card, get_card_definition
 from src.theThing.cards.schemas import CardBase
+from src.theThing.players.hand import HandCard, HandIndex
 
 
 class PlayerCreate(BaseModel):
@@ -20,12 +21,45 @@ class PlayerBase(PlayerCreate):
     alive: Optional[bool] = None
     quarantine: Optional[int] = None
     owner: Optional[bool] = None
-    hand: List[CardBase] = None
     card_to_exchange: Optional[CardBase] = None
+    # The hand is kept as HandCard rows, its schemas are built the first time
+    # it is read or the player is serialized
+    _cards: Optional[List[HandCard]] = PrivateAttr(default=None)
+    _hand: Optional[List[CardBase]] = PrivateAttr(default=None)
+    _hand_index: Optional[HandIndex] = PrivateAttr(default=None)
+
+    def __init__(self, hand: List[CardBase] = None, **data):
+        super().__init__(**data)
+        self._hand = hand
+
+    @computed_field
+    @property
+    def hand(self) -> Optional[List[CardBase]]:
+        if self._hand is None and self._cards is not None:
+            self._hand = [
+                CardBase(
+                    id=card.id,
+                    state=card.state,
+                    **get_card_definition(card.type_id)._asdict(),
+                )
+                for card in self._cards
+            ]
+        return self._hand
+
+    @property
+    def hand_index(self) -> HandIndex:
+        if self._hand_index is None:
+            cards = self._cards if self._cards is not None else self.hand
+            self._hand_index = HandIndex(cards or [])
+        return self._hand_index
 
     @classmethod
-    def model_validate(cls, player, card_to_exchange=None):
-        return cls(
+    def model_validate(cls, player, card_to_exchange=None, hand_index=None):
+        """
+        Build the schema of a player, inside the db_session that read it.
+        hand_index is the cached index of his hand, if any.
+        """
+        response = cls(
             id=player.id,
             name=player.name,
             table_position=player.table_position,
@@ -33,9 +67,13 @@ class PlayerBase(PlayerCreate):
             alive=player.alive,
             quarantine=player.quarantine,
             owner=player.owner,
-            hand=player.hand,
             card_to_exchange=card_to_exchange,
         )
+        response._cards = [
+            HandCard(card.id, card.type.id, card.state) for card in player.hand
+        ]
+        response._hand_index = hand_index
+        return response
 
 
 class PlayerForGame(BaseModel):
@@ -57,3 +95,25 @@ class PlayerUpdate(BaseModel):
     quarantine: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class CardMove(BaseModel):
+    # A card that can be played and the names of its possible targets
+    card_id: int
+    targets: List[str] = []
+
+
+class PlayerMoves(BaseModel):
+    # This is used to return the legal moves of a player in a game version
+    version: Optional[int] = None
+    steal: bool = False
+    play: List[CardMove] = []
+    discard: List[int] = []
+    respond: bool = False
+    defend: List[int] = []
+    exchange: List[int] = []
+    defend_exchange: List[int] = []
+    # the panic card to apply (cac or olv) and the cards it can take
+    panic: Optional[str] = None
+    panic_cards: List[int] = []
+    finish_turn: bool = False
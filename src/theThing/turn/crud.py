@@ -1,6 +1,49 @@
 from . import schemas, models
 from pony.orm import db_session
 from .schemas import TurnCreate
+from src.theThing.games.seating import get_ring
+from src.theThing.games.timers import arm_turn_deadline
+from src.theThing.games.versions import touch_game
+
+
+def get_player_id(game_id: int, player_name: str):
+    """
+    This function translates a player name received from the clients
+    to the player id saved in the turn
+    """
+    if not player_name:
+        return None
+    seat = get_ring(game_id).player_named(player_name)
+    if seat is None:
+        raise Exception("No se encontró el jugador")
+    return seat.id
+
+
+def get_player_name(game_id: int, player_id: int):
+    """
+    This function translates a player id saved in the turn
+    to the player name sent to the clients
+    """
+    if player_id is None:
+        return None
+    seat = get_ring(game_id).player_with_id(player_id)
+    return seat.name if seat is not None else None
+
+
+def turn_to_schema(turn: models.Turn) -> TurnCreate:
+    game_id = turn.game.id
+    return schemas.TurnCreate(
+        owner=turn.owner,
+        played_card=turn.played_card,
+        destination_player=get_player_name(
+            game_id, turn.destination_player_id
+        ),
+        response_card=turn.response_card,
+        destination_player_exchange=get_player_name(
+            game_id, turn.destination_player_exchange_id
+        ),
+        state=turn.state,
+    )
 
 
 def create_turn(game_id: int, turn_owner: int, exchange_player: str):
@@ -8,11 +51,15 @@ def create_turn(game_id: int, turn_owner: int, exchange_player: str):
         turn = models.Turn(
             game=game_id,
             owner=turn_owner,
-            destination_player_exchange=exchange_player,
+            destination_player_exchange_id=get_player_id(
+                game_id, exchange_player
+            ),
             state=0,
         )
+        touch_game(game_id)
         turn.flush()
-        response = schemas.TurnCreate.model_validate(turn)
+        arm_turn_deadline(game_id, turn.state)
+        response = turn_to_schema(turn)
     return response
 
 
@@ -23,7 +70,17 @@ def update_turn(game_id: int, new_turn: TurnCreate):
     """
     with db_session:
         turn_to_update = models.Turn[game_id]
-        turn_to_update.set(**new_turn.model_dump(exclude_unset=True))
+        turn_data = new_turn.model_dump(exclude_unset=True)
+        # The players are saved by id, the names are only used by the clients
+        for field in ["destination_player", "destination_player_exchange"]:
+            if field in turn_data:
+                turn_data[field + "_id"] = get_player_id(
+                    game_id, turn_data.pop(field)
+                )
+        turn_to_update.set(**turn_data)
+        touch_game(game_id)
         turn_to_update.flush()
-        response = schemas.TurnCreate.model_validate(turn_to_update)
+        if "state" in turn_data:
+            arm_turn_deadline(game_id, turn_to_update.state)
+        response = turn_to_schema(turn_to_update)
     return response
@@ -11,9 +11,9 @@ class Turn(db.Entity):
     game = PrimaryKey("Game", reverse="turn")
     owner = Optional(int)
     played_card = Optional(int)
-    destination_player = Optional(str)
+    destination_player_id = Optional(int)
     response_card = Optional(int)
-    destination_player_exchange = Optional(str)
+    destination_player_exchange_id = Optional(int)
     state = Optional(int)
     # 0 = stealing card, 1 = deciding (play/discard), 2 = waiting response,
     # 3 = exchanging cards, 4 = finished exchange, 5 = waiting to finish,
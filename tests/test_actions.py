@@ -0,0 +1,191 @@
+import asyncio
+from fastapi.testclient import TestClient
+from src.main import app
+from .test_setup import test_db, clear_db
+from src.theThing.games import socket_actions
+from src.theThing.games.actions import (
+    ActionBatch,
+    run_action,
+    run_action_batch,
+)
+from src.theThing.games.turn_machine import (
+    dispatch,
+    turn_action,
+    turn_handlers,
+)
+from src.theThing.games.crud import get_game
+from src.theThing.games.versions import get_version
+from src.theThing.players.crud import get_player
+
+client = TestClient(app)
+
+
+def test_socket_steal(test_db):
+    game_data = {
+        "game": {"name": "Socket Game", "min_players": 4, "max_players": 5},
+        "host": {"name": "Test Host"},
+    }
+    game_id = client.post("/game/create", json=game_data).json()["game_id"]
+    for name in ["Test Player 2", "Test Player 3", "Test Player 4"]:
+        client.post(
+            "/game/join", json={"game_id": game_id, "player_name": name}
+        )
+    client.post(
+        "/game/start", json={"game_id": game_id, "player_name": "Test Host"}
+    )
+    # an old version is rejected before running the action
+    ack = asyncio.run(run_action("steal", game_id, 1, {"version": -1}))
+    assert ack["status"] == 412
+
+    ack = asyncio.run(
+        run_action(
+            "steal",
+            game_id,
+            1,
+            {"version": get_version(game_id), "idempotency_key": "robo"},
+        )
+    )
+    assert ack == {
+        "status": 200,
+        "data": {"message": "Carta robada con éxito"},
+    }
+    assert len(get_player(1, game_id).hand) == 5
+
+    # the retry gets the same ack, the player can not steal again
+    retry = asyncio.run(
+        run_action("steal", game_id, 1, {"idempotency_key": "robo"})
+    )
+    assert retry == ack
+    ack = asyncio.run(run_action("steal", game_id, 1, None))
+    assert ack == {
+        "status": 422,
+        "detail": "No es posible robar una carta en este momento",
+    }
+
+
+def test_action_batch(test_db):
+    game_data = {
+        "game": {"name": "Batch Game", "min_players": 4, "max_players": 5},
+        "host": {"name": "Test Host"},
+    }
+    response = client.post("/game/create", json=game_data).json()
+    game_id, player_id = response["game_id"], response["player_id"]
+    for name in ["Test Player 2", "Test Player 3", "Test Player 4"]:
+        client.post(
+            "/game/join", json={"game_id": game_id, "player_name": name}
+        )
+    client.post(
+        "/game/start", json={"game_id": game_id, "player_name": "Test Host"}
+    )
+    card = next(
+        card
+        for card in get_player(player_id, game_id).hand
+        if card.code not in ("lco", "inf")
+    )
+
+    actions = [
+        {"action": "steal"},
+        {"action": "discard", "card_id": card.id},
+        {"action": "steal"},
+        {"action": "finish_turn"},
+    ]
+    response = client.post(
+        f"/game/{game_id}/actions",
+        json={"player_id": player_id, "actions": actions},
+    )
+    # the second steal can not follow the discard, nothing is applied
+    assert response.status_code == 422
+    assert response.json()["detail"] == (
+        "Acción 3: No es posible robar una carta en este momento"
+    )
+    assert card.id in [c.id for c in get_player(player_id, game_id).hand]
+    assert get_game(game_id).turn.state == 0
+
+    # the card is checked when the action runs
+    actions = [
+        {"action": "steal"},
+        {"action": "discard", "card_id": 9999},
+    ]
+    response = client.post(
+        f"/game/{game_id}/actions",
+        json={"player_id": player_id, "actions": actions},
+    )
+    assert response.status_code == 404
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [200, 404]
+
+    response = client.post(
+        f"/game/{game_id}/actions",
+        json={"player_id": player_id, "actions": [{"action": "fly"}]},
+    )
+    assert response.json()["detail"] == "Acción 1: la acción fly no existe"
+
+
+def test_action_batch_holds_the_game_lock():
+    handler = turn_handlers["steal"]
+    applied = []
+
+    @turn_action("steal")
+    async def slow_steal(data: dict):
+        await asyncio.sleep(0.01)
+        applied.append(data["player_id"])
+        return {"message": "ok"}
+
+    async def batch_and_other():
+        batch = ActionBatch(
+            player_id=1, actions=[{"action": "steal"}, {"action": "steal"}]
+        )
+        return await asyncio.gather(
+            run_action_batch(77, batch),
+            dispatch("steal", {"game_id": 77, "player_id": 2}),
+        )
+
+    try:
+        asyncio.run(batch_and_other())
+    finally:
+        turn_handlers["steal"] = handler
+    # the other player waits until the whole batch is applied
+    assert applied == [1, 1, 2]
+
+
+def test_socket_handler_uses_the_session(monkeypatch):
+    sessions = {
+        "spectator": {"game_id": "7"},
+        "player": {"player_id": "3", "game_id": "7"},
+    }
+    calls = []
+
+    async def get_session(sid):
+        return sessions[sid]
+
+    async def slow_run_action(action, game_id, player_id, data):
+        calls.append(("start", data["n"], game_id, player_id))
+        await asyncio.sleep(0.01 if data["n"] == 1 else 0)
+        calls.append(("end", data["n"]))
+        return {"status": 200, "data": {}}
+
+    monkeypatch.setattr(socket_actions.sio, "get_session", get_session)
+    monkeypatch.setattr(socket_actions, "run_action", slow_run_action)
+    handler = socket_actions.make_handler("steal")
+
+    async def send_two():
+        return await asyncio.gather(
+            # the player_id of the payload is ignored
+            handler("player", {"n": 1, "player_id": 99}),
+            handler("player", {"n": 2}),
+        )
+
+    # a connection without a player can not run actions
+    ack = asyncio.run(handler("spectator", {"n": 0}))
+    assert ack["status"] == 403
+    assert calls == []
+
+    assert asyncio.run(send_two()) == [{"status": 200, "data": {}}] * 2
+    # the identity comes from the session, and the second action waits
+    # for the first one of the same connection
+    assert calls == [
+        ("start", 1, "7", "3"),
+        ("end", 1),
+        ("start", 2, "7", "3"),
+        ("end", 2),
+    ]
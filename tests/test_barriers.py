@@ -0,0 +1,70 @@
+from .test_setup import test_db, clear_db
+from src.theThing.games import crud as game_crud
+from src.theThing.games.barriers import BarrierIndex, get_barriers
+from src.theThing.games.schemas import GameCreate, GameUpdate
+from src.theThing.games.seating import Seat, SeatingRing
+
+
+def create_ring():
+    seats = [
+        Seat(
+            id=position,
+            name=f"P{position}",
+            table_position=position,
+            alive=True,
+        )
+        for position in range(1, 6)
+    ]
+    return SeatingRing(seats)
+
+
+def test_barrier_between_adjacent_seats():
+    ring = create_ring()
+    barriers = BarrierIndex([2])
+    assert barriers.between(ring, 2, 3)
+    assert barriers.between(ring, 3, 2)
+    assert not barriers.between(ring, 1, 2)
+    # following the play direction
+    assert barriers.between(ring, 2, 3, True)
+    assert not barriers.between(ring, 2, 1, False)
+    assert barriers.between(ring, 3, 2, False)
+
+
+def test_barrier_first_and_last_seat():
+    ring = create_ring()
+    barriers = BarrierIndex()
+    barriers.add(barriers.edge_between(ring, 1, 5))
+    assert barriers.to_list() == [5]
+    assert barriers.between(ring, 1, 5)
+    assert barriers.between(ring, 5, 1)
+
+
+def test_barrier_moves_on_death():
+    ring = create_ring()
+    barriers = BarrierIndex([3])
+    barriers.on_death(ring, 3)
+    ring.kill(3)
+    assert barriers.to_list() == [2]
+    assert barriers.between(ring, 2, 4)
+
+
+def test_barrier_clear():
+    barriers = BarrierIndex([1, 4])
+    barriers.clear()
+    assert not barriers
+    assert barriers.to_list() == []
+
+
+def test_barriers_cached_by_game(test_db):
+    game = game_crud.create_game(
+        GameCreate(name="Barrier Game", min_players=4, max_players=5)
+    )
+    barriers = get_barriers(game.id)
+    assert not barriers
+    assert get_barriers(game.id) is barriers
+
+    # saving the obstacles replaces the cached index
+    game_crud.update_game(game.id, GameUpdate(obstacles=[2]))
+    assert get_barriers(game.id).has_door(2)
+    game_crud.update_game(game.id, GameUpdate(state=0))
+    assert get_barriers(game.id).has_door(2)
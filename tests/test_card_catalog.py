@@ -0,0 +1,55 @@
+from .test_setup import test_db, clear_db
+from src.theThing.cards import crud as card_crud
+from src.theThing.cards.models import (
+    Card,
+    CardType,
+    card_catalog,
+    card_type_ids,
+)
+from src.theThing.cards.static_cards import dict_of_cards
+from src.theThing.games import crud as game_crud
+from src.theThing.games import schemas as game_schemas
+from pony.orm import db_session, rollback
+
+
+@db_session
+def test_deck_shares_card_types(test_db):
+    game_data = game_schemas.GameCreate(
+        name="Test Game catalog", min_players=4, max_players=4
+    )
+    created_game = game_crud.create_game(game_data)
+    game_crud.create_game_deck(created_game.id, 4)
+
+    deck = Card.select(lambda c: c.game.id == created_game.id)[:]
+    types = {card.type.id for card in deck}
+    assert len(types) < len(deck)
+    assert CardType.select().count() == len(types)
+
+    card = deck[0]
+    definition = card_catalog[card.type.id]
+    assert card.code == definition.code == card.type.code
+    assert card.description == card.type.description
+
+    rollback()
+
+
+@db_session
+def test_load_card_catalog(test_db):
+    card_crud.load_card_catalog()
+    card_crud.load_card_catalog()
+    assert CardType.select().count() == len(dict_of_cards)
+    assert len(card_type_ids) == len(dict_of_cards)
+
+    # the cards of a deck take their type from the loaded catalog
+    game_data = game_schemas.GameCreate(
+        name="Test Game loaded catalog", min_players=4, max_players=4
+    )
+    created_game = game_crud.create_game(game_data)
+    game_crud.create_game_deck(created_game.id, 4)
+    deck = Card.select(lambda c: c.game.id == created_game.id)[:]
+    assert all(
+        card_type_ids[card.definition] == card.type.id for card in deck
+    )
+    assert CardType.select().count() == len(dict_of_cards)
+    rollback()
+    card_type_ids.clear()
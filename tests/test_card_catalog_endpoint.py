@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+from src.main import app
+from src.theThing.cards.static_cards import dict_of_cards
+from src.theThing.games.socket_handler import compact_player
+from src.theThing.players.schemas import PlayerBase
+from src.theThing.cards.schemas import CardBase
+
+client = TestClient(app)
+
+
+def test_get_card_catalog():
+    response = client.get("/cards/catalog")
+    assert response.status_code == 200
+    codes = {card["code"] for card in response.json()}
+    assert codes == {card["code"] for card in dict_of_cards.values()}
+    assert "max-age" in response.headers["cache-control"]
+
+    etag = response.headers["etag"]
+    response = client.get("/cards/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_compact_player():
+    card = CardBase(
+        id=7,
+        code="lla",
+        name="Lanzallamas",
+        kind=0,
+        description="Elimina a un jugador",
+        number_in_card=4,
+        state=1,
+        playable=True,
+    )
+    player = PlayerBase(id=1, name="P1", hand=[card], card_to_exchange=card)
+    data = compact_player(player)
+    assert data["hand"] == [[7, "lla"]]
+    assert data["card_to_exchange"] == [7, "lla"]
+    assert data["name"] == "P1"
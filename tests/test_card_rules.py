@@ -0,0 +1,35 @@
+import pytest
+from src.theThing.cards.card_rules import (
+    CardRule,
+    compile_card_rules,
+    get_card_rule,
+    card_rules,
+)
+
+
+def test_card_rules_compiled():
+    assert card_rules["lla"] == CardRule.PLAYABLE
+    assert card_rules["sed"] == (
+        CardRule.PLAYABLE | CardRule.TARGET_ANY | CardRule.IGNORES_OBSTACLES
+    )
+    assert card_rules["whk"] & CardRule.TARGET_SELF
+    assert card_rules["sda"] & CardRule.TARGET_ANY
+    assert not card_rules["sda"] & CardRule.IGNORES_OBSTACLES
+    # defense, infection and The Thing cards can not be played
+    assert not card_rules["ngs"] & CardRule.PLAYABLE
+    assert not card_rules["inf"] & CardRule.PLAYABLE
+    assert not card_rules["lco"] & CardRule.PLAYABLE
+
+
+def test_card_rules_unknown_code():
+    assert get_card_rule("def", 0) == CardRule.PLAYABLE
+    assert get_card_rule("def", 1) == CardRule.NONE
+
+
+def test_card_rules_inconsistent():
+    cards = {
+        "a4": {"code": "a", "kind": 0, "target": "any"},
+        "a6": {"code": "a", "kind": 0, "target": "adjacent"},
+    }
+    with pytest.raises(ValueError):
+        compile_card_rules(cards)
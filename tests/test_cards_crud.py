@@ -151,6 +151,16 @@ def test_player_hand(test_db):
         ),
     ]
     assert [card in player_data.hand for card in expected_cards]
+    assert created_card1.id in player_data.hand_index
+    assert len(player_data.model_dump()["hand"]) == 2
+
+    # the hand index follows the cards taken from the player
+    card_crud.remove_card_from_player(
+        created_card1.id, created_player.id, created_game.id
+    )
+    hand = player_crud.get_hand_index(created_player.id, created_game.id)
+    assert created_card1.id not in hand and created_card2.id in hand
+    assert created_card1.id in player_data.hand_index
 
     rollback()
 
@@ -243,3 +253,50 @@ def test_update_card_state(test_db):
     )
 
     assert updated_card.state == 1
+
+
+@db_session
+def test_draw_cards_skips_panic(test_db):
+    game_data = game_schemas.GameCreate(
+        name="Test Game draw", min_players=2, max_players=4
+    )
+    created_game = game_crud.create_game(game_data)
+    created_player = player_crud.create_player(
+        player_schemas.PlayerCreate(name="Test Player", owner=True),
+        created_game.id,
+    )
+    for kind in [4, 4, 0, 0, 4]:
+        card_crud.create_card(
+            CardCreate(
+                code=f"test_code{kind}",
+                name="Test Card",
+                kind=kind,
+                description="This is a test card",
+                number_in_card=1,
+                playable=True,
+            ),
+            created_game.id,
+        )
+
+    drawn = card_crud.draw_cards(
+        created_game.id, created_player.id, 2, card_crud.is_not_panic
+    )
+
+    assert [card.kind for card in drawn] == [0, 0]
+    player_data = player_crud.get_player(created_player.id, created_game.id)
+    assert {card.id for card in player_data.hand} == {
+        card.id for card in drawn
+    }
+    deck = game_crud.get_full_game(created_game.id).deck
+    assert all(card.state != 2 or card.kind == 4 for card in deck)
+
+    # there are no more non panic cards to draw
+    try:
+        card_crud.draw_cards(
+            created_game.id, created_player.id, 1, card_crud.is_not_panic
+        )
+        assert False
+    except Exception as e:
+        assert e.args[0] == "La carta no existe en el mazo"
+
+    rollback()
@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 from src.main import app
-from src.theThing.games.crud import get_full_game
+from src.theThing.games.crud import create_game_deck, get_full_game
+from src.theThing.games.models import Game
+from src.theThing.games.versions import get_version
 from pony.orm import db_session, rollback
 from tests.test_setup import test_db, clear_db
 
@@ -95,3 +97,17 @@ def test_create_deck_6_players_success(test_db):
     assert len(game.deck) == 50
     # Check that the deck contains the card "lco"
     assert any(card.code == "lco" for card in game.deck)
+
+
+@db_session
+def test_create_deck_changes_the_version_once(test_db):
+    game = Game(name="Test Game", min_players=4, max_players=5)
+    game.flush()
+    version = get_version(game.id)
+
+    create_game_deck(game.id, 4)
+
+    assert len(game.deck) == 32
+    assert get_version(game.id) == version + 1
+
+    rollback()
@@ -0,0 +1,43 @@
+from src.theThing.games.event_log import EventLog
+
+
+def test_event_log_since():
+    log = EventLog(size=3)
+    for i in range(5):
+        logged = log.record("action", {"log": f"evento {i}"})
+    assert logged.seq == 5
+    assert logged.data == {"log": "evento 4", "seq": 5}
+
+    assert [event.seq for event in log.since(3)] == [4, 5]
+    assert [event.seq for event in log.since(2)] == [3, 4, 5]
+    assert log.since(5) == []
+    # the first events are no longer in the log
+    assert log.since(1) is None
+    # unknown token, for example from before a restart
+    assert log.since(9) is None
+
+
+def test_event_log_compact_data():
+    log = EventLog()
+    logged = log.record("panic", {"cards": [{}]}, {"cards": [[1, "cac"]]})
+    assert logged.compact_data == {"cards": [[1, "cac"]], "seq": 1}
+
+
+def test_event_log_replays_last_statuses():
+    log = EventLog()
+    log.record("game_status", {"state": 1})
+    log.record("player_status", {"hand": []}, player_id=1)
+    log.record("action", {"log": "evento"})
+    log.record("player_status", {"hand": []}, player_id=2)
+    log.record("game_status", {"state": 2})
+    log.record("player_status", {"hand": [{}]}, player_id=1)
+
+    # only the last status of each kind, and the player_status of the player
+    missed = log.since(0, player_id=1)
+    assert [(event.event, event.seq) for event in missed] == [
+        ("action", 3),
+        ("game_status", 5),
+        ("player_status", 6),
+    ]
+    assert [event.seq for event in log.since(0, player_id=2)] == [3, 4, 5]
+    assert log.since(6, player_id=1) == []
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from .test_setup import test_db, clear_db
 from fastapi.testclient import TestClient
@@ -11,6 +12,8 @@ from src.theThing.cards import crud as card_crud
 from src.theThing.cards.schemas import CardCreate
 from src.theThing.turn import crud as turn_crud
 from src.theThing.turn import schemas as turn_schemas
+from src.theThing.games.endpoints import try_with_each_card
+from src.theThing.games.seating import get_ring
 
 client = TestClient(app)
 
@@ -189,3 +192,40 @@ def test_exchange_defense_ngs(test_db):
     # finish the turn
     response = client.put("/turn/finish", json={"game_id": 1})
     assert response.status_code == 200
+
+
+def test_expired_exchange_withdraws_the_offer(test_db):
+    # Test #4: the exchange expires and no card of the destination player
+    # works, the turn ends without the pending offer
+    owner = get_ring(1).player_at(game_crud.get_game(1).turn.owner)
+    response = client.put(
+        "/game/steal", json={"game_id": 1, "player_id": owner.id}
+    )
+    assert response.status_code == 200
+    turn_crud.update_turn(1, turn_schemas.TurnCreate(state=3))
+    offered_card = [
+        card
+        for card in player_crud.get_player(owner.id, 1).hand
+        if card.kind not in [3, 5]
+    ][0]
+    exchange_data = {
+        "game_id": 1,
+        "player_id": owner.id,
+        "card_id": offered_card.id,
+    }
+    response = client.put("/game/exchange", json=exchange_data)
+    assert response.status_code == 200
+    assert player_crud.get_player(owner.id, 1).card_to_exchange is not None
+
+    async def refuse(card_id):
+        raise Exception("No es posible intercambiar esta carta")
+
+    destination = get_ring(1).player_named(
+        game_crud.get_game(1).turn.destination_player_exchange
+    )
+    asyncio.run(try_with_each_card(destination.id, 1, refuse))
+    assert game_crud.get_game(1).turn.state == 5
+    assert player_crud.get_player(owner.id, 1).card_to_exchange is None
+    # finish the turn
+    response = client.put("/turn/finish", json={"game_id": 1})
+    assert response.status_code == 200
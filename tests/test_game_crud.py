@@ -9,6 +9,9 @@ from src.theThing.games.schemas import (
     GameBase,
     GameInDB,
 )
+from src.theThing.games.event_log import event_logs, get_event_log
+from src.theThing.games.presence import presence
+from src.theThing.games.seating import get_ring, rings
 from .test_setup import test_db, clear_db
 
 
@@ -102,3 +105,25 @@ def test_update_game(test_db):
     assert updated_game.play_direction == updated_data["play_direction"]
 
     rollback()
+
+
+@db_session
+def test_finished_game_forgets_caches(test_db):
+    game = Game(name="Test Game", min_players=2, max_players=4)
+    game.flush()
+    get_ring(game.id)
+    get_event_log(game.id).record("action", {"log": "evento"})
+    presence.touch(game.id)
+
+    crud.update_game(game.id, GameUpdate(state=2))
+
+    assert game.id not in rings
+    assert game.id not in event_logs
+    assert game.id not in presence.last_activity
+
+    # deleting the game drops the event log too
+    get_event_log(game.id).record("game_finished", {"log": "fin"})
+    crud.delete_game(game.id)
+    assert game.id not in event_logs
+
+    rollback()
@@ -0,0 +1,63 @@
+from src.theThing.cards.schemas import CardBase
+from src.theThing.players.hand import HandIndex
+
+
+def create_card(card_id, code, kind):
+    return CardBase(
+        id=card_id,
+        code=code,
+        name=code,
+        kind=kind,
+        description="",
+        number_in_card=4,
+        state=1,
+        playable=True,
+    )
+
+
+def test_hand_index_queries():
+    hand = HandIndex(
+        [
+            create_card(40, "inf", 3),
+            create_card(42, "lla", 0),
+            create_card(45, "inf", 3),
+            create_card(47, "ngs", 1),
+        ]
+    )
+    assert len(hand) == 4
+    assert 42 in hand
+    assert 41 not in hand
+    assert 3 not in hand
+    assert hand.count_code("inf") == 2
+    assert hand.count_kind(1) == 1
+    assert not hand.has_code("lco")
+    assert not hand.is_last_infection(create_card(40, "inf", 3))
+
+
+def test_hand_index_last_infection():
+    infection = create_card(7, "inf", 3)
+    hand = HandIndex([infection, create_card(9, "sos", 0)])
+    assert hand.is_last_infection(infection)
+    assert not hand.is_last_infection(create_card(8, "inf", 3))
+
+
+def test_hand_index_empty():
+    hand = HandIndex()
+    assert len(hand) == 0
+    assert 1 not in hand
+
+
+def test_hand_index_changes_return_new_index():
+    hand = HandIndex([create_card(20, "lla", 0)])
+    bigger = hand.with_cards(
+        [create_card(15, "inf", 3), create_card(22, "sos", 0)]
+    )
+    assert len(hand) == 1 and 15 not in hand
+    assert len(bigger) == 3
+    assert 15 in bigger and 20 in bigger and 22 in bigger
+    smaller = bigger.without_card(create_card(15, "inf", 3))
+    assert 15 not in smaller and 20 in smaller
+    assert not smaller.has_code("inf")
+    assert bigger.count_code("inf") == 1
+    empty = HandIndex().with_cards([create_card(3, "ate", 1)])
+    assert 3 in empty and empty.count_kind(1) == 1
@@ -0,0 +1,60 @@
+import asyncio
+from fastapi.testclient import TestClient
+from src.main import app
+from .test_setup import test_db, clear_db
+from src.theThing.games.idempotency import IdempotencyCache, idempotent
+from src.theThing.players.crud import get_player
+
+client = TestClient(app)
+
+
+def test_idempotency_cache_lru():
+    cache = IdempotencyCache(size=2)
+    cache.put((1, 1, "a"), {"message": "a"})
+    cache.put((1, 1, "b"), {"message": "b"})
+    assert cache.get((1, 1, "a")) == {"message": "a"}
+    cache.put((1, 1, "c"), {"message": "c"})
+    # b was the least recently used
+    assert cache.get((1, 1, "b")) is None
+    assert len(cache) == 2
+
+
+def test_idempotent_runs_once():
+    calls = []
+
+    @idempotent
+    async def action(data: dict, idempotency_key=None):
+        calls.append(data)
+        return {"message": f"llamada {len(calls)}"}
+
+    data = {"game_id": 1, "player_id": 2}
+    first = asyncio.run(action(data, idempotency_key="x"))
+    second = asyncio.run(action(data, idempotency_key="x"))
+    assert first == second == {"message": "llamada 1"}
+    # without key or with another player the action runs again
+    asyncio.run(action(data))
+    asyncio.run(action({"game_id": 1, "player_id": 3}, idempotency_key="x"))
+    assert len(calls) == 3
+
+
+def test_steal_card_retry(test_db):
+    game_data = {
+        "game": {"name": "Test Game", "min_players": 4, "max_players": 5},
+        "host": {"name": "Test Host"},
+    }
+    game_id = client.post("/game/create", json=game_data).json()["game_id"]
+    for name in ["Test Player 2", "Test Player 3", "Test Player 4"]:
+        client.post(
+            "/game/join", json={"game_id": game_id, "player_name": name}
+        )
+    client.post(
+        "/game/start", json={"game_id": game_id, "player_name": "Test Host"}
+    )
+
+    steal_data = {"game_id": game_id, "player_id": 1}
+    headers = {"Idempotency-Key": "robo-1"}
+    for _ in range(2):
+        response = client.put("/game/steal", json=steal_data, headers=headers)
+        assert response.status_code == 200
+        assert response.json() == {"message": "Carta robada con éxito"}
+    assert len(get_player(1, game_id).hand) == 5
@@ -43,3 +43,32 @@ def test_get_game_list(test_db):
         }
     ]
     rollback()
+
+
+@db_session
+def test_get_game_list_filtered(test_db):
+    for name, max_players in [("Mesa llena", 4), ("Otra mesa", 5)]:
+        game_data = {
+            "game": {
+                "name": name,
+                "min_players": 4,
+                "max_players": max_players,
+            },
+            "host": {"name": "Player1", "owner": True},
+        }
+        response = client.post("/game/create", json=game_data)
+        assert response.status_code == 201
+
+    response = client.get("/game/list", params={"name": "Mesa"})
+    assert [game["name"] for game in response.json()] == ["Mesa llena"]
+
+    response = client.get("/game/list", params={"offset": 1, "limit": 1})
+    assert [game["name"] for game in response.json()] == ["Mesa llena"]
+
+    # Mesa llena has 3 free seats
+    response = client.get("/game/list", params={"free_seats": 4})
+    assert [game["name"] for game in response.json()] == [
+        "Test Game",
+        "Otra mesa",
+    ]
+    rollback()
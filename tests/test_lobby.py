@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+from src.theThing.games.lobby import Lobby
+
+
+def create_game(id, name, max_players, players, state=0, password=None):
+    return SimpleNamespace(
+        id=id,
+        name=name,
+        min_players=2,
+        max_players=max_players,
+        players=[object()] * players,
+        password=password,
+        state=state,
+    )
+
+
+def track(lobby, game):
+    lobby.track(game.id, Lobby.entry_of(game))
+
+
+def create_lobby():
+    lobby = Lobby()
+    lobby.loaded = True
+    track(lobby, create_game(3, "Mesa 3", 4, 4))
+    track(lobby, create_game(1, "Mesa 1", 6, 2, password="secreta"))
+    track(lobby, create_game(2, "Otra", 5, 1))
+    return lobby
+
+
+def test_lobby_list():
+    lobby = create_lobby()
+    assert [game.id for game in lobby.list()] == [1, 2, 3]
+    assert [game.id for game in lobby.list(offset=1, limit=1)] == [2]
+    assert [game.id for game in lobby.list(free_seats=1)] == [1, 2]
+    assert [game.id for game in lobby.list(name_prefix="Mesa")] == [1, 3]
+    assert lobby.get(1).has_password
+    assert not lobby.get(2).has_password
+
+
+def test_lobby_track_changes():
+    lobby = create_lobby()
+    track(lobby, create_game(2, "Otra", 5, 2))
+    assert lobby.get(2).amount_of_players == 2
+    # started games leave the lobby
+    track(lobby, create_game(2, "Otra", 5, 2, state=1))
+    assert lobby.get(2) is None
+    lobby.remove(1)
+    assert [game.id for game in lobby.list()] == [3]
+
+
+def test_lobby_etag_changes_with_the_process():
+    # two processes start with the same version, but not the same ETag
+    first, second = create_lobby(), create_lobby()
+    assert first.version == second.version
+    assert first.etag() != second.etag()
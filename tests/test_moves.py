@@ -0,0 +1,94 @@
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from src.main import app
+from .test_setup import test_db, clear_db
+from src.theThing.games.crud import get_game
+from src.theThing.games.seating import get_ring
+from src.theThing.games.utils import (
+    verify_data_discard_card,
+    verify_data_play_card,
+)
+from src.theThing.players.crud import get_player
+from src.theThing.cards import crud as card_crud
+from src.theThing.cards.schemas import CardCreate
+from src.theThing.turn.crud import update_turn
+from src.theThing.turn.schemas import TurnCreate
+
+client = TestClient(app)
+
+
+def is_valid(verify, *args):
+    try:
+        verify(*args)
+    except HTTPException:
+        return False
+    return True
+
+
+def test_moves_follow_the_validations(test_db):
+    game_data = {
+        "game": {"name": "Moves Game", "min_players": 4, "max_players": 5},
+        "host": {"name": "Test Host"},
+    }
+    game_id = client.post("/game/create", json=game_data).json()["game_id"]
+    for name in ["Test Player 2", "Test Player 3", "Test Player 4"]:
+        client.post(
+            "/game/join", json={"game_id": game_id, "player_name": name}
+        )
+    client.post(
+        "/game/start", json={"game_id": game_id, "player_name": "Test Host"}
+    )
+    ring = get_ring(game_id)
+    owner = ring.player_at(get_game(game_id).turn.owner)
+    other = ring.next_player(owner.table_position)
+
+    moves = client.get(f"/game/{game_id}/player/{owner.id}/moves").json()
+    assert moves["steal"]
+    moves = client.get(f"/game/{game_id}/player/{other.id}/moves").json()
+    assert not moves["steal"]
+
+    client.put("/game/steal", json={"game_id": game_id, "player_id": owner.id})
+    response = client.get(f"/game/{game_id}/player/{owner.id}/moves")
+    moves = response.json()
+    assert not moves["steal"]
+    playable = {move["card_id"]: move["targets"] for move in moves["play"]}
+    for card in get_player(owner.id, game_id).hand:
+        assert (card.id in moves["discard"]) == is_valid(
+            verify_data_discard_card, game_id, owner.id, card.id
+        )
+        for seat in ring.alive_seats():
+            assert (seat.name in playable.get(card.id, [])) == is_valid(
+                verify_data_play_card, game_id, owner.id, card.id, seat.name
+            )
+
+    # the moves change with the version of the game
+    etag = response.headers["ETag"]
+    response = client.get(
+        f"/game/{game_id}/player/{owner.id}/moves",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+    assert client.get(f"/game/{game_id}/player/100/moves").status_code == 404
+
+    # a played panic card waits for the cards of its owner
+    panic_card = card_crud.create_card(
+        CardCreate(
+            code="olv",
+            name="Olvidadizo",
+            kind=4,
+            description="Descarta 3 cartas de tu mano y roba 3 nuevas.",
+            number_in_card=4,
+            playable=True,
+        ),
+        game_id,
+    )
+    update_turn(game_id, TurnCreate(played_card=panic_card.id, state=6))
+    moves = client.get(f"/game/{game_id}/player/{owner.id}/moves").json()
+    assert moves["panic"] == "olv"
+    assert set(moves["panic_cards"]) == {
+        card.id
+        for card in get_player(owner.id, game_id).hand
+        if card.code != "lco"
+    }
+    moves = client.get(f"/game/{game_id}/player/{other.id}/moves").json()
+    assert moves["panic"] is None
@@ -0,0 +1,102 @@
+import asyncio
+from src.theThing.games.outbox import Outbox, EmitBuffer, fan_out
+
+
+def create_outbox(backlog, high_water=3):
+    sent = []
+
+    async def send(event, data):
+        sent.append((event, data))
+
+    return Outbox(send, lambda: backlog[0], high_water), sent
+
+
+def test_outbox_sends_in_order():
+    backlog = [0]
+    outbox, sent = create_outbox(backlog)
+    outbox.put("action", {"log": "1"})
+    outbox.put("discard", {"log": "2"})
+    assert asyncio.run(outbox.flush())
+    assert [event for event, _ in sent] == ["action", "discard"]
+
+
+def test_outbox_coalesces_snapshots():
+    backlog = [5]
+    outbox, sent = create_outbox(backlog)
+    assert outbox.put("game_status", {"v": 1})
+    assert outbox.put("action", {"log": "1"})
+    assert outbox.put("game_status", {"v": 2})
+    assert outbox.put("player_status", {"v": 1})
+    assert outbox.put("player_status", {"v": 2})
+    # the transport is full, nothing is sent
+    assert not asyncio.run(outbox.flush())
+    assert sent == []
+
+    backlog[0] = 0
+    assert asyncio.run(outbox.flush())
+    # the last snapshot goes after the events it follows
+    assert sent == [
+        ("action", {"log": "1"}),
+        ("game_status", {"v": 2}),
+        ("player_status", {"v": 2}),
+    ]
+
+
+def test_outbox_high_water():
+    outbox, _ = create_outbox([5], high_water=2)
+    assert outbox.put("action", {})
+    assert outbox.put("action", {})
+    assert not outbox.put("action", {})
+
+
+def test_fan_out_isolates_errors():
+    done = []
+
+    async def deliver(i):
+        await asyncio.sleep(0)
+        if i == 2:
+            raise ValueError("socket cerrado")
+        done.append(i)
+
+    errors = asyncio.run(fan_out((deliver(i) for i in range(5)), limit=2))
+    assert sorted(done) == [0, 1, 3, 4]
+    assert [str(error) for error in errors] == ["socket cerrado"]
+
+
+def test_emit_buffer_coalesces_status():
+    buffer = EmitBuffer()
+    buffer.put("game_status", {"v": 1}, "g1")
+    buffer.put("action", {"log": "robo"}, "g1")
+    buffer.put("game_status", {"v": 2}, "g1")
+    buffer.put("game_status", {"v": 1}, "g2")
+    assert buffer.pending == [
+        ["action", {"log": "robo"}, "g1", ()],
+        ["game_status", {"v": 2}, "g1", ()],
+        ["game_status", {"v": 1}, "g2", ()],
+    ]
+
+
+def test_emit_to_room_skips_only_backlogged_sockets(monkeypatch):
+    from src.theThing.games import socket_handler as sh
+
+    room_emits, delivered = [], []
+
+    async def emit(event, data, room=None, skip_sid=None, **kwargs):
+        room_emits.append((room, sorted(skip_sid)))
+
+    async def deliver(sid, event, data):
+        delivered.append(sid)
+
+    monkeypatch.setattr(sh.sio, "emit", emit)
+    monkeypatch.setattr(sh, "deliver", deliver)
+    monkeypatch.setattr(
+        sh.sio.manager,
+        "get_participants",
+        lambda namespace, room: [("a", 1), ("b", 2), ("c", 3)],
+    )
+    busy, _ = create_outbox([5])
+    monkeypatch.setattr(sh, "outboxes", {"a": create_outbox([0])[0], "b": busy})
+
+    asyncio.run(sh.emit_to_room("action", {}, "g1", skip_sid=["c"]))
+    assert room_emits == [("g1", ["b", "c"])]
+    assert delivered == ["b"]
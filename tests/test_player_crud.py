@@ -212,3 +212,40 @@ def test_delete_player(test_db):
         deleted_player = crud.delete_player(2, game_id=1)
     except ObjectNotFound as e:
         assert str(e) == "Player[2]"
+
+
+@db_session
+def test_permute_seats(test_db):
+    game_data = GameCreate(
+        name="Test Game seats", min_players=2, max_players=4
+    )
+    created_game = game_crud.create_game(game_data)
+    players = [
+        crud.create_player(PlayerCreate(name=f"Seat {i}"), created_game.id)
+        for i in range(3)
+    ]
+    crud.update_player(
+        PlayerUpdate(quarantine=2), players[0].id, created_game.id
+    )
+
+    seating = crud.permute_seats(
+        created_game.id,
+        {
+            players[0].id: 2,
+            players[1].id: 3,
+            players[2].id: 1,
+        },
+        reset_quarantine=True,
+    )
+
+    assert [player.name for player in seating] == [
+        "Seat 2",
+        "Seat 0",
+        "Seat 1",
+    ]
+    assert all(player.quarantine == 0 for player in seating)
+
+    with pytest.raises(Exception):
+        crud.permute_seats(created_game.id, {players[0].id: 3})
+
+    rollback()
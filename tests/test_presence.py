@@ -0,0 +1,30 @@
+from src.theThing.games.presence import Presence
+
+
+def test_presence_counts():
+    presence = Presence()
+    presence.connect("a", 1, 10)
+    presence.connect("b", 1, 11)
+    presence.connect("c", 2, 20)
+    assert presence.connected_count(1) == 2
+    presence.disconnect("a")
+    presence.disconnect("a")
+    assert presence.connected_count(1) == 1
+    # a socket that reconnects to other game leaves the first one
+    presence.connect("c", 1, 20)
+    assert presence.connected_count(2) == 0
+    assert presence.connected_count(1) == 2
+
+
+def test_presence_idle_games():
+    presence = Presence()
+    presence.connect("a", 1, 10)
+    presence.connect("b", 2, 20)
+    presence.disconnect("b")
+    presence.touch(2, now=0)
+    # game 3 has never been seen, it starts counting now
+    assert presence.idle_games([3], ttl=10, now=5) == []
+    assert presence.idle_games([3], ttl=10, now=12) == [2]
+    assert presence.idle_games([3], ttl=10, now=15) == [2, 3]
+    presence.forget(2)
+    assert presence.idle_games([], ttl=10, now=15) == [3]
@@ -0,0 +1,34 @@
+from src.theThing.games.roles import RoleTally, HUMAN, INFECTED, THE_THING
+
+
+def create_tally():
+    return RoleTally(
+        [
+            (1, "P1", THE_THING, True),
+            (2, "P2", HUMAN, True),
+            (3, "P3", HUMAN, True),
+            (4, "P4", HUMAN, True),
+        ]
+    )
+
+
+def test_tally_infection():
+    tally = create_tally()
+    assert tally.count_alive(HUMAN) == 3
+    tally.update(2, "P2", INFECTED, True)
+    assert tally.count_alive(HUMAN) == 2
+    assert tally.count_alive(INFECTED) == 1
+    assert tally.count_alive() == 4
+    assert tally.role_of(2) == INFECTED
+
+
+def test_tally_deaths():
+    tally = create_tally()
+    tally.update(3, "P3", HUMAN, False)
+    assert tally.count_alive(HUMAN) == 2
+    assert tally.alive_names(HUMAN) == ["P2", "P4"]
+    assert tally.thing_alive()
+    tally.update(1, "P1", THE_THING, False)
+    assert not tally.thing_alive()
+    assert tally.count_alive() == 2
+    assert len(tally) == 4
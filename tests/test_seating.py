@@ -0,0 +1,61 @@
+from src.theThing.games.seating import Seat, SeatingRing
+
+
+def create_ring(clockwise=True):
+    seats = [
+        Seat(
+            id=10 + position,
+            name=f"P{position}",
+            table_position=position,
+            alive=True,
+        )
+        for position in range(1, 6)
+    ]
+    return SeatingRing(seats, clockwise)
+
+
+def test_ring_neighbors():
+    ring = create_ring()
+    assert ring.next_player(1).name == "P2"
+    assert ring.next_player(5).name == "P1"
+    assert ring.next_player(4, 2).name == "P1"
+    assert ring.are_adjacent(1, 5)
+    assert not ring.are_adjacent(1, 3)
+    assert ring.distance(4, 2) == 3
+
+
+def test_ring_counter_clockwise():
+    ring = create_ring(clockwise=False)
+    assert ring.next_player(1).name == "P5"
+    assert ring.next_player(2, 2).name == "P5"
+    assert ring.distance(4, 2) == 2
+    ring.clockwise = True
+    assert ring.next_player(1).name == "P2"
+
+
+def test_ring_kill():
+    ring = create_ring()
+    ring.kill(2)
+    assert len(ring) == 4
+    assert ring.next_player(1).name == "P3"
+    assert ring.are_adjacent(1, 3)
+    assert not ring.player_named("P2").alive
+    assert not ring.player_with_id(12).alive
+    assert [seat.name for seat in ring.alive_seats()] == [
+        "P1",
+        "P3",
+        "P4",
+        "P5",
+    ]
+
+
+def test_ring_swap():
+    ring = create_ring()
+    first, second = ring.player_named("P1"), ring.player_named("P3")
+    assert ring.move(first, 3)
+    assert ring.move(second, 1)
+    assert ring.player_at(3).name == "P1"
+    assert ring.player_at(1).name == "P3"
+    assert ring.player_named("P1").table_position == 3
+    assert ring.player_with_id(13).table_position == 1
+    assert ring.next_player(1).name == "P2"
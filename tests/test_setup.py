@@ -1,6 +1,15 @@
 import pytest
 from pony.orm import Database, db_session
 from src.theThing.models.db import db
+from src.theThing.cards.models import card_catalog, card_type_ids
+from src.theThing.games.lobby import lobby
+from src.theThing.games.idempotency import idempotency_cache
+from src.theThing.games.seating import rings
+from src.theThing.games.barriers import barrier_indexes
+from src.theThing.games.versions import game_versions
+from src.theThing.games.roles import role_tallies
+from src.theThing.games.moves import player_moves, turn_views
+from src.theThing.players.hand import hand_indexes
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -10,6 +19,17 @@ def clear_db():
         db.generate_mapping(create_tables=True)
     db.drop_all_tables(with_all_data=True)
     db.create_tables()
+    card_catalog.clear()
+    card_type_ids.clear()
+    lobby.clear()
+    rings.clear()
+    barrier_indexes.clear()
+    game_versions.clear()
+    role_tallies.clear()
+    player_moves.clear()
+    turn_views.clear()
+    hand_indexes.clear()
+    idempotency_cache.clear()
     yield
     db.drop_all_tables(with_all_data=True)
     db.create_tables()
@@ -0,0 +1,22 @@
+from src.theThing.games.spectators import SpectatorFeed, spectator_room
+
+
+def test_spectator_feed_coalesces_status():
+    feed = SpectatorFeed()
+    assert not feed
+    feed.put("game_status", {"state": 0})
+    feed.put("action", {"log": "1"})
+    feed.put("game_status", {"state": 1})
+    feed.put("discard", {"log": "2"})
+    assert feed
+    assert feed.take() == [
+        ("action", {"log": "1"}),
+        ("discard", {"log": "2"}),
+        ("game_status", {"state": 1}),
+    ]
+    assert not feed
+    assert feed.take() == []
+
+
+def test_spectator_room():
+    assert spectator_room(3) == "s3"
@@ -0,0 +1,55 @@
+import asyncio
+from src.theThing.games.timers import (
+    TimerWheel,
+    expire_turn,
+    turn_timeout_actions,
+    turn_timers,
+)
+
+
+def advance(wheel, ticks):
+    expired = []
+    for _ in range(ticks):
+        expired += wheel.advance()
+    return expired
+
+
+def test_timer_wheel_expires():
+    wheel = TimerWheel(tick=1.0, slots=4)
+    wheel.arm(1, 2, "a")
+    # longer than the wheel, it needs more than one round
+    wheel.arm(2, 6, "b")
+    assert len(wheel) == 2
+    assert advance(wheel, 1) == []
+    assert advance(wheel, 1) == [(1, "a")]
+    assert advance(wheel, 3) == []
+    assert advance(wheel, 1) == [(2, "b")]
+    assert len(wheel) == 0
+
+
+def test_timer_wheel_rearm_and_cancel():
+    wheel = TimerWheel(tick=1.0, slots=8)
+    wheel.arm(1, 1, "a")
+    wheel.arm(1, 3, "b")
+    wheel.arm(2, 2, "c")
+    wheel.cancel(2)
+    assert 2 not in wheel
+    assert advance(wheel, 3) == [(1, "b")]
+
+
+def test_failed_default_action_is_retried():
+    action = turn_timeout_actions.get(1)
+
+    async def failing(game_id, state):
+        raise Exception("Existe una puerta atrancada")
+
+    turn_timeout_actions[1] = failing
+    try:
+        asyncio.run(expire_turn(999, 1))
+        assert 999 in turn_timers
+    finally:
+        turn_timers.cancel(999)
+        if action is None:
+            del turn_timeout_actions[1]
+        else:
+            turn_timeout_actions[1] = action
@@ -7,6 +7,8 @@ from src.theThing.turn import crud
 from src.theThing.turn.schemas import TurnCreate, TurnOut
 from .test_setup import test_db, clear_db
 from src.theThing.cards import crud as card_crud
+from src.theThing.players import crud as player_crud
+from src.theThing.players.schemas import PlayerCreate
 
 
 def test_create_turn(test_db):
@@ -39,6 +41,8 @@ def test_create_turn(test_db):
 def test_update_turn(test_db):
     # start the game first to creat the deck
     game_crud.create_game_deck(1, 4)
+    # the destination player must be a player of the game
+    player_crud.create_player(PlayerCreate(name="TestPlayer1"), 1)
     updated_turn = crud.update_turn(
         1,
         TurnCreate(
@@ -72,5 +76,12 @@ def test_update_turn(test_db):
             "response_card": response_card.model_dump(),
             "state": 1,
         },
-        "players": [],
+        "players": [
+            {
+                "name": "TestPlayer1",
+                "table_position": 1,
+                "alive": True,
+                "quarantine": 0,
+            }
+        ],
     }
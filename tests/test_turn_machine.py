@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.main import app
+from src.theThing.games.turn_machine import (
+    TRANSITIONS,
+    TurnState,
+    Transition,
+    allows,
+    check_sequence,
+    compile_turn_machine,
+    dispatch,
+    game_lock,
+    state_actions,
+    turn_action,
+    turn_handlers,
+)
+
+
+def test_turn_machine_tables():
+    assert state_actions[TurnState.DECIDING] == {
+        "play",
+        "discard",
+        "declare_victory",
+    }
+    assert allows(0, "steal")
+    assert not allows(0, "play")
+    assert allows(6, "cac")
+    # every action of the table has its handler once the app is loaded
+    assert set(turn_handlers) == {t.action for t in TRANSITIONS}
+
+
+def test_check_sequence():
+    check_sequence(0, ["steal", "discard", "exchange", "finish_turn"])
+    # the play can lead to a panic card
+    check_sequence(1, ["play", "cac", "finish_turn", "steal"])
+    with pytest.raises(HTTPException) as error:
+        check_sequence(0, ["steal", "discard", "steal"])
+    assert error.value.status_code == 422
+    assert error.value.detail.startswith("Acción 3:")
+
+
+def test_turn_machine_repeated_action():
+    steal = Transition("steal", frozenset([TurnState.STEALING]), "error")
+    with pytest.raises(ValueError):
+        compile_turn_machine([steal, steal])
+    with pytest.raises(ValueError):
+        turn_action("volar")
+
+
+def test_dispatch_runs_one_action_per_game():
+    handler = turn_handlers["steal"]
+    running = []
+
+    @turn_action("steal")
+    async def slow_steal(data: dict):
+        running.append(data["player_id"])
+        assert len(running) == 1
+        await asyncio.sleep(0.01)
+        running.pop()
+        return data["player_id"]
+
+    async def run_both():
+        return await asyncio.gather(
+            dispatch("steal", {"game_id": 1, "player_id": 1}),
+            dispatch("steal", {"game_id": 1, "player_id": 2}),
+        )
+
+    try:
+        assert asyncio.run(run_both()) == [1, 2]
+    finally:
+        turn_handlers["steal"] = handler
+    with pytest.raises(HTTPException):
+        asyncio.run(dispatch("volar", {"game_id": 1}))
+
+
+def test_game_lock_can_be_nested():
+    async def nested():
+        async with game_lock(7):
+            async with game_lock(7):
+                return "ok"
+
+    assert asyncio.run(nested()) == "ok"
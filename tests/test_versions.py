@@ -0,0 +1,169 @@
+import asyncio
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from pony.orm import db_session, rollback
+from src.main import app
+from .test_setup import test_db, clear_db
+from src.theThing.games.seating import get_ring
+from src.theThing.games.turn_machine import dispatch
+from src.theThing.games.versions import (
+    touch_game,
+    get_version,
+    game_versions,
+    wait_for_version,
+)
+
+client = TestClient(app)
+
+
+def test_versioned_steal(test_db):
+    game_data = {
+        "game": {"name": "Test Game", "min_players": 4, "max_players": 5},
+        "host": {"name": "Test Host"},
+    }
+    game_id = client.post("/game/create", json=game_data).json()["game_id"]
+    for name in ["Test Player 2", "Test Player 3", "Test Player 4"]:
+        client.post(
+            "/game/join", json={"game_id": game_id, "player_name": name}
+        )
+    client.post(
+        "/game/start", json={"game_id": game_id, "player_name": "Test Host"}
+    )
+
+    version = get_version(game_id)
+    with db_session:
+        assert touch_game(game_id) == version + 1
+        rollback()
+    # a rolled back change is not mirrored
+    assert get_version(game_id) == version
+    with db_session:
+        assert touch_game(game_id) == version + 1
+    assert get_version(game_id) == version + 1
+    # the mirror and the database agree
+    game_versions.clear()
+    assert get_version(game_id) == version + 1
+
+    steal_data = {"game_id": game_id, "player_id": 1}
+    response = client.put(
+        "/game/steal", json=steal_data, headers={"If-Match": f'"{version}"'}
+    )
+    assert response.status_code == 412
+    assert response.json() == {
+        "detail": f"La partida cambió, la versión actual es {version + 1}"
+    }
+
+    headers = {"If-Match": f'"{version + 1}"', "Idempotency-Key": "robo"}
+    response = client.put("/game/steal", json=steal_data, headers=headers)
+    assert response.status_code == 200
+    assert get_version(game_id) > version + 1
+
+    # the retry of an applied action gets its response, not a 412
+    retry = client.put("/game/steal", json=steal_data, headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == response.json()
+
+
+def test_if_match_is_checked_under_the_lock(test_db):
+    game_data = {
+        "game": {"name": "Locked Game", "min_players": 4, "max_players": 5},
+        "host": {"name": "Test Host"},
+    }
+    response = client.post("/game/create", json=game_data).json()
+    game_id = response["game_id"]
+    for name in ["Test Player 2", "Test Player 3", "Test Player 4"]:
+        client.post(
+            "/game/join", json={"game_id": game_id, "player_name": name}
+        )
+    client.post(
+        "/game/start", json={"game_id": game_id, "player_name": "Test Host"}
+    )
+    owner = client.get(f"/game/{game_id}").json()["turn"]["owner"]
+    owner_id = get_ring(game_id).player_at(owner).id
+    version = str(get_version(game_id))
+
+    async def steal():
+        data = {"game_id": game_id, "player_id": owner_id}
+        try:
+            await dispatch("steal", data, if_match=version)
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+    async def steal_twice():
+        return await asyncio.gather(steal(), steal())
+
+    assert sorted(asyncio.run(steal_twice())) == [200, 412]
+
+
+def test_conditional_get(test_db):
+    game_data = {
+        "game": {
+            "name": "Conditional Game",
+            "min_players": 4,
+            "max_players": 5,
+        },
+        "host": {"name": "Test Host"},
+    }
+    response = client.post("/game/create", json=game_data).json()
+    game_id, player_id = response["game_id"], response["player_id"]
+
+    for url in [
+        f"/game/{game_id}",
+        f"/game/{game_id}/player/{player_id}",
+        f"/game/{game_id}/chat",
+        f"/game/{game_id}/get-logs",
+        "/game/list",
+    ]:
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+    etag = client.get(f"/game/{game_id}").headers["ETag"]
+    lobby_etag = client.get("/game/list").headers["ETag"]
+    client.post(
+        "/game/join", json={"game_id": game_id, "player_name": "Player 2"}
+    )
+    # the game and the list changed
+    response = client.get(f"/game/{game_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()["players"]) == 2
+    response = client.get("/game/list", headers={"If-None-Match": lobby_etag})
+    assert response.status_code == 200
+
+
+def test_wait_game_change(test_db):
+    game_data = {
+        "game": {"name": "Waited Game", "min_players": 4, "max_players": 5},
+        "host": {"name": "Test Host"},
+    }
+    game_id = client.post("/game/create", json=game_data).json()["game_id"]
+    version = get_version(game_id)
+
+    response = client.get(f"/game/{game_id}/wait?since={version}&timeout=0")
+    assert response.status_code == 204
+    etag = response.headers["ETag"]
+    response = client.get(
+        f"/game/{game_id}/wait?since={version}&timeout=0",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+    response = client.get(f"/game/{game_id}/wait?since={version - 1}")
+    assert response.status_code == 200
+    assert response.json()["version"] == version
+    assert response.json()["game"]["name"] == "Waited Game"
+
+    async def wait_and_touch():
+        waiters = [
+            asyncio.create_task(wait_for_version(game_id, version, 5))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        with db_session:
+            touch_game(game_id)
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(wait_and_touch()) == [True, True, True]
+    assert client.get("/game/100/wait?since=0").status_code == 404